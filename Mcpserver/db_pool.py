@@ -0,0 +1,140 @@
+# Mcpserver/db_pool.py
+import os
+import asyncio
+import sqlite3
+import threading
+from functools import partial
+from urllib.request import pathname2url
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 连接参数（从环境变量读取）：锁等待超时（毫秒）和每个连接缓存的预编译语句数量
+DB_BUSY_TIMEOUT_MS = int(os.getenv("MCP_DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHED_STATEMENTS = int(os.getenv("MCP_DB_CACHED_STATEMENTS", "128"))
+# 异步工具函数执行数据库读操作的线程数（WAL 下各线程的读连接并行查询）；0 表示直接在事件循环中执行
+DB_READ_THREADS = int(os.getenv("MCP_DB_READ_THREADS", "4"))
+
+
+class SQLitePool:
+    """
+    SQLite 连接池：每个线程复用自己的一条长连接。
+
+    sqlite3 连接默认不能跨线程使用，这里按线程各建一条连接，避免每次工具调用都重新 connect；
+    连接开启 WAL（读写互不阻塞）和 busy_timeout（写锁冲突时等待而不是立即报错），
+    并由 sqlite3 按 SQL 文本缓存预编译语句，固定的查询语句只需解析一次。
+    进程 fork 后子进程会重新建立自己的连接。
+
+    异步工具函数通过 read() / write() 在线程池中执行数据库操作，不阻塞事件循环：
+    读操作分发到 read_threads 个读线程并行执行，写操作固定在一个写线程上串行执行，
+    写事务之间不会互相等待写锁，也不会占满读线程。
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS,
+                 cached_statements: int = DB_CACHED_STATEMENTS, read_threads: int = DB_READ_THREADS):
+        # 连接池只打开已有的数据库，路径配置错误时直接报错，不会悄悄创建一个空库
+        if not os.path.isfile(path):
+            raise FileNotFoundError(
+                f"数据库文件不存在: {path}（请先运行 python data/create_db.py，或检查 ORDER_DB_PATH / PRODUCT_DB_PATH）"
+            )
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.read_threads = read_threads
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._trace_callback: Optional[Callable[[str], None]] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._pid = os.getpid()
+        self.opened = 0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{pathname2url(os.path.abspath(self.path))}?mode=rw",
+            uri=True,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            # 连接只会被创建它的线程使用（thread-local），关闭时允许由其他线程统一关闭
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        if self._trace_callback is not None:
+            conn.set_trace_callback(self._trace_callback)
+        try:
+            # journal_mode 是数据库文件级别的设置，只读文件上会失败，此时沿用原模式
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.DatabaseError as e:
+            print(f"[DB] 警告: 无法启用 WAL 模式 ({self.path}): {e}")
+        with self._lock:
+            self._connections.append(conn)
+            self.opened += 1
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接（首次调用时建立）"""
+        if os.getpid() != self._pid:
+            # fork 出的子进程不能复用父进程的连接
+            self._local = threading.local()
+            with self._lock:
+                self._connections = []
+                self._readers = self._writer = None
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """写事务：正常结束时提交，异常时回滚"""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def _executor(self, write: bool) -> ThreadPoolExecutor:
+        with self._lock:
+            if write:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+                return self._writer
+            if self._readers is None:
+                self._readers = ThreadPoolExecutor(max_workers=self.read_threads, thread_name_prefix="sqlite-reader")
+            return self._readers
+
+    async def read(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在读线程池中执行 fn（fn 内通过 connection() 取得所在线程的连接）"""
+        if self.read_threads <= 0:
+            return fn(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor(False), partial(fn, *args, **kwargs))
+
+    async def write(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在唯一的写线程中执行 fn，所有写操作串行化"""
+        if self.read_threads <= 0:
+            return fn(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor(True), partial(fn, *args, **kwargs))
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        """为所有线程的连接（包括之后新建的）设置 SQL 跟踪回调，None 表示取消"""
+        with self._lock:
+            self._trace_callback = callback
+            for conn in self._connections:
+                conn.set_trace_callback(callback)
+
+    def close_all(self) -> None:
+        """关闭本进程内所有线程的连接和读写线程池（进程退出前调用）"""
+        with self._lock:
+            executors, self._readers, self._writer = [self._readers, self._writer], None, None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
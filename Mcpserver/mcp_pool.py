@@ -0,0 +1,353 @@
+# Mcpserver/mcp_pool.py
+"""
+MCP 服务进程池：每个 MCP 服务启动 N 个副本进程，对外提供一个统一入口
+
+- 副本以 streamable-http（无状态、JSON 响应）方式运行，每个请求可以发给任意副本
+- 入口 /{服务名}/mcp 把请求转发给当前未完成请求数最少的健康副本（并列时轮转），
+  一个副本被慢写入（如 refund_order 等待写锁）阻塞时，其他用户的调用会分发到别的副本
+- 副本进程退出后按指数退避自动重启（每次启动重新分配端口）；定期 ping，连续多次无响应的副本会被杀掉重启
+- 暂时没有健康副本（进程池刚启动、副本正在重启）时，请求最多等待 MCP_POOL_WAIT_TIMEOUT 秒，而不是立即返回 503
+- /metrics 返回每个副本的状态、排队请求数、调用次数、错误数、重启次数和最近调用的延迟分位数
+
+用法:
+    python Mcpserver/mcp_pool.py --replicas 4 --port 8100
+    MCP_TRANSPORT=streamable_http \\
+        ORDER_MCP_URL=http://127.0.0.1:8100/order_mcp/mcp \\
+        PRODUCT_MCP_URL=http://127.0.0.1:8100/product_mcp/mcp python service/main.py
+    curl http://127.0.0.1:8100/metrics
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import contextlib
+from collections import deque
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_SCRIPTS = {
+    "order_mcp": os.path.join(SERVER_DIR, "order_mcp.py"),
+    "product_mcp": os.path.join(SERVER_DIR, "product_mcp.py"),
+}
+
+# 进程池配置（从环境变量读取，命令行参数优先）
+POOL_REPLICAS = int(os.getenv("MCP_POOL_REPLICAS", str(os.cpu_count() or 1)))
+POOL_HOST = os.getenv("MCP_POOL_HOST", "127.0.0.1")
+POOL_PORT = int(os.getenv("MCP_POOL_PORT", "8100"))
+# 健康检查间隔与超时（秒）：超时要大于 SQLite 锁等待时间，等锁的副本不应被当成无响应
+HEALTH_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_INTERVAL", "5"))
+HEALTH_TIMEOUT = float(os.getenv("MCP_POOL_HEALTH_TIMEOUT", "10"))
+HEALTH_MAX_FAILURES = 3
+REQUEST_TIMEOUT = float(os.getenv("MCP_POOL_REQUEST_TIMEOUT", "60"))
+# 没有健康副本时请求等待副本就绪的最长时间（秒），超时返回 503
+WAIT_TIMEOUT = float(os.getenv("MCP_POOL_WAIT_TIMEOUT", "30"))
+STARTUP_TIMEOUT = 60.0
+RESTART_BACKOFF_MAX = 30.0
+# 副本稳定运行超过该时长后退出，重启退避从 1 秒重新开始
+STABLE_SECONDS = 60.0
+LATENCY_WINDOW = 1000
+
+# 转发给副本的请求头 / 返回给客户端的响应头
+_REQUEST_HEADERS = ("content-type", "accept", "mcp-protocol-version", "mcp-session-id", "last-event-id")
+_RESPONSE_HEADERS = ("content-type", "mcp-session-id")
+_PING = {"jsonrpc": "2.0", "id": "mcp-pool-health", "method": "ping"}
+_PING_HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+
+
+class Replica:
+    """一个 MCP 服务副本进程及其调用统计"""
+
+    def __init__(self, server: str, index: int):
+        self.server = server
+        self.index = index
+        # 端口在每次（重新）启动进程时分配，见 ReplicaPool._supervise
+        self.port: Optional[int] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.state = "starting"  # starting / healthy / down
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.restarts = 0
+        # 进程启动次数：(副本, starts) 标识一次具体的启动，转发重试时只排除连接失败的那一次启动
+        self.starts = 0
+        self.health_failures = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/mcp"
+
+    @property
+    def name(self) -> str:
+        return f"{self.server}#{self.index}"
+
+    def snapshot(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "replica": self.index,
+            "pid": self.process.pid if self.process else None,
+            "port": self.port,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "p50_ms": _percentile(latencies, 0.5),
+            "p99_ms": _percentile(latencies, 0.99),
+        }
+
+
+class ReplicaPool:
+    """同一 MCP 服务的一组副本：启动/重启进程、健康检查、按未完成请求数最少分发"""
+
+    def __init__(self, server: str, replicas: int, client: httpx.AsyncClient):
+        self.server = server
+        self.script = SERVER_SCRIPTS[server]
+        self.client = client
+        self.replicas = [Replica(server, i) for i in range(replicas)]
+        # 有副本变为健康时通知等待中的请求
+        self._ready = asyncio.Condition()
+        self._turn = 0
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._supervise(r)) for r in self.replicas]
+        self._tasks.append(asyncio.create_task(self._health_loop()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for replica in self.replicas:
+            if replica.process and replica.process.returncode is None:
+                replica.process.terminate()
+                try:
+                    await asyncio.wait_for(replica.process.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    replica.process.kill()
+
+    async def _ping(self, replica: Replica, timeout: float) -> bool:
+        try:
+            response = await self.client.post(replica.url, json=_PING, headers=_PING_HEADERS, timeout=timeout)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def _wait_ready(self, replica: Replica) -> bool:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline and replica.process.returncode is None:
+            if await self._ping(replica, timeout=1.0):
+                return True
+            await asyncio.sleep(0.2)
+        return False
+
+    async def _supervise(self, replica: Replica) -> None:
+        """启动副本并在其退出后按指数退避重启"""
+        backoff = 1.0
+        while True:
+            replica.state = "starting"
+            replica.health_failures = 0
+            # 每次启动都重新分配端口：上次的端口在探测与绑定之间可能已被其他进程占用
+            replica.port = _free_port()
+            replica.starts += 1
+            env = {**os.environ, "MCP_SERVER_TRANSPORT": "streamable-http", "MCP_SERVER_PORT": str(replica.port)}
+            replica.process = await asyncio.create_subprocess_exec(sys.executable, self.script, env=env)
+            started = time.monotonic()
+            if await self._wait_ready(replica):
+                await self._mark_healthy(replica)
+                print(f"[POOL] {replica.name} 已就绪 (pid={replica.process.pid}, port={replica.port})")
+            elif replica.process.returncode is None:
+                print(f"[POOL] ⚠️ {replica.name} {STARTUP_TIMEOUT:.0f}s 内未就绪，结束进程")
+                replica.process.kill()
+            code = await replica.process.wait()
+            replica.state = "down"
+            if self._stopping:
+                return
+            if time.monotonic() - started > STABLE_SECONDS:
+                backoff = 1.0
+            print(f"[POOL] ⚠️ {replica.name} (pid={replica.process.pid}) 已退出，退出码 {code}，{backoff:.0f}s 后重启")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+            replica.restarts += 1
+
+    async def _mark_healthy(self, replica: Replica) -> None:
+        replica.state = "healthy"
+        async with self._ready:
+            self._ready.notify_all()
+
+    async def _health_loop(self) -> None:
+        """
+        定期 ping 副本：健康副本连续多次失败（进程卡死）时杀掉进程，由 _supervise 重启；
+        转发时连接失败被标记为 down、但进程仍在运行的副本，ping 成功后恢复为健康
+        """
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL)
+            checked = [r for r in self.replicas if r.state == "healthy"
+                       or (r.state == "down" and r.process and r.process.returncode is None)]
+            results = await asyncio.gather(*(self._ping(r, HEALTH_TIMEOUT) for r in checked))
+            for replica, ok in zip(checked, results):
+                if replica.state == "down":
+                    if ok and replica.process.returncode is None:
+                        print(f"[POOL] {replica.name} 恢复响应")
+                        await self._mark_healthy(replica)
+                    continue
+                replica.health_failures = 0 if ok else replica.health_failures + 1
+                if replica.health_failures >= HEALTH_MAX_FAILURES and replica.process.returncode is None:
+                    print(f"[POOL] ⚠️ {replica.name} 连续 {replica.health_failures} 次健康检查失败，重启")
+                    replica.state = "down"
+                    replica.process.kill()
+
+    @staticmethod
+    def _usable(replica: Replica, exclude) -> bool:
+        """健康且本次启动未被排除（exclude 为 (副本, starts) 集合，副本重启后重新可用）"""
+        return replica.state == "healthy" and (replica, replica.starts) not in exclude
+
+    def pick(self, exclude=()) -> Optional[Replica]:
+        """未完成请求数最少的健康副本；并列时从上次之后轮转，避免总是压在同一个副本上"""
+        candidates = [r for r in self.replicas if self._usable(r, exclude)]
+        if not candidates:
+            return None
+        self._turn = (self._turn + 1) % len(self.replicas)
+        return min(candidates, key=lambda r: (r.outstanding, (r.index - self._turn) % len(self.replicas)))
+
+    async def acquire(self, exclude=(), timeout: float = WAIT_TIMEOUT) -> Optional[Replica]:
+        """选一个健康副本；暂时没有时（启动或重启中）最多等待 timeout 秒，超时返回 None"""
+        replica = self.pick(exclude)
+        if replica is not None or self._stopping:
+            return replica
+
+        def available() -> bool:
+            return any(self._usable(r, exclude) for r in self.replicas)
+
+        try:
+            async with self._ready:
+                await asyncio.wait_for(self._ready.wait_for(available), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.pick(exclude)
+
+    async def forward(self, method: str, body: bytes, headers: Dict[str, str]) -> Response:
+        tried = set()
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            replica = await self.acquire(exclude=tried, timeout=max(0.0, deadline - time.monotonic()))
+            if replica is None:
+                return JSONResponse({"jsonrpc": "2.0", "id": None,
+                                     "error": {"code": -32000, "message": f"{self.server} 没有可用的副本"}},
+                                    status_code=503)
+            replica.outstanding += 1
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, replica.url, content=body, headers=headers)
+            except httpx.ConnectError:
+                # 连接失败说明请求没有送达副本（进程刚退出），可以安全地换一个副本重试
+                # 标记为 down（不再分发），只排除这一次启动：_supervise 重启后（新端口）可以再次使用
+                replica.errors += 1
+                replica.state = "down"
+                tried.add((replica, replica.starts))
+                continue
+            except httpx.HTTPError as e:
+                replica.errors += 1
+                return JSONResponse({"jsonrpc": "2.0", "id": None,
+                                     "error": {"code": -32000, "message": f"{replica.name} 调用失败: {e!r}"}},
+                                    status_code=502)
+            finally:
+                replica.outstanding -= 1
+            replica.requests += 1
+            replica.latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 500:
+                replica.errors += 1
+            return Response(
+                content=response.content,
+                status_code=response.status_code,
+                headers={k: v for k, v in response.headers.items() if k in _RESPONSE_HEADERS},
+            )
+
+    def metrics(self) -> dict:
+        replicas = [r.snapshot() for r in self.replicas]
+        return {
+            "replicas": replicas,
+            "healthy": sum(r["state"] == "healthy" for r in replicas),
+            "outstanding": sum(r["outstanding"] for r in replicas),
+            "requests": sum(r["requests"] for r in replicas),
+        }
+
+
+def create_app(servers: List[str], replicas: int) -> Starlette:
+    pools: Dict[str, ReplicaPool] = {}
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # 连接数不设上限：排队发生在副本内部（outstanding），由分发策略控制
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=64)
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits) as client:
+            for server in servers:
+                pools[server] = ReplicaPool(server, replicas, client)
+                pools[server].start()
+            try:
+                yield
+            finally:
+                await asyncio.gather(*(pool.stop() for pool in pools.values()))
+
+    async def mcp_endpoint(request: Request) -> Response:
+        pool = pools.get(request.path_params["server"])
+        if pool is None:
+            return JSONResponse({"error": f"未知的 MCP 服务: {request.path_params['server']}"}, status_code=404)
+        headers = {k: v for k, v in request.headers.items() if k in _REQUEST_HEADERS}
+        return await pool.forward(request.method, await request.body(), headers)
+
+    async def metrics(request: Request) -> Response:
+        return JSONResponse({server: pool.metrics() for server, pool in pools.items()})
+
+    return Starlette(
+        routes=[
+            Route("/{server}/mcp", mcp_endpoint, methods=["GET", "POST", "DELETE"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 服务进程池（多副本 + 最少未完成请求分发）")
+    parser.add_argument("--replicas", type=int, default=POOL_REPLICAS, help="每个 MCP 服务的副本数，默认 CPU 核数")
+    parser.add_argument("--host", default=POOL_HOST)
+    parser.add_argument("--port", type=int, default=POOL_PORT)
+    parser.add_argument("--servers", default=",".join(SERVER_SCRIPTS), help="逗号分隔的服务名")
+    args = parser.parse_args()
+    servers = [s.strip() for s in args.servers.split(",") if s.strip()]
+    unknown = [s for s in servers if s not in SERVER_SCRIPTS]
+    if unknown:
+        parser.error(f"未知的 MCP 服务: {', '.join(unknown)}（可选 {', '.join(SERVER_SCRIPTS)}）")
+
+    print(f"[POOL] 每个服务 {args.replicas} 个副本，入口 http://{args.host}:{args.port}/{{服务名}}/mcp，"
+          f"指标 http://{args.host}:{args.port}/metrics")
+    uvicorn.run(create_app(servers, args.replicas), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 # services/order_mcp.py
 import os
 import sqlite3
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from mcp.server.fastmcp import FastMCP
+from db_pool import SQLitePool
+from server_transport import run_server
+from tool_output import record_json, resolve_format, select_fields
 
 mcp = FastMCP("order_mcp")
 
@@ -11,55 +14,61 @@ DB_PATH = os.getenv("ORDER_DB_PATH", os.path.abspath(
     os.path.join(os.path.dirname(__file__), "../data/orders.db")
 ))
 
+# 批量查询的订单号数量上限、分页列出订单时单页条数的默认值和上限
+ORDER_BATCH_MAX = int(os.getenv("ORDER_BATCH_MAX", "20"))
+ORDER_LIST_DEFAULT_LIMIT = int(os.getenv("ORDER_LIST_DEFAULT_LIMIT", "5"))
+ORDER_LIST_MAX_LIMIT = int(os.getenv("ORDER_LIST_MAX_LIMIT", "20"))
+
+# 每个线程复用一条长连接，避免每次工具调用都重新建立连接；
+# 工具函数是异步的，查询在读线程池中并行执行，退款写入在单独的写线程中串行执行
+_pool = SQLitePool(DB_PATH)
+
+# 索引由 data/create_db.py 及批量导入脚本创建（按用户列出订单依赖 user_id + updated_at 索引），服务启动时不执行 DDL
+
+_ORDER_COLUMNS = "order_no, user_id, status, items, amount, logistics, cancelable, updated_at"
+_ORDER_FIELDS = tuple(c.strip() for c in _ORDER_COLUMNS.split(","))
+# json 格式默认返回的字段（用户ID 即调用方自己，最近更新时间一般用不到）
+_ORDER_DEFAULT_FIELDS = ("order_no", "status", "items", "amount", "logistics", "cancelable")
+
 
 def _fetch_order(order_no: str) -> Optional[Tuple[str, str, str, str, float, str, int, str]]:
     print(f"[DEBUG] 查询订单 {order_no}，数据库路径: {DB_PATH}")
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT
-                order_no,
-                user_id,
-                status,
-                items,
-                amount,
-                logistics,
-                cancelable,
-                updated_at
-            FROM orders WHERE order_no=?
-            """,
-            (order_no,),
-        )
-        result = cur.fetchone()
-        print(f"[DEBUG] 查询结果: {result}")
-        return result
-    finally:
-        conn.close()
+    cur = _pool.connection().execute(
+        f"SELECT {_ORDER_COLUMNS} FROM orders WHERE order_no=?",
+        (order_no,),
+    )
+    result = cur.fetchone()
+    print(f"[DEBUG] 查询结果: {result}")
+    return result
 
 
-@mcp.tool()
-def get_order(order_no: str, user_id: str) -> str:
-    """
-    获取指定订单号的订单详情。
+def _fetch_orders(order_nos: List[str]) -> dict:
+    """一次查询多个订单，返回 {订单号: 记录}"""
+    placeholders = ",".join("?" for _ in order_nos)
+    rows = _pool.connection().execute(
+        f"SELECT {_ORDER_COLUMNS} FROM orders WHERE order_no IN ({placeholders})", order_nos
+    ).fetchall()
+    return {row[0]: row for row in rows}
 
-    Args:
-        order_no: 要查询的订单号
-        user_id: 用户ID，用于权限校验
 
-    Returns:
-        订单详情的字符串描述
-    """
-    print(f"[TOOL] 调用工具: get_order, 参数: order_no='{order_no}', user_id='{user_id}'")
-    record = _fetch_order(order_no)
-    if record is None:
-        return f"未找到订单号 {order_no} 的记录，请确认后再试。"
+def _list_orders(user_id: str, status: Optional[str], after: Optional[Tuple[str, str]], limit: int) -> List[Tuple]:
+    """按最近更新倒序列出用户订单；after 为上一页最后一条的 (updated_at, order_no)"""
+    query = f"SELECT {_ORDER_COLUMNS} FROM orders WHERE user_id = ?"
+    params: list = [user_id]
+    if status:
+        query += " AND status = ?"
+        params.append(status)
+    if after is not None:
+        # 游标分页：从上一页最后一条之后继续，沿索引顺序读取，不需要 OFFSET 跳过前面的行
+        query += " AND (updated_at, order_no) < (?, ?)"
+        params.extend(after)
+    query += " ORDER BY updated_at DESC, order_no DESC LIMIT ?"
+    params.append(limit)
+    return _pool.connection().execute(query, params).fetchall()
 
-    order_no_db, user_id_db, status, items, amount, logistics, cancelable, updated_at = record
-    if user_id != user_id_db:
-        return f"订单 {order_no_db} 不属于当前用户，无权限查看。"
 
+def _format_order(record: Tuple) -> str:
+    order_no_db, user_id_db, status, items, amount, logistics, cancelable, updated_at = record
     return (
         f"订单号：{order_no_db}\n"
         f"用户ID：{user_id_db}\n"
@@ -71,8 +80,129 @@ def get_order(order_no: str, user_id: str) -> str:
         f"最近更新：{updated_at}"
     )
 
+
+def _order_json(record: Tuple, fields: List[str]) -> str:
+    order = dict(zip(_ORDER_FIELDS, record))
+    order["cancelable"] = bool(order["cancelable"])
+    return record_json(order, fields)
+
+
+@mcp.tool()
+async def get_order(order_no: str, user_id: str, fields: Optional[List[str]] = None) -> str:
+    """
+    获取指定订单号的订单详情。
+
+    Args:
+        order_no: 要查询的订单号
+        user_id: 用户ID，用于权限校验
+        fields: 只需部分信息时指定字段（返回 JSON），如 ["status", "logistics"]；
+            可选 order_no/status/items/amount/logistics/cancelable/updated_at
+
+    Returns:
+        订单详情的字符串描述，或只含所需字段的 JSON
+    """
+    print(f"[TOOL] 调用工具: get_order, 参数: order_no='{order_no}', user_id='{user_id}', "
+          f"fields={fields}")
+    output_format = resolve_format(fields)
+    try:
+        fields = select_fields(fields, _ORDER_FIELDS, _ORDER_DEFAULT_FIELDS)
+    except ValueError as e:
+        return str(e)
+
+    record = await _pool.read(_fetch_order, order_no)
+    if record is None:
+        return f"未找到订单号 {order_no} 的记录，请确认后再试。"
+
+    if user_id != record[1]:
+        return f"订单 {record[0]} 不属于当前用户，无权限查看。"
+
+    if output_format == "json":
+        return _order_json(record, fields)
+    return _format_order(record)
+
+
+@mcp.tool()
+async def get_orders(order_nos: List[str], user_id: str) -> str:
+    """
+    一次获取多个订单号的订单详情（用户同时询问多个订单时使用，避免逐个调用 get_order）。
+
+    Args:
+        order_nos: 要查询的订单号列表，例如 ["A1001", "A1002"]
+        user_id: 用户ID，用于权限校验
+
+    Returns:
+        每个订单的详情或未找到/无权限说明
+    """
+    print(f"[TOOL] 调用工具: get_orders, 参数: order_nos={order_nos}, user_id='{user_id}'")
+    # 去重并保持用户给出的顺序
+    order_nos = list(dict.fromkeys(o.strip() for o in order_nos if o and o.strip()))
+    if not order_nos:
+        return "未提供订单号，请告诉我需要查询的订单号。"
+    skipped = order_nos[ORDER_BATCH_MAX:]
+    order_nos = order_nos[:ORDER_BATCH_MAX]
+
+    records = await _pool.read(_fetch_orders, order_nos)
+    sections = []
+    for i, order_no in enumerate(order_nos, 1):
+        record = records.get(order_no)
+        if record is None:
+            body = f"未找到订单号 {order_no} 的记录，请确认后再试。"
+        elif user_id != record[1]:
+            body = f"订单 {order_no} 不属于当前用户，无权限查看。"
+        else:
+            body = _format_order(record)
+        sections.append(f"【{i}】{body}")
+
+    result = "\n\n".join(sections)
+    if skipped:
+        result += f"\n\n单次最多查询 {ORDER_BATCH_MAX} 个订单，以下订单未查询：{'、'.join(skipped)}"
+    return result
+
+
+@mcp.tool()
+async def list_user_orders(user_id: str, status: Optional[str] = None, cursor: Optional[str] = None,
+                           limit: int = ORDER_LIST_DEFAULT_LIMIT) -> str:
+    """
+    列出当前用户的订单，按最近更新时间倒序，支持按状态筛选和分页。
+
+    Args:
+        user_id: 用户ID
+        status: 只列出该状态的订单，例如："待发货"、"配送中"、"已签收"、"退款中"
+        cursor: 翻页游标，首次查询不传；查看更多时传入上一次结果末尾给出的游标
+        limit: 每页订单数量
+
+    Returns:
+        订单列表，以及查看下一页所需的游标（如果还有更多订单）
+    """
+    print(f"[TOOL] 调用工具: list_user_orders, 参数: user_id='{user_id}', status={status!r}, "
+          f"cursor={cursor!r}, limit={limit}")
+    limit = max(1, min(int(limit or ORDER_LIST_DEFAULT_LIMIT), ORDER_LIST_MAX_LIMIT))
+    after = None
+    if cursor:
+        updated_at, sep, order_no = cursor.rpartition("|")
+        if not sep or not updated_at or not order_no:
+            return f"翻页游标 {cursor} 无效，请不传 cursor 重新查询第一页。"
+        after = (updated_at, order_no)
+
+    # 多取一条用于判断是否还有下一页
+    rows = await _pool.read(_list_orders, user_id, status, after, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    status_desc = f"状态为「{status}」的" if status else ""
+    if not rows:
+        if cursor:
+            return f"没有更多{status_desc}订单了。"
+        return f"当前用户没有{status_desc}订单记录。"
+
+    result = f"找到 {len(rows)} 个{status_desc}订单（按最近更新排序）：\n\n"
+    result += "\n\n".join(f"【{i}】{_format_order(row)}" for i, row in enumerate(rows, 1))
+    if has_more:
+        last = rows[-1]
+        result += f"\n\n还有更多订单，查看下一页请调用 list_user_orders 并传入 cursor=\"{last[7]}|{last[0]}\""
+    return result
+
 @mcp.tool()
-def check_cancelable(order_no: str, user_id: str) -> str:
+async def check_cancelable(order_no: str, user_id: str) -> str:
     """
     检查订单是否可以取消（基于表中的 cancelable/status 字段）。
     
@@ -84,7 +214,7 @@ def check_cancelable(order_no: str, user_id: str) -> str:
         订单是否可取消的信息
     """
     print(f"[TOOL] 调用工具: check_cancelable, 参数: order_no='{order_no}', user_id='{user_id}'")
-    record = _fetch_order(order_no)
+    record = await _pool.read(_fetch_order, order_no)
     if record is None:
         return f"未找到订单号 {order_no} 的记录，请确认后再试。"
 
@@ -96,8 +226,56 @@ def check_cancelable(order_no: str, user_id: str) -> str:
         return f"订单 {order_no_db} 当前状态：{status}，允许取消。"
     return f"订单 {order_no_db} 当前状态：{status}，不可取消。"
 
+# 退款后的物流说明（按退款前的订单状态）
+_REFUND_LOGISTICS = {
+    "待发货": "订单已申请退款，商品未发出",
+    "待支付": "订单已申请退款，商品未发出",
+    "配送中": "订单已申请退款，正在拦截配送",
+    "已签收": "订单已申请退款，等待退货处理",
+}
+_REFUND_LOGISTICS_DEFAULT = "订单已申请退款，处理中"
+_REFUND_STATUS = "退款中"
+
+# 归属校验、可取消校验和状态变更在同一条 UPDATE 中完成，并发提交时只有一个请求能命中 cancelable = 1
+_REFUND_SET_SQL = (
+    "SET status = ?, "
+    "logistics = CASE status " + " ".join("WHEN ? THEN ?" for _ in _REFUND_LOGISTICS) + " ELSE ? END, "
+    "cancelable = 0, updated_at = datetime('now') "
+    "WHERE order_no = ? AND user_id = ? AND cancelable = 1"
+)
+_REFUND_SQL = f"UPDATE orders {_REFUND_SET_SQL} RETURNING order_no, logistics"
+_REFUND_SQL_NO_RETURNING = f"UPDATE orders {_REFUND_SET_SQL}"
+# UPDATE ... RETURNING 需要 SQLite 3.35+，更早的版本改用 BEGIN IMMEDIATE 事务
+_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _refund_params(order_no: str, user_id: str) -> tuple:
+    cases = [value for item in _REFUND_LOGISTICS.items() for value in item]
+    return (_REFUND_STATUS, *cases, _REFUND_LOGISTICS_DEFAULT, order_no, user_id)
+
+
+def _try_refund(order_no: str, user_id: str) -> Optional[Tuple[str, str]]:
+    """
+    原子地执行退款状态变更。
+
+    Returns:
+        (订单号, 新物流信息)；订单不存在、不属于该用户或已不可取消时返回 None
+    """
+    with _pool.transaction() as conn:
+        if _SUPPORTS_RETURNING:
+            # 取完 RETURNING 的结果语句才算执行结束，之后才能提交
+            rows = conn.execute(_REFUND_SQL, _refund_params(order_no, user_id)).fetchall()
+            return rows[0] if rows else None
+        # 立即获取写锁，UPDATE 与读取新物流信息之间不会插入其他写操作
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute(_REFUND_SQL_NO_RETURNING, _refund_params(order_no, user_id))
+        if cur.rowcount != 1:
+            return None
+        return conn.execute("SELECT order_no, logistics FROM orders WHERE order_no = ?", (order_no,)).fetchone()
+
+
 @mcp.tool()
-def refund_order(order_no: str, user_id: str) -> str:
+async def refund_order(order_no: str, user_id: str) -> str:
     """
     提交取消/退款操作：若允许取消则更新状态为"退款中"并标记不可取消。
     
@@ -109,7 +287,13 @@ def refund_order(order_no: str, user_id: str) -> str:
         退款操作结果
     """
     print(f"[TOOL] 调用工具: refund_order, 参数: order_no='{order_no}', user_id='{user_id}'")
-    record = _fetch_order(order_no)
+    refunded = await _pool.write(_try_refund, order_no, user_id)
+    if refunded is not None:
+        order_no_db, new_logistics = refunded
+        return f"订单 {order_no_db} 已提交取消/退款申请，状态更新为：{_REFUND_STATUS}。物流信息：{new_logistics}。"
+
+    # 未更新任何行：仅在失败时读取订单，给出具体原因
+    record = await _pool.read(_fetch_order, order_no)
     if record is None:
         return f"未找到订单号 {order_no} 的记录，请确认后再试。"
 
@@ -117,39 +301,9 @@ def refund_order(order_no: str, user_id: str) -> str:
     if user_id != user_id_db:
         return f"订单 {order_no_db} 不属于当前用户，无权限操作。"
 
-    if not cancelable:
-        return f"订单 {order_no_db} 当前状态：{status}，不可取消/退款。"
-
-    # 根据当前状态和物流信息，确定退款后的物流状态
-    if status in ["待发货", "待支付"]:
-        new_logistics = "订单已申请退款，商品未发出"
-    elif status == "配送中":
-        new_logistics = "订单已申请退款，正在拦截配送"
-    elif status == "已签收":
-        new_logistics = "订单已申请退款，等待退货处理"
-    else:
-        new_logistics = "订单已申请退款，处理中"
-
-    # 更新订单状态为退款中，同步更新物流信息，并设置不可再次取消
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            UPDATE orders
-            SET status = ?, 
-                logistics = ?,
-                cancelable = 0, 
-                updated_at = datetime('now')
-            WHERE order_no = ?
-            """,
-            ("退款中", new_logistics, order_no_db),
-        )
-        conn.commit()
-    finally:
-        conn.close()
-
-    return f"订单 {order_no_db} 已提交取消/退款申请，状态更新为：退款中。物流信息：{new_logistics}。"
+    if status == _REFUND_STATUS:
+        return f"订单 {order_no_db} 已提交过取消/退款申请（{updated_at}），当前状态：{status}，无需重复提交。"
+    return f"订单 {order_no_db} 当前状态：{status}，不可取消/退款。"
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    run_server(mcp, default_port=8101)
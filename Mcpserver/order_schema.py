@@ -0,0 +1,32 @@
+# Mcpserver/order_schema.py
+import re
+import sqlite3
+
+# 订单表索引，对应 order_mcp 的查询（按订单号的查询和退款 UPDATE 走主键）：
+# - 列出用户订单：user_id = ? ORDER BY updated_at DESC, order_no DESC，游标分页沿索引顺序读取，无需排序
+# - 按状态列出用户订单：user_id = ? AND status = ?，同样按更新时间倒序
+ORDER_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_orders_user_updated ON orders(user_id, updated_at DESC, order_no DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_user_status_updated "
+    "ON orders(user_id, status, updated_at DESC, order_no DESC)",
+]
+
+
+def ensure_order_indexes(conn: sqlite3.Connection) -> bool:
+    """确保订单表索引存在（已有数据库由 data/create_db.py 补建）；数据库只读或表不存在时返回 False"""
+    try:
+        with conn:
+            for statement in ORDER_INDEXES:
+                conn.execute(statement)
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"[DB] 警告: 无法创建订单表索引: {e}")
+        return False
+
+
+def drop_order_indexes(conn: sqlite3.Connection) -> None:
+    """删除订单表二级索引（批量导入前调用，导入完成后用 ensure_order_indexes 一次性重建）"""
+    with conn:
+        for statement in ORDER_INDEXES:
+            name = re.search(r"CREATE INDEX IF NOT EXISTS (\w+)", statement).group(1)
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
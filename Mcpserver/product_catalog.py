@@ -0,0 +1,206 @@
+# Mcpserver/product_catalog.py
+import os
+import sys
+import time
+import sqlite3
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# 商品目录内存快照（从环境变量读取）：是否启用，以及商品数超过多少时不加载（退回 SQL 查询）
+CATALOG_ENABLED = os.getenv("PRODUCT_CATALOG_CACHE", "1") != "0"
+CATALOG_MAX_ROWS = int(os.getenv("PRODUCT_CATALOG_MAX_ROWS", "200000"))
+
+# 与 product_mcp._fetch_product 返回的字段顺序一致；列表类查询只取前 10 个字段
+CATALOG_COLUMNS = (
+    "product_id, product_name, description, category, price, stock, "
+    "brand, specifications, image_url, status, created_at, updated_at"
+)
+ON_SALE = "在售"
+
+
+def name_order(row: Tuple) -> Tuple:
+    """按名称查找商品时同名/同样命中的多个商品中取价格最低者，价格相同取商品ID最小者（与 SQL 查询的 ORDER BY 一致）"""
+    return row[4], row[0]
+
+
+class CatalogSnapshot:
+    """
+    某一时刻的商品目录，加载后只读（刷新时整体替换，读取方无需加锁）。
+
+    - rows：按 rowid 顺序的商品行（元组）
+    - by_id / by_name：按商品ID、按在售商品名称的字典（同名商品取 name_order 最小者）
+    - 在售商品按价格排序的下标数组（全部 / 按分类），价格上限用二分查找截断
+    - 关键词匹配在拼接后的检索文本上用 str.find 完成，不为每行单独保存字符串
+    """
+
+    # 按价格顺序逐行检查的行数上限，超过后改为在检索文本中直接查找关键词（适合命中很少的词）
+    SCAN_BUDGET = 2000
+
+    def __init__(self, rows: List[Tuple], version: int):
+        self.version = version
+        self.rows = rows
+        self.by_id: Dict[str, Tuple] = {row[0]: row for row in rows}
+        self.by_name: Dict[str, Tuple] = {}
+        for row in rows:
+            if row[9] == ON_SALE:
+                current = self.by_name.get(row[1])
+                if current is None or name_order(row) < name_order(current):
+                    self.by_name[row[1]] = row
+        # LIKE 对 ASCII 字母不区分大小写，检索文本预先转成小写；各行以换行分隔，offsets[i] 为第 i 行的起始位置
+        texts = ["\x1f".join(v or "" for v in (row[1], row[2], row[6], row[7])).replace("\n", " ").lower()
+                 for row in rows]
+        self.text = "\n".join(texts)
+        self.offsets = [0] * (len(rows) + 1)
+        position = 0
+        for i, text in enumerate(texts):
+            self.offsets[i] = position
+            position += len(text) + 1
+        self.offsets[len(rows)] = position
+
+        prices = [row[4] for row in rows]
+        on_sale = sorted((i for i, row in enumerate(rows) if row[9] == ON_SALE), key=prices.__getitem__)
+        self.by_price = (on_sale, [prices[i] for i in on_sale])
+        by_category: Dict[str, List[int]] = {}
+        for i in on_sale:
+            by_category.setdefault(rows[i][3], []).append(i)
+        self.by_category = {c: (idx, [prices[i] for i in idx]) for c, idx in by_category.items()}
+
+    def get(self, product_id: str) -> Optional[Tuple]:
+        return self.by_id.get(product_id)
+
+    def find_by_name(self, name: str) -> Optional[Tuple]:
+        """名称完全一致的在售商品优先，否则返回名称包含该词的在售商品中价格最低的（同价取商品ID最小）"""
+        row = self.by_name.get(name)
+        if row is not None:
+            return row
+        needle = name.lower()
+        matches = (self.rows[i] for i in self._find_rows(needle))
+        return min((row for row in matches if row[9] == ON_SALE and needle in row[1].lower()),
+                   key=name_order, default=None)
+
+    def _row_contains(self, i: int, needles: List[str]) -> bool:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return all(self.text.find(n, start, end) != -1 for n in needles)
+
+    def _find_rows(self, needle: str):
+        """按 rowid 顺序产出检索文本中包含该词的行（同一行只产出一次）"""
+        if not needle or "\n" in needle:
+            return
+        position = self.text.find(needle)
+        while position != -1:
+            i = bisect_right(self.offsets, position) - 1
+            yield i
+            position = self.text.find(needle, self.offsets[i + 1])
+
+    def search(self, terms: List[str], category: str = None, max_price: float = None, limit: int = 10) -> List[Tuple]:
+        """在售商品按价格从低到高，返回名称/描述/品牌/规格中包含全部关键词的前 limit 个"""
+        if category:
+            indices, prices = self.by_category.get(category, ([], []))
+        else:
+            indices, prices = self.by_price
+        end = bisect_right(prices, max_price) if max_price is not None else len(indices)
+        needles = [t.lower() for t in terms]
+        if not needles:
+            return [self.rows[i][:10] for i in indices[:min(end, limit)]]
+
+        # 常见词：按价格顺序逐行检查，很快就能凑够 limit 个
+        results = []
+        for pos in range(min(end, self.SCAN_BUDGET)):
+            if self._row_contains(indices[pos], needles):
+                results.append(self.rows[indices[pos]][:10])
+                if len(results) >= limit:
+                    return results
+        if end <= self.SCAN_BUDGET:
+            return results
+
+        # 少见词：先找出包含第一个词的所有行，再按其余条件过滤、按价格排序
+        candidates = [
+            i for i in self._find_rows(needles[0])
+            if self.rows[i][9] == ON_SALE
+            and (not category or self.rows[i][3] == category)
+            and (max_price is None or self.rows[i][4] <= max_price)
+            and self._row_contains(i, needles[1:])
+        ]
+        candidates.sort(key=lambda i: self.rows[i][4])
+        return [self.rows[i][:10] for i in candidates[:limit]]
+
+
+class ProductCatalog:
+    """
+    商品目录缓存：持有一个专用连接，每次访问前检查 PRAGMA data_version，
+    只有数据库被其他连接修改过（版本号变化）时才重新加载快照。
+
+    重新加载期间其他线程继续使用旧快照（还没有快照时退回 SQL 查询），不会排队等待。
+    """
+
+    def __init__(self, path: str, max_rows: int = CATALOG_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version: Optional[int] = None
+        self._reloading = False
+        self._pid = os.getpid()
+        self.reloads = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or os.getpid() != self._pid:
+            # data_version 是连接级别的计数，必须始终在同一条连接上读取
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+            self._snapshot = None
+            self._version = None
+            self._reloading = False
+        return self._conn
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """返回最新的快照；商品数超过上限或加载失败时返回 None（调用方退回 SQL 查询）"""
+        with self._lock:
+            version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+            if version == self._version or self._reloading:
+                return self._snapshot
+            self._reloading = True
+        try:
+            snapshot = self._load(version)
+        except BaseException:
+            with self._lock:
+                self._reloading = False
+            raise
+        with self._lock:
+            self._snapshot, self._version, self._reloading = snapshot, version, False
+        return snapshot
+
+    def _load(self, version: int) -> Optional[CatalogSnapshot]:
+        # 在独立连接上加载，不占用检查版本号的连接；加载期间的新提交会在下次检查时触发再次加载
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.path)
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            if count > self.max_rows:
+                print(f"[DB] 商品数 {count} 超过快照上限 {self.max_rows}，商品查询直接访问数据库")
+                return None
+            intern = sys.intern
+            rows = [
+                (row[0], row[1], row[2], intern(row[3]), row[4], row[5],
+                 intern(row[6]) if row[6] else row[6], row[7], row[8], intern(row[9] or ""), row[10], row[11])
+                for row in conn.execute(f"SELECT {CATALOG_COLUMNS} FROM products ORDER BY rowid")
+            ]
+        except sqlite3.DatabaseError as e:
+            print(f"[DB] 警告: 商品目录快照加载失败，商品查询直接访问数据库: {e}")
+            return None
+        finally:
+            conn.close()
+        snapshot = CatalogSnapshot(rows, version)
+        self.reloads += 1
+        print(f"[DB] 商品目录快照已加载：{len(rows)} 个商品，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return snapshot
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._snapshot = None
+            self._version = None
@@ -1,8 +1,15 @@
 # services/product_mcp.py
 import os
-import sqlite3
 from typing import Optional, List, Tuple
 from mcp.server.fastmcp import FastMCP
+from db_pool import SQLitePool
+from server_transport import run_server
+from tool_output import record_json, resolve_format, select_fields, table_json
+from product_catalog import CATALOG_ENABLED, CatalogSnapshot, ProductCatalog
+from product_search import (
+    PRODUCT_FTS_TABLE, TRIGRAM_MIN_LENGTH, bm25_order, count_matches, match_expression, product_fts_available,
+    split_terms,
+)
 
 mcp = FastMCP("product_mcp")
 
@@ -11,86 +18,171 @@ DB_PATH = os.getenv("PRODUCT_DB_PATH", os.path.abspath(
     os.path.join(os.path.dirname(__file__), "../data/products.db")
 ))
 
+# 关键词命中超过该行数时不再逐行计算 bm25（常见词的相关度区分不大），改为按价格排序
+SEARCH_RANK_MAX_HITS = int(os.getenv("PRODUCT_SEARCH_RANK_MAX_HITS", "5000"))
+
+# 每个线程复用一条长连接，避免每次工具调用都重新建立连接；
+# 工具函数是异步的，查询（包括商品目录快照上的筛选）在读线程池中并行执行
+_pool = SQLitePool(DB_PATH)
+
+# 商品表索引和全文索引（FTS5 trigram）由 data/create_db.py 及批量导入脚本创建，服务启动时只检查、不执行 DDL；
+# 全文索引不存在时退回 LIKE 查询
+_FTS_ENABLED = product_fts_available(_pool.connection())
+
+# 商品目录内存快照：按ID/名称的查询和不含长关键词的筛选直接读内存，数据库变化（data_version）后自动重新加载
+_catalog = ProductCatalog(DB_PATH) if CATALOG_ENABLED else None
+
+_PRODUCT_DETAIL_COLUMNS = (
+    "p.product_id, p.product_name, p.description, p.category, p.price, p.stock, "
+    "p.brand, p.specifications, p.image_url, p.status, p.created_at, p.updated_at"
+)
+_PRODUCT_LIST_COLUMNS = (
+    "p.product_id, p.product_name, p.description, p.category, p.price, p.stock, "
+    "p.brand, p.specifications, p.image_url, p.status"
+)
+_PRODUCT_DETAIL_FIELDS = tuple(c.strip()[2:] for c in _PRODUCT_DETAIL_COLUMNS.split(","))
+_PRODUCT_LIST_FIELDS = tuple(c.strip()[2:] for c in _PRODUCT_LIST_COLUMNS.split(","))
+# json 格式默认返回的字段：详情不含图片链接和时间戳；搜索列表只含比较商品所需的字段，描述等按需通过 fields 获取
+_PRODUCT_INFO_DEFAULT_FIELDS = (
+    "product_id", "product_name", "category", "price", "stock", "brand", "description", "specifications", "status",
+)
+_PRODUCT_SEARCH_DEFAULT_FIELDS = ("product_id", "product_name", "price", "stock", "brand")
+# 过短（trigram 无法索引）的关键词在这些列上用 LIKE 匹配
+_LIKE_COLUMNS = ("p.product_name", "p.description", "p.brand", "p.specifications")
+
+
+def _like_clause(terms: List[str], columns=_LIKE_COLUMNS) -> Tuple[str, list]:
+    """每个词需在任一列中出现"""
+    clauses, params = [], []
+    for term in terms:
+        clauses.append("(" + " OR ".join(f"{c} LIKE ?" for c in columns) + ")")
+        params.extend([f"%{term}%"] * len(columns))
+    return " AND ".join(clauses), params
+
+
+def _snapshot() -> Optional[CatalogSnapshot]:
+    """当前的商品目录快照，未启用或商品数超过上限时为 None"""
+    return _catalog.current() if _catalog is not None else None
+
+
 def _fetch_product(product_id: str = None, product_name: str = None) -> Optional[Tuple]:
     """根据商品ID或名称查询单个商品"""
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
+    snapshot = _snapshot()
+    if snapshot is not None:
         if product_id:
+            return snapshot.get(product_id)
+        if product_name and product_name in snapshot.by_name:
+            return snapshot.by_name[product_name]
+
+    cur = _pool.connection().cursor()
+    if product_id:
+        cur.execute(
+            f"SELECT {_PRODUCT_DETAIL_COLUMNS} FROM products p WHERE p.product_id = ?",
+            (product_id,),
+        )
+    elif product_name:
+        if _FTS_ENABLED and len(product_name.strip()) >= TRIGRAM_MIN_LENGTH:
+            # 名称完全一致的优先，其余按名称列的 bm25 相关度；并列时与商品目录快照一致，按价格、商品ID
             cur.execute(
-                """
-                SELECT
-                    product_id, product_name, description, category, price, stock,
-                    brand, specifications, image_url, status, created_at, updated_at
-                FROM products WHERE product_id = ?
+                f"""
+                SELECT {_PRODUCT_DETAIL_COLUMNS}
+                FROM {PRODUCT_FTS_TABLE} f JOIN products p ON p.rowid = f.rowid
+                WHERE {PRODUCT_FTS_TABLE} MATCH ? AND p.status = '在售'
+                ORDER BY p.product_name = ? DESC, {bm25_order()}, p.price, p.product_id
+                LIMIT 1
                 """,
-                (product_id,),
+                (match_expression([product_name.strip()], column="product_name"), product_name.strip()),
             )
-        elif product_name:
+        elif snapshot is not None:
+            return snapshot.find_by_name(product_name)
+        else:
+            # 与 CatalogSnapshot.find_by_name 相同的顺序：名称完全一致的优先，其余按价格、商品ID
             cur.execute(
-                """
-                SELECT
-                    product_id, product_name, description, category, price, stock,
-                    brand, specifications, image_url, status, created_at, updated_at
-                FROM products WHERE product_name LIKE ? AND status = '在售'
+                f"""
+                SELECT {_PRODUCT_DETAIL_COLUMNS}
+                FROM products p WHERE p.product_name LIKE ? AND p.status = '在售'
+                ORDER BY p.product_name = ? DESC, p.price, p.product_id
                 LIMIT 1
                 """,
-                (f"%{product_name}%",),
+                (f"%{product_name}%", product_name),
             )
-        else:
-            return None
-        return cur.fetchone()
-    finally:
-        conn.close()
+    else:
+        return None
+    return cur.fetchone()
 
 
 def _search_products(keyword: str = None, category: str = None, max_price: float = None) -> List[Tuple]:
-    """搜索商品，支持关键词、分类、价格筛选"""
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-        query = "SELECT product_id, product_name, description, category, price, stock, brand, specifications, image_url, status FROM products WHERE status = '在售'"
+    """搜索商品，支持关键词、分类、价格筛选；有关键词时按相关度排序（命中过多时与无关键词相同，按价格从低到高）"""
+    long_terms, short_terms = split_terms(keyword) if keyword else ([], [])
+    if not _FTS_ENABLED:
+        long_terms, short_terms = [], long_terms + short_terms
+
+    if not long_terms:
+        # 只有分类/价格筛选或短关键词：在内存中按价格有序的数组上筛选
+        snapshot = _snapshot()
+        if snapshot is not None:
+            return snapshot.search(short_terms, category=category, max_price=max_price)
+
+    cur = _pool.connection().cursor()
+
+    if long_terms:
+        query = (f"SELECT {_PRODUCT_LIST_COLUMNS} FROM {PRODUCT_FTS_TABLE} f JOIN products p ON p.rowid = f.rowid "
+                 f"WHERE {PRODUCT_FTS_TABLE} MATCH ? AND p.status = '在售'")
+        params = [match_expression(long_terms)]
+    else:
+        query = f"SELECT {_PRODUCT_LIST_COLUMNS} FROM products p WHERE p.status = '在售'"
         params = []
-        
-        if keyword:
-            query += " AND (product_name LIKE ? OR description LIKE ?)"
-            params.extend([f"%{keyword}%", f"%{keyword}%"])
-        
-        if category:
-            query += " AND category = ?"
-            params.append(category)
-        
-        if max_price is not None:
-            query += " AND price <= ?"
-            params.append(max_price)
-        
-        query += " ORDER BY price ASC LIMIT 10"
-        
-        cur.execute(query, params)
-        return cur.fetchall()
-    finally:
-        conn.close()
+
+    if short_terms:
+        # trigram 无法索引少于 3 个字符的词：在全文索引命中的结果上过滤，没有长词时退化为 LIKE 扫描
+        clause, like_params = _like_clause(short_terms)
+        query += f" AND {clause}"
+        params.extend(like_params)
+
+    if category:
+        query += " AND p.category = ?"
+        params.append(category)
+
+    if max_price is not None:
+        query += " AND p.price <= ?"
+        params.append(max_price)
+
+    if long_terms and count_matches(cur.connection, params[0], SEARCH_RANK_MAX_HITS) <= SEARCH_RANK_MAX_HITS:
+        query += f" ORDER BY {bm25_order()}, p.price ASC LIMIT 10"
+    else:
+        query += " ORDER BY p.price ASC LIMIT 10"
+
+    cur.execute(query, params)
+    return cur.fetchall()
 
 
 @mcp.tool()
-def get_product_info(product_description: str) -> str:
+async def get_product_info(product_description: str, fields: Optional[List[str]] = None) -> str:
     """
     根据商品描述或名称获取商品详细信息。
     
     Args:
         product_description: 商品描述或名称，例如："夏科有线键鼠套装"、"M20洗衣机"等
+        fields: 只需部分信息时指定字段（返回 JSON），如 ["product_name", "specifications"]；可选 product_id/
+            product_name/description/category/price/stock/brand/specifications/image_url/status
     
     Returns:
         商品详情的字符串描述，包括名称、价格、库存、规格等
     """
-    print(f"[TOOL] 调用工具: get_product_info, 参数: product_description='{product_description}'")
+    print(f"[TOOL] 调用工具: get_product_info, 参数: product_description='{product_description}', "
+          f"fields={fields}")
+    output_format = resolve_format(fields)
+    try:
+        fields = select_fields(fields, _PRODUCT_DETAIL_FIELDS, _PRODUCT_INFO_DEFAULT_FIELDS)
+    except ValueError as e:
+        return str(e)
     
     # 先尝试精确匹配商品名称
-    record = _fetch_product(product_name=product_description)
+    record = await _pool.read(_fetch_product, product_name=product_description)
     
     if record is None:
         # 如果精确匹配失败，尝试模糊搜索
-        results = _search_products(keyword=product_description)
+        results = await _pool.read(_search_products, keyword=product_description)
         if not results:
             return f"未找到与「{product_description}」相关的商品，请检查商品名称是否正确，或尝试使用其他关键词搜索。"
         # 返回第一个匹配结果
@@ -99,6 +191,9 @@ def get_product_info(product_description: str) -> str:
         record = (record[0], record[1], record[2], record[3], record[4], record[5], 
                  record[6], record[7], record[8], record[9], None, None)
     
+    if output_format == "json":
+        return record_json(dict(zip(_PRODUCT_DETAIL_FIELDS, record)), fields)
+    
     (product_id, product_name, description, category, price, stock,
      brand, specifications, image_url, status, created_at, updated_at) = record
     
@@ -125,21 +220,29 @@ def get_product_info(product_description: str) -> str:
 
 
 @mcp.tool()
-def search_products(keyword: str = None, category: str = None, max_price: float = None) -> str:
+async def search_products(keyword: str = None, category: str = None, max_price: float = None,
+                          fields: Optional[List[str]] = None) -> str:
     """
     搜索商品，支持按关键词、分类、价格筛选。
     
     Args:
-        keyword: 搜索关键词，会在商品名称和描述中搜索
+        keyword: 搜索关键词，会在商品名称、描述、品牌和规格中搜索，多个关键词用空格分隔
         category: 商品分类，例如："电脑外设"、"家用电器"、"网络设备"
         max_price: 最高价格（元），只返回价格不超过此值的商品
+        fields: 只需部分信息时指定每个商品的字段（返回 JSON），如 ["product_name", "price"]；字段同 get_product_info
     
     Returns:
         符合条件的商品列表
     """
-    print(f"[TOOL] 调用工具: search_products, 参数: keyword='{keyword}', category='{category}', max_price={max_price}")
+    print(f"[TOOL] 调用工具: search_products, 参数: keyword='{keyword}', category='{category}', max_price={max_price}, "
+          f"fields={fields}")
+    output_format = resolve_format(fields)
+    try:
+        fields = select_fields(fields, _PRODUCT_LIST_FIELDS, _PRODUCT_SEARCH_DEFAULT_FIELDS)
+    except ValueError as e:
+        return str(e)
     
-    results = _search_products(keyword=keyword, category=category, max_price=max_price)
+    results = await _pool.read(_search_products, keyword=keyword, category=category, max_price=max_price)
     
     if not results:
         filters = []
@@ -153,6 +256,9 @@ def search_products(keyword: str = None, category: str = None, max_price: float
         filter_str = "、".join(filters) if filters else "当前条件"
         return f"未找到符合{filter_str}的商品，请尝试调整搜索条件。"
     
+    if output_format == "json":
+        return table_json([dict(zip(_PRODUCT_LIST_FIELDS, row)) for row in results], fields)
+    
     result = f"找到 {len(results)} 个符合条件的商品：\n\n"
     for i, (product_id, product_name, description, category, price, stock, brand, specifications, image_url, status) in enumerate(results, 1):
         result += f"{i}. {product_name}\n"
@@ -169,7 +275,7 @@ def search_products(keyword: str = None, category: str = None, max_price: float
 
 
 @mcp.tool()
-def get_product_basic_info(product_name: str) -> str:
+async def get_product_basic_info(product_name: str) -> str:
     """
     获取指定商品的基本信息（价格和库存）。
     
@@ -181,7 +287,7 @@ def get_product_basic_info(product_name: str) -> str:
     """
     print(f"[TOOL] 调用工具: get_product_basic_info, 参数: product_name='{product_name}'")
     
-    record = _fetch_product(product_name=product_name)
+    record = await _pool.read(_fetch_product, product_name=product_name)
     if record is None:
         return f"未找到商品「{product_name}」，请检查商品名称是否正确。"
     
@@ -212,4 +318,4 @@ def get_product_basic_info(product_name: str) -> str:
     return result
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    run_server(mcp, default_port=8102)
@@ -0,0 +1,33 @@
+# Mcpserver/product_schema.py
+import re
+import sqlite3
+
+# 商品表索引，对应 product_mcp 的查询：
+# - 无关键词/短关键词搜索：status = '在售' [AND price <= ?] ORDER BY price，沿索引按价格顺序读取，凑够 10 条即停止
+# - 短名称查找（无全文索引时的 LIKE）：status = '在售' 的行中名称完全一致的优先，其余按 price, product_id，
+#   需要检查全部在售商品后排序（只在全文索引和商品目录快照都不可用时执行）
+# - 按分类搜索：status = '在售' AND category = ? [AND price <= ?] ORDER BY price
+PRODUCT_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_products_status_price ON products(status, price)",
+    "CREATE INDEX IF NOT EXISTS idx_products_status_category_price ON products(status, category, price)",
+]
+
+
+def ensure_product_indexes(conn: sqlite3.Connection) -> bool:
+    """确保商品表索引存在（已有数据库由 data/create_db.py 补建）；数据库只读或表不存在时返回 False"""
+    try:
+        with conn:
+            for statement in PRODUCT_INDEXES:
+                conn.execute(statement)
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"[DB] 警告: 无法创建商品表索引: {e}")
+        return False
+
+
+def drop_product_indexes(conn: sqlite3.Connection) -> None:
+    """删除商品表二级索引（批量导入前调用，导入完成后用 ensure_product_indexes 一次性重建）"""
+    with conn:
+        for statement in PRODUCT_INDEXES:
+            name = re.search(r"CREATE INDEX IF NOT EXISTS (\w+)", statement).group(1)
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
@@ -0,0 +1,114 @@
+# Mcpserver/product_search.py
+import re
+import sqlite3
+from typing import List, Optional, Tuple
+
+# 商品全文索引：external content 表（不重复存储正文），trigram 分词对中文和英文型号都按连续 3 字符切分
+PRODUCT_FTS_TABLE = "products_fts"
+PRODUCT_FTS_COLUMNS = ("product_name", "description", "brand", "specifications")
+# bm25 各列权重：名称 > 品牌 > 描述 > 规格
+PRODUCT_FTS_WEIGHTS = (10.0, 2.0, 5.0, 1.0)
+# trigram 分词下短于 3 个字符的词无法命中索引
+TRIGRAM_MIN_LENGTH = 3
+
+_COLUMNS = ", ".join(PRODUCT_FTS_COLUMNS)
+_NEW_VALUES = ", ".join(f"new.{c}" for c in PRODUCT_FTS_COLUMNS)
+_OLD_VALUES = ", ".join(f"old.{c}" for c in PRODUCT_FTS_COLUMNS)
+
+PRODUCT_FTS_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCT_FTS_TABLE} USING fts5(
+        {_COLUMNS},
+        content='products', content_rowid='rowid', tokenize='trigram'
+    )
+    """,
+    # 触发器保持索引与 products 表同步；只有被索引的列变化时才更新（库存、价格变化不触发）
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.rowid, {_NEW_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.rowid, {_OLD_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF {_COLUMNS} ON products BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.rowid, {_OLD_VALUES});
+        INSERT INTO {PRODUCT_FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.rowid, {_NEW_VALUES});
+    END
+    """,
+]
+
+
+def ensure_product_fts(conn: sqlite3.Connection) -> bool:
+    """
+    确保商品全文索引及同步触发器存在；索引是新建的则从 products 表全量构建一次。
+
+    Returns:
+        bool: 全文索引是否可用（SQLite 未编译 FTS5 或版本低于 3.34 不支持 trigram 时返回 False）
+    """
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (PRODUCT_FTS_TABLE,)
+        ).fetchone() is not None
+        with conn:
+            for statement in PRODUCT_FTS_SCHEMA:
+                conn.execute(statement)
+            if not exists:
+                conn.execute(f"INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}) VALUES ('rebuild')")
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"[DB] 警告: 商品全文索引不可用，将使用 LIKE 查询: {e}")
+        return False
+
+
+def product_fts_available(conn: sqlite3.Connection) -> bool:
+    """商品全文索引是否已建立（只读检查，不存在时提示运行 data/create_db.py 补建）"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (PRODUCT_FTS_TABLE,)
+    ).fetchone() is not None
+    if not exists:
+        print(f"[DB] 警告: 商品全文索引 {PRODUCT_FTS_TABLE} 不存在，将使用 LIKE 查询（运行 python data/create_db.py 补建）")
+    return exists
+
+
+def drop_product_fts(conn: sqlite3.Connection) -> None:
+    """删除商品全文索引及同步触发器（批量导入前调用，避免逐行触发；导入后 ensure_product_fts 全量重建）"""
+    with conn:
+        for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute(f"DROP TABLE IF EXISTS {PRODUCT_FTS_TABLE}")
+
+
+def split_terms(keyword: str) -> Tuple[List[str], List[str]]:
+    """按空白拆分关键词，返回 (可走全文索引的词, 过短只能用 LIKE 的词)"""
+    terms = [t for t in re.split(r"\s+", keyword.strip()) if t]
+    long_terms = [t for t in terms if len(t) >= TRIGRAM_MIN_LENGTH]
+    short_terms = [t for t in terms if len(t) < TRIGRAM_MIN_LENGTH]
+    return long_terms, short_terms
+
+
+def match_expression(terms: List[str], column: Optional[str] = None) -> str:
+    """
+    构造 FTS5 MATCH 表达式：每个词作为短语（双引号转义），多个词之间为 AND。
+
+    Args:
+        column: 只在指定列中匹配
+    """
+    phrases = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    return f"{column} : ({phrases})" if column else phrases
+
+
+def count_matches(conn: sqlite3.Connection, expression: str, limit: int) -> int:
+    """统计命中行数，最多数到 limit + 1（只读倒排索引，不计算相关度）"""
+    return conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM {PRODUCT_FTS_TABLE} WHERE {PRODUCT_FTS_TABLE} MATCH ? LIMIT ?)",
+        (expression, limit + 1),
+    ).fetchone()[0]
+
+
+def bm25_order() -> str:
+    """按各列权重计算的 bm25 排序表达式（值越小越相关）"""
+    return f"bm25({PRODUCT_FTS_TABLE}, {', '.join(str(w) for w in PRODUCT_FTS_WEIGHTS)})"
@@ -0,0 +1,59 @@
+# Mcpserver/server_transport.py
+import os
+import sys
+import logging
+from mcp.server.fastmcp import FastMCP
+
+# 服务端传输方式（从环境变量读取）：
+# - stdio：由智能体进程以子进程方式启动（默认，与原来一致）
+# - streamable-http：作为共享的长驻工具服务运行，多个 uvicorn worker / 评测进程通过 HTTP 调用同一组服务
+MCP_SERVER_TRANSPORT = os.getenv("MCP_SERVER_TRANSPORT", "stdio")
+MCP_SERVER_HOST = os.getenv("MCP_SERVER_HOST", "127.0.0.1")
+# HTTP 服务端口；未设置时使用各服务自己的默认端口（订单 8101，商品 8102）
+MCP_SERVER_PORT = os.getenv("MCP_SERVER_PORT")
+MCP_SERVER_LOG_LEVEL = os.getenv("MCP_SERVER_LOG_LEVEL", "WARNING")
+
+
+class _LogsToStderr:
+    """
+    stdio 模式下 stdout 是 JSON-RPC 通道：MCP SDK 的 stdio_server 直接写 sys.stdout.buffer（原 stdout），
+    工具函数的 print 日志（文本写入）改写到 stderr。
+    否则日志在管道上被块缓冲，整块插进响应行中间，客户端解析失败后会一直等待这条响应
+    """
+
+    def __init__(self, protocol_stdout):
+        self.buffer = protocol_stdout.buffer
+
+    def write(self, text: str) -> int:
+        return sys.stderr.write(text)
+
+    def flush(self) -> None:
+        sys.stderr.flush()
+
+    def __getattr__(self, name):
+        return getattr(sys.stderr, name)
+
+
+def _run_stdio(mcp: FastMCP) -> None:
+    sys.stdout = _LogsToStderr(sys.stdout)
+    mcp.run(transport="stdio")
+
+
+def run_server(mcp: FastMCP, default_port: int) -> None:
+    """按 MCP_SERVER_TRANSPORT 启动 MCP 服务"""
+    if MCP_SERVER_TRANSPORT == "stdio":
+        _run_stdio(mcp)
+        return
+    if MCP_SERVER_TRANSPORT != "streamable-http":
+        raise ValueError(f"不支持的 MCP_SERVER_TRANSPORT: {MCP_SERVER_TRANSPORT}（可选 stdio / streamable-http）")
+
+    mcp.settings.host = MCP_SERVER_HOST
+    mcp.settings.port = int(MCP_SERVER_PORT or default_port)
+    # 无状态 + 直接返回 JSON：每个请求独立处理，不需要会话粘滞，同一服务的多个副本之间可以任意分发请求
+    mcp.settings.stateless_http = True
+    mcp.settings.json_response = True
+    # 每次工具调用的 INFO 级请求日志在高并发下开销明显，默认只输出警告
+    mcp.settings.log_level = MCP_SERVER_LOG_LEVEL
+    logging.getLogger().setLevel(MCP_SERVER_LOG_LEVEL)
+    print(f"[MCP] {mcp.name} 监听 http://{mcp.settings.host}:{mcp.settings.port}{mcp.settings.streamable_http_path}")
+    mcp.run(transport="streamable-http")
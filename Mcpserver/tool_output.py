@@ -0,0 +1,54 @@
+# Mcpserver/tool_output.py
+import os
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+# 工具返回格式（从环境变量读取）：
+# - text：带中文标签的多行文本（默认，与原来一致）
+# - json：紧凑 JSON，只包含默认字段或调用方通过 fields 指定的字段，长文本截断，减少回传给模型的 token
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "text")
+OUTPUT_FORMATS = ("text", "json")
+# json 格式下单个字符串字段的最大字符数，超出部分截断；0 表示不截断
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "80"))
+
+if TOOL_OUTPUT_FORMAT not in OUTPUT_FORMATS:
+    raise ValueError(f"不支持的 TOOL_OUTPUT_FORMAT: {TOOL_OUTPUT_FORMAT}（可选 {' / '.join(OUTPUT_FORMATS)}）")
+
+
+def resolve_format(fields: Optional[Sequence[str]]) -> str:
+    """本次调用的返回格式：调用方指定了 fields 时为 json，否则使用 TOOL_OUTPUT_FORMAT"""
+    return "json" if fields else TOOL_OUTPUT_FORMAT
+
+
+def select_fields(fields: Optional[Sequence[str]], available: Sequence[str], default: Sequence[str]) -> List[str]:
+    """校验调用方指定的字段（去重并保持顺序），未指定时返回默认字段"""
+    if not fields:
+        return list(default)
+    fields = list(dict.fromkeys(f.strip() for f in fields if f and f.strip()))
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(f"不支持的字段：{'、'.join(unknown)}，可选字段：{', '.join(available)}")
+    return fields or list(default)
+
+
+def compact_value(value: Any, max_chars: int = TOOL_OUTPUT_MAX_CHARS) -> Any:
+    """字符串超过 max_chars 时截断并以 … 结尾"""
+    if isinstance(value, str) and 0 < max_chars < len(value):
+        return value[:max_chars] + "…"
+    return value
+
+
+def to_json(obj: Any) -> str:
+    """不转义中文、不带多余空白的 JSON"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def record_json(record: Dict[str, Any], fields: Sequence[str]) -> str:
+    """单条记录：{字段: 值}，值为 None 的字段省略"""
+    return to_json({f: compact_value(record[f]) for f in fields if record.get(f) is not None})
+
+
+def table_json(records: List[Dict[str, Any]], fields: Sequence[str], **extra: Any) -> str:
+    """多条记录：字段名只出现一次，{"count": n, "fields": [...], "rows": [[...], ...]}"""
+    rows = [[compact_value(record.get(f)) for f in fields] for record in records]
+    return to_json({**extra, "count": len(records), "fields": list(fields), "rows": rows})
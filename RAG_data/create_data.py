@@ -1,26 +1,21 @@
 import os
 
-# 尝试导入 python-docx，如果没有则提示安装
-try:
-    from docx import Document
-    from docx.shared import Pt
-    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-except ImportError:
-    print("正在安装 python-docx 库...")
-    os.system("pip install python-docx")
-    from docx import Document
-    from docx.shared import Pt
-    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-
-# 创建输出目录
-output_dir = "RAG_Test_Data"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+
+def _import_docx():
+    """按需导入 python-docx，如果没有则提示安装"""
+    try:
+        from docx import Document
+    except ImportError:
+        print("正在安装 python-docx 库...")
+        os.system("pip install python-docx")
+        from docx import Document
+    return Document
+
 
 # ==========================================
-# 1. 生成 TXT 文件 (法务/协议类)
+# 1. TXT 文件 (法务/协议类)
 # ==========================================
-txt_content = """电商平台售后服务协议条款（2025修订版）
+TXT_CONTENT = """电商平台售后服务协议条款（2025修订版）
 
 第一条 术语定义
 1.1 "七天无理由退货"是指消费者在签收商品之日起七日内（含七日），在保证商品完好、不影响二次销售的前提下，可以申请无理由退货。
@@ -36,15 +31,11 @@ txt_content = """电商平台售后服务协议条款（2025修订版）
 3.2 积分与优惠券：订单发生部分退款时，优先退还现金部分，积分与优惠券按比例折算，若优惠券已过期则不予补发。
 """
 
-with open(f"{output_dir}/01_平台售后服务协议_法务版.txt", "w", encoding="utf-8") as f:
-    f.write(txt_content)
-print(f"✅ TXT 文件已生成: {output_dir}/01_平台售后服务协议_法务版.txt")
-
 
 # ==========================================
-# 2. 生成 MD 文件 (用户指南/Wiki类)
+# 2. MD 文件 (用户指南/Wiki类)
 # ==========================================
-md_content = """# 用户帮助中心 - 退换货指南
+MD_CONTENT = """# 用户帮助中心 - 退换货指南
 
 ## 🌟 核心政策快读
 * **不满意？** 7天内随便退（只要没坏）。
@@ -73,44 +64,77 @@ md_content = """# 用户帮助中心 - 退换货指南
 3.  请在包裹内附上一张纸条，写明：**订单号、联系人电话、退货原因**。
 """
 
-with open(f"{output_dir}/02_用户帮助中心_常见问题.md", "w", encoding="utf-8") as f:
-    f.write(md_content)
-print(f"✅ Markdown 文件已生成: {output_dir}/02_用户帮助中心_常见问题.md")
+
+def write_text_file(path: str, content: str) -> None:
+    """写入 UTF-8 文本文件（TXT / MD）"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
 
 
 # ==========================================
-# 3. 生成 DOCX 文件 (内部SOP/表格类)
+# 3. DOCX 文件 (内部SOP/表格类)
 # ==========================================
-doc = Document()
-doc.add_heading('客服内部售后处理标准流程 (SOP)', 0)
-doc.add_paragraph('密级：仅限内部传阅', style='Subtitle')
-
-# 章节 1
-doc.add_heading('第一章：特殊权限审批', level=1)
-p = doc.add_paragraph()
-p.add_run('1. 遇到强力投诉用户（情绪激动等级 > 3级）：').bold = True
-doc.add_paragraph('   - 一线客服可申请 20元 无门槛优惠券作为安抚。')
-doc.add_paragraph('   - 若用户坚持退货但已过7天（7-15天内）：')
-doc.add_paragraph('     - 银牌以上会员：主管可特批"例外退货"，但需由用户承担运费。')
-doc.add_paragraph('     - 普通用户：严格执行拒绝策略，但可赠送积分。')
-
-p = doc.add_paragraph()
-p.add_run('2. 拆封后退货的特殊处理：').bold = True
-doc.add_paragraph('   - 数码产品（已开机）：原则上拒绝。但如果用户是 V5 钻石会员，且每年退货率 < 10%，可申请"折旧退货"，扣除 15% 折旧费后退款。')
-
-# 章节 2
-doc.add_heading('第二章：恶意退货识别（风控）', level=1)
-doc.add_paragraph('若系统提示"高风险用户"或该用户同ID下最近一个月退货超过 5 单：')
-doc.add_paragraph('1. 必须要求用户先寄回商品，仓库进行视频拆包验货。', style='List Number')
-doc.add_paragraph('2. 严禁使用"极速退款"功能。', style='List Number')
-doc.add_paragraph('3. 若发现商品被调包，直接报警并封禁账号。', style='List Number')
-
-# 章节 3
-doc.add_heading('第三章：大促期间（双11/618）临时调整', level=1)
-doc.add_paragraph('由于物流压力，大促期间"未收到货"的仅退款申请，等待期由 3 天延长至 7 天。请统一话术回复用户："因大促物流积压，请您耐心等待。"')
-
-doc_path = f"{output_dir}/03_客服内部执行手册_SOP.docx"
-doc.save(doc_path)
-print(f"✅ Word 文件已生成: {doc_path}")
-
-print("\n🎉 所有测试文件已生成完毕，请查看 RAG_Test_Data 文件夹！")
\ No newline at end of file
+def build_sop_docx(path: str, extra_sections=()) -> None:
+    """
+    生成客服内部 SOP 手册（.docx）。
+
+    Args:
+        path: 输出路径
+        extra_sections: 追加的 (章节标题, 段落列表) 序列，用于生成不同版本的手册
+    """
+    Document = _import_docx()
+    doc = Document()
+    doc.add_heading('客服内部售后处理标准流程 (SOP)', 0)
+    doc.add_paragraph('密级：仅限内部传阅', style='Subtitle')
+
+    # 章节 1
+    doc.add_heading('第一章：特殊权限审批', level=1)
+    p = doc.add_paragraph()
+    p.add_run('1. 遇到强力投诉用户（情绪激动等级 > 3级）：').bold = True
+    doc.add_paragraph('   - 一线客服可申请 20元 无门槛优惠券作为安抚。')
+    doc.add_paragraph('   - 若用户坚持退货但已过7天（7-15天内）：')
+    doc.add_paragraph('     - 银牌以上会员：主管可特批"例外退货"，但需由用户承担运费。')
+    doc.add_paragraph('     - 普通用户：严格执行拒绝策略，但可赠送积分。')
+
+    p = doc.add_paragraph()
+    p.add_run('2. 拆封后退货的特殊处理：').bold = True
+    doc.add_paragraph('   - 数码产品（已开机）：原则上拒绝。但如果用户是 V5 钻石会员，且每年退货率 < 10%，可申请"折旧退货"，扣除 15% 折旧费后退款。')
+
+    # 章节 2
+    doc.add_heading('第二章：恶意退货识别（风控）', level=1)
+    doc.add_paragraph('若系统提示"高风险用户"或该用户同ID下最近一个月退货超过 5 单：')
+    doc.add_paragraph('1. 必须要求用户先寄回商品，仓库进行视频拆包验货。', style='List Number')
+    doc.add_paragraph('2. 严禁使用"极速退款"功能。', style='List Number')
+    doc.add_paragraph('3. 若发现商品被调包，直接报警并封禁账号。', style='List Number')
+
+    # 章节 3
+    doc.add_heading('第三章：大促期间（双11/618）临时调整', level=1)
+    doc.add_paragraph('由于物流压力，大促期间"未收到货"的仅退款申请，等待期由 3 天延长至 7 天。请统一话术回复用户："因大促物流积压，请您耐心等待。"')
+    for heading, paragraphs in extra_sections:
+        doc.add_heading(heading, level=1)
+        for paragraph in paragraphs:
+            doc.add_paragraph(paragraph)
+
+    doc.save(path)
+
+
+def main(output_dir: str = "RAG_Test_Data") -> None:
+    """生成三份示例知识库文档"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    write_text_file(f"{output_dir}/01_平台售后服务协议_法务版.txt", TXT_CONTENT)
+    print(f"✅ TXT 文件已生成: {output_dir}/01_平台售后服务协议_法务版.txt")
+
+    write_text_file(f"{output_dir}/02_用户帮助中心_常见问题.md", MD_CONTENT)
+    print(f"✅ Markdown 文件已生成: {output_dir}/02_用户帮助中心_常见问题.md")
+
+    doc_path = f"{output_dir}/03_客服内部执行手册_SOP.docx"
+    build_sop_docx(doc_path)
+    print(f"✅ Word 文件已生成: {doc_path}")
+
+    print(f"\n🎉 所有测试文件已生成完毕，请查看 {output_dir} 文件夹！")
+
+
+if __name__ == "__main__":
+    main()
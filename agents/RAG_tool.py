@@ -1,115 +1,1104 @@
 import os
-from langchain_community.document_loaders import TextLoader, Docx2txtLoader, UnstructuredMarkdownLoader, DirectoryLoader
+import re
+import json
+import asyncio
+import hashlib
+import shutil
+import pickle
+import random
+import threading
+import zipfile
+import faiss
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from xml.etree import ElementTree
+from langchain_community.document_loaders import TextLoader, Docx2txtLoader, UnstructuredMarkdownLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.tools import create_retriever_tool
-from typing import List
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from langchain_core.documents import Document
 from dotenv import load_dotenv
+from embedding_cache import CachedEmbeddings
+from bm25_index import BM25Index, tokenize
+from result_cache import SemanticResultCache
+from context_packer import PackingStats, pack_context
+from ingest_pipeline import FileTask, ingest
 
 # 加载环境变量
 load_dotenv()
 
 # Embedding 配置（从环境变量读取，与 model.py 保持一致的风格）
 EMBEDDING_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-if not EMBEDDING_API_KEY:
-    raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-0.6B")
 EMBEDDING_BASE_URL = os.getenv("EMBEDDING_BASE_URL", "https://api.siliconflow.cn/v1")
+# Embedding 请求批大小、并发数和重试次数
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
 
 # 定义数据目录
 DATA_DIR = os.path.join(os.path.dirname(__file__), "../RAG_data")
 
-# 全局变量缓存 retriever，避免每次调用都重新构建索引
-_cached_retriever = None
+# 索引持久化目录（可通过环境变量覆盖），FAISS 索引与 manifest 存放在其 faiss 子目录下
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../RAG_index")
+))
+FAISS_INDEX_DIR = os.path.join(RAG_INDEX_DIR, "faiss")
+MANIFEST_FILE = "manifest.json"
+# Embedding 缓存放在 faiss 子目录之外，索引整体替换时不受影响
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(RAG_INDEX_DIR, "embedding_cache.sqlite3"))
+# manifest 结构变化时递增，旧索引会被视为过期
+MANIFEST_VERSION = 3
+
+# 切分参数
+CHUNK_SIZE = 500    # 每个切片500字符
+CHUNK_OVERLAP = 50  # 重叠50字符，保持上下文连贯
+# 切分方式：structure（默认，按标题/条款切分，每个章节或条款一个片段）/ recursive（按字符数切分）
+RAG_CHUNKER = os.getenv("RAG_CHUNKER", "structure")
+
+# 文档导入：解析切分使用的进程数和每批向量化的片段数。
+# 默认 1（在当前进程中解析）：服务中的预热/增量更新处理的文档很少，且向量化才是瓶颈，启动进程池反而更慢；
+# 解析很重的离线构建（如 evaluation/benchmark_rag.py --ingest-workers）可开多进程
+RAG_INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "1"))
+RAG_INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", "256"))
+
+# 向量索引模式：flat（默认，float32 全量内存索引）/ ivfpq（IVF + 乘积量化）/ sq8（IVF + int8 标量量化）
+# 量化模式下索引文件以内存映射方式打开，多个 uvicorn worker 共享同一份物理页
+RAG_INDEX_MODE = os.getenv("RAG_INDEX_MODE", "flat")
+RAG_IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "1024"))  # 倒排列表数量上限（实际取值会按片段数缩小）
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))  # 每次查询扫描的倒排列表数量，越大召回越高、越慢
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "0"))  # PQ 子向量个数，0 表示自动选择（不超过 64 且能整除维度）
+RAG_RECALL_SAMPLE = int(os.getenv("RAG_RECALL_SAMPLE", "200"))  # 评估量化索引召回率时抽样的查询数
+QUANTIZED_META_FILE = "quantized.json"
+# 每个聚类中心至少需要的训练样本数（FAISS 的建议值），PQ 每个子空间有 256 个中心
+_MIN_POINTS_PER_CENTROID = 39
+_PQ_MIN_TRAIN = 256 * _MIN_POINTS_PER_CENTROID
+
+# 检索配置
+# 检索模式：vector（纯向量）/ hybrid（BM25 + 向量融合，默认）/ lexical（纯 BM25，不调用 Embedding）
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+RAG_TOP_K = 3  # 每次召回最相关的3个片段
+# hybrid 模式下的关键词快速路径（跳过 Embedding）需同时满足：查询至少有 MIN_TERMS 个不同的词、
+# BM25 首条结果覆盖查询词的比例达到 MIN_COVERAGE、首条得分比第二条高出 MIN_MARGIN（相对比例）。
+# 一两个词的短查询（如"退款时效"）几乎总能被某个片段完全覆盖，覆盖率不能说明结果可靠，仍走融合检索
+RAG_LEXICAL_MIN_COVERAGE = float(os.getenv("RAG_LEXICAL_MIN_COVERAGE", "0.8"))
+RAG_LEXICAL_MIN_TERMS = int(os.getenv("RAG_LEXICAL_MIN_TERMS", "4"))
+RAG_LEXICAL_MIN_MARGIN = float(os.getenv("RAG_LEXICAL_MIN_MARGIN", "0.2"))
+# 倒数排名融合（RRF）的平滑常数
+RRF_K = 60
+
+# 上下文打包：检索结果正文的 token 上限（0 表示不限制）和 MMR 中相关度的权重
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1000"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+
+# 检索结果缓存：容量（0 表示关闭）、存活时间（秒）和近似命中的余弦相似度阈值
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "256"))
+RAG_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "600"))
+RAG_CACHE_SIMILARITY = float(os.getenv("RAG_CACHE_SIMILARITY", "0.95"))
+
+# 异步检索时用于执行 Embedding 请求和向量检索的线程数
+RAG_QUERY_WORKERS = int(os.getenv("RAG_QUERY_WORKERS", "8"))
+
+# 支持的文档类型及对应的加载器
+_LOADERS = {
+    ".txt": (TextLoader, {"encoding": "utf-8"}),
+    ".md": (UnstructuredMarkdownLoader, {}),
+    ".docx": (Docx2txtLoader, {}),
+}
+
+
+class KnowledgeBase(NamedTuple):
+    """一次构建得到的知识库快照：向量索引、倒排索引及其 manifest"""
+    vectorstore: FAISS
+    bm25: BM25Index
+    manifest: dict
+    generation: int  # 对应的检索结果缓存 generation
+
+
+# 全局变量缓存当前知识库快照，避免每次调用都重新构建索引。
+# 重建/增量更新时整体替换引用，正在进行的查询继续使用旧快照。
+_cached_kb: Optional[KnowledgeBase] = None
+_embeddings = None
+_result_cache = SemanticResultCache(RAG_CACHE_SIZE, RAG_CACHE_TTL, RAG_CACHE_SIMILARITY)
+_packing_stats = PackingStats()
+# 最近一次文档导入（全量构建或增量更新）的分阶段统计
+_last_ingest_report: Optional[dict] = None
+_state_lock = threading.Lock()
+# 保证同一时刻只有一个增量更新在运行
+_reindex_lock = threading.Lock()
+# 索引构建（single-flight）：并发的首次请求共享同一个 Future，只触发一次构建
+_build_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-build")
+_build_future: Optional[Future] = None
+_build_future_lock = threading.Lock()
+# 异步检索的执行线程池，避免阻塞事件循环
+_query_executor = ThreadPoolExecutor(max_workers=RAG_QUERY_WORKERS, thread_name_prefix="rag-query")
+# 文件哈希缓存：path -> (mtime_ns, size, sha256)，轮询时跳过未修改文件的哈希计算
+_file_hash_cache: Dict[str, Tuple[int, int, str]] = {}
+
+
+def _discover_files(directory: str) -> List[str]:
+    """递归列出目录下所有受支持的文档（忽略隐藏文件），按路径排序保证结果稳定"""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(names):
+            if name.startswith("."):
+                continue
+            if os.path.splitext(name)[1].lower() in _LOADERS:
+                files.append(os.path.join(root, name))
+    return files
+
+
+def _load_file(path: str) -> List[Document]:
+    """使用与扩展名匹配的加载器加载单个文件"""
+    loader_cls, loader_kwargs = _LOADERS[os.path.splitext(path)[1].lower()]
+    return loader_cls(path, **loader_kwargs).load()
+
 
 def load_documents(directory: str) -> List[Document]:
-    """加载指定目录下的多种格式文档"""
+    """加载指定目录下的多种格式文档（.txt / .md / .docx）"""
     documents = []
-    
-    # 1. 加载 .txt
-    txt_loader = DirectoryLoader(directory, glob="**/*.txt", loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"})
-    documents.extend(txt_loader.load())
-    
-    # 2. 加载 .md
-    md_loader = DirectoryLoader(directory, glob="**/*.md", loader_cls=UnstructuredMarkdownLoader)
-    documents.extend(md_loader.load())
-    
-    # 3. 加载 .docx
-    docx_loader = DirectoryLoader(directory, glob="**/*.docx", loader_cls=Docx2txtLoader)
-    documents.extend(docx_loader.load())
-    
+    for path in _discover_files(directory):
+        documents.extend(_load_file(path))
+
     print(f"[RAG] 已加载 {len(documents)} 个文档")
     return documents
 
-def _get_retriever():
-    """获取或初始化检索器（单例模式）"""
-    global _cached_retriever
-    if _cached_retriever is not None:
-        return _cached_retriever
 
-    # 1. 加载文档
-    if not os.path.exists(DATA_DIR):
-        print(f"[RAG] 警告: 数据目录不存在 {DATA_DIR}")
+def _file_sha256(path: str) -> str:
+    """计算文件内容的 SHA-256（mtime 和大小未变时复用上次结果）"""
+    stat = os.stat(path)
+    cached = _file_hash_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+    _file_hash_cache[path] = (stat.st_mtime_ns, stat.st_size, sha)
+    return sha
+
+
+def _relpath(path: str, directory: str) -> str:
+    """manifest 和 chunk id 中使用的相对路径（统一为 / 分隔）"""
+    return os.path.relpath(path, directory).replace(os.sep, "/")
+
+
+def _index_settings() -> dict:
+    """影响索引内容的全部配置，任何一项变化都必须全量重建"""
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": EMBEDDING_MODEL,
+        "splitter": {"chunker": RAG_CHUNKER, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP},
+    }
+
+
+def _scan_corpus(directory: str) -> Dict[str, str]:
+    """扫描语料目录，返回 {相对路径: 内容哈希}"""
+    return {_relpath(path, directory): _file_sha256(path) for path in _discover_files(directory)}
+
+
+def _manifest_matches(saved: Optional[dict], settings: dict, file_hashes: Dict[str, str]) -> bool:
+    """判断 manifest 是否与当前配置和语料一致"""
+    if not saved or saved.get("settings") != settings:
+        return False
+    saved_files = saved.get("files", {})
+    return {rel: entry.get("sha256") for rel, entry in saved_files.items()} == file_hashes
+
+
+def _read_manifest(index_dir: str) -> Optional[dict]:
+    """读取磁盘上的 manifest，不存在或损坏时返回 None"""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
         return None
-        
-    docs = load_documents(DATA_DIR)
-    
-    if not docs:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[RAG] 警告: manifest 读取失败，将重建索引: {e}")
+        return None
+
+
+def _load_persisted_vectorstore(index_dir: str, settings: dict, file_hashes: Dict[str, str],
+                                embeddings) -> Tuple[Optional[FAISS], Optional[dict]]:
+    """
+    manifest 与当前语料一致时从磁盘加载索引（不产生任何 Embedding 调用）。
+
+    Returns:
+        (vectorstore, manifest)，索引过期或不存在时返回 (None, None)
+    """
+    saved = _read_manifest(index_dir)
+    if saved is None:
+        return None, None
+    if not _manifest_matches(saved, settings, file_hashes):
+        print("[RAG] 检测到语料或配置变化，磁盘索引已过期")
+        return None, None
+    try:
+        if RAG_INDEX_MODE != "flat":
+            vectorstore = _load_quantized_vectorstore(index_dir, saved, embeddings)
+            if vectorstore is not None:
+                return vectorstore, saved
+        # 索引文件由本进程自己写入，可以安全反序列化 docstore
+        vectorstore = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+        vectorstore = _serving_vectorstore(vectorstore, saved, index_dir, embeddings)
+    except Exception as e:
+        print(f"[RAG] 警告: 磁盘索引加载失败，将重建索引: {e}")
+        return None, None
+    print(f"[RAG] 已从磁盘加载索引: {index_dir}")
+    return vectorstore, saved
+
+
+def _manifest_digest(manifest: dict) -> str:
+    """manifest 的摘要，用于把量化索引和生成它的 flat 索引对应起来"""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _quantized_params() -> dict:
+    """影响量化索引内容的配置（nprobe 只影响查询，不在其中）"""
+    return {"mode": RAG_INDEX_MODE, "nlist": RAG_IVF_NLIST, "pq_m": RAG_PQ_M}
+
+
+def _quantize_index(flat_index) -> Tuple[object, str]:
+    """
+    由 flat 索引训练出量化索引。
+
+    片段数量不足以训练 PQ 码本时自动退回 sq8。
+
+    Returns:
+        (量化索引, 实际使用的模式)
+    """
+    d, n = flat_index.d, flat_index.ntotal
+    vectors = flat_index.reconstruct_n(0, n)
+    nlist = max(1, min(RAG_IVF_NLIST, n // _MIN_POINTS_PER_CENTROID))
+    mode = RAG_INDEX_MODE
+
+    if mode == "ivfpq" and n < _PQ_MIN_TRAIN:
+        print(f"[RAG] 片段数 {n} 不足以训练 PQ 码本（至少 {_PQ_MIN_TRAIN}），改用 sq8 量化")
+        mode = "sq8"
+
+    if mode == "ivfpq":
+        m = RAG_PQ_M or max(m for m in range(1, min(64, d) + 1) if d % m == 0)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, m, 8)
+    else:
+        index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(d), d, nlist, faiss.ScalarQuantizer.QT_8bit)
+
+    # 顺序添加，量化索引中的序号与 flat 索引一致，可直接复用 index_to_docstore_id
+    index.train(vectors)
+    index.add(vectors)
+    return index, mode
+
+
+def _measure_recall(flat_index, quantized_index, k: int = 10) -> float:
+    """以 flat 索引的精确结果为基准，抽样评估量化索引的 recall@k"""
+    n = flat_index.ntotal
+    if n == 0:
+        return 1.0
+    k = min(k, n)
+    sample = random.Random(0).sample(range(n), min(RAG_RECALL_SAMPLE, n))
+    queries = np.vstack([flat_index.reconstruct(i) for i in sample])
+    _, truth = flat_index.search(queries, k)
+    _, approx = quantized_index.search(queries, k)
+    hits = sum(len(set(t) & set(a)) for t, a in zip(truth.tolist(), approx.tolist()))
+    return hits / (len(sample) * k)
+
+
+def _set_nprobe(index) -> None:
+    faiss.extract_index_ivf(index).nprobe = RAG_IVF_NPROBE
+
+
+def _write_quantized_index(flat_index, manifest: dict, index_dir: str) -> None:
+    """训练量化索引并写入 index_dir，同时记录参数和相对 flat 索引的召回率"""
+    quantized, mode = _quantize_index(flat_index)
+    _set_nprobe(quantized)
+    recall = _measure_recall(flat_index, quantized)
+
+    path = os.path.join(index_dir, f"index.{RAG_INDEX_MODE}")
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    faiss.write_index(quantized, tmp_path)
+    os.replace(tmp_path, path)
+
+    meta = {
+        "params": _quantized_params(),
+        "effective_mode": mode,
+        "nprobe": RAG_IVF_NPROBE,
+        "ntotal": flat_index.ntotal,
+        "recall_at_10": round(recall, 4),
+        "file_bytes": os.path.getsize(path),
+        "flat_bytes": flat_index.ntotal * flat_index.d * 4,
+        "manifest_digest": _manifest_digest(manifest),
+    }
+    tmp_meta = os.path.join(index_dir, f"{QUANTIZED_META_FILE}.tmp-{os.getpid()}")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_meta, os.path.join(index_dir, QUANTIZED_META_FILE))
+    print(f"[RAG] 量化索引（{mode}）已生成: {meta['file_bytes']} 字节（flat {meta['flat_bytes']} 字节），"
+          f"nprobe={RAG_IVF_NPROBE} 时 recall@10={recall:.3f}")
+
+
+def _load_quantized_vectorstore(index_dir: str, manifest: dict, embeddings) -> Optional[FAISS]:
+    """
+    以内存映射方式打开量化索引，只反序列化 docstore，不把 flat 索引读入内存。
+
+    量化索引不存在、参数变化或与当前 manifest 不对应时返回 None。
+    """
+    meta_path = os.path.join(index_dir, QUANTIZED_META_FILE)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("params") != _quantized_params() or meta.get("manifest_digest") != _manifest_digest(manifest):
+        return None
+
+    path = os.path.join(index_dir, f"index.{RAG_INDEX_MODE}")
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        print(f"[RAG] 警告: 量化索引无法以内存映射方式打开，改为完整读入: {e}")
+        index = faiss.read_index(path)
+    _set_nprobe(index)
+
+    # index.pkl 由 save_local 写入，内容为 (docstore, index_to_docstore_id)
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    print(f"[RAG] 已以内存映射方式加载量化索引（{meta['effective_mode']}，"
+          f"recall@10={meta['recall_at_10']}）: {path}")
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def _serving_vectorstore(flat: FAISS, manifest: dict, index_dir: str, embeddings) -> FAISS:
+    """
+    返回用于在线检索的索引：flat 模式直接使用 flat 索引；
+    量化模式优先打开磁盘上的量化索引，缺失或过期时先从 flat 索引派生。
+    """
+    if RAG_INDEX_MODE == "flat":
+        return flat
+    vectorstore = _load_quantized_vectorstore(index_dir, manifest, embeddings)
+    if vectorstore is None:
+        try:
+            _write_quantized_index(flat.index, manifest, index_dir)
+            vectorstore = _load_quantized_vectorstore(index_dir, manifest, embeddings)
+        except (OSError, RuntimeError) as e:
+            print(f"[RAG] 警告: 量化索引生成失败，继续使用 flat 索引: {e}")
+    return vectorstore or flat
+
+
+def get_index_report() -> Optional[dict]:
+    """当前量化索引的参数、大小和相对 flat 基线的召回率（flat 模式返回 None）"""
+    if RAG_INDEX_MODE == "flat":
+        return None
+    try:
+        with open(os.path.join(FAISS_INDEX_DIR, QUANTIZED_META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_vectorstore(vectorstore: FAISS, manifest: dict, index_dir: str) -> None:
+    """
+    将索引、docstore 和 manifest 写入磁盘。
+
+    先写入进程私有的临时目录再整体替换，避免其他进程读到写了一半的索引；
+    manifest 最后写入，保证它只描述完整的索引。
+    """
+    tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+    old_dir = f"{index_dir}.old-{os.getpid()}"
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        vectorstore.save_local(tmp_dir)
+        if RAG_INDEX_MODE != "flat":
+            _write_quantized_index(vectorstore.index, manifest, tmp_dir)
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        if os.path.exists(index_dir):
+            os.replace(index_dir, old_dir)
+        os.replace(tmp_dir, index_dir)
+        print(f"[RAG] 索引已保存到磁盘: {index_dir}")
+    except (OSError, RuntimeError) as e:
+        # 保存失败不影响本进程继续使用内存中的索引
+        print(f"[RAG] 警告: 索引保存失败: {e}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _get_embeddings() -> CachedEmbeddings:
+    """获取带磁盘缓存的 Embedding（单例，使用文件开头定义的配置常量）"""
+    global _embeddings
+    if _embeddings is None:
+        # 延迟到首次使用时检查，离线评测等场景可以不配置 API Key 导入本模块
+        if not EMBEDDING_API_KEY:
+            raise ValueError("未找到 SILICONFLOW_API_KEY 环境变量，请检查 .env 文件")
+        remote = OpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            openai_api_base=EMBEDDING_BASE_URL,
+            openai_api_key=EMBEDDING_API_KEY,
+            check_embedding_ctx_length=False,
+            chunk_size=EMBEDDING_BATCH_SIZE,
+            max_retries=0  # 重试由缓存层统一处理
+        )
+        _embeddings = CachedEmbeddings(
+            remote,
+            model_name=EMBEDDING_MODEL,
+            cache_path=EMBEDDING_CACHE_PATH,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            max_concurrency=EMBEDDING_CONCURRENCY,
+            max_retries=EMBEDDING_MAX_RETRIES
+        )
+    return _embeddings
+
+
+# 纯文本/Word 中的标题："第一章" / "第二节" / "第三条" 开头的行，级别依次递增
+_TEXT_HEADING_RE = re.compile(r"^第[一二三四五六七八九十百零〇两\d]+([编章节条])")
+_TEXT_HEADING_LEVELS = {"编": 1, "章": 1, "节": 2, "条": 3}
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+# 条款/列表项的起始行："1.1"、"1."、"2、"、"- " 等，章节过长时在这些行之前断开
+_CLAUSE_START_RE = re.compile(r"^\s*(\d+(\.\d+)+|\d+[.、)）]|[-*•]\s)")
+# docx 正文 XML 的命名空间前缀
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# 段落中产生文本的节点：文字、制表符、换行
+_DOCX_TEXT_NODES = {
+    f"{_W}t": lambda node: node.text or "",
+    f"{_W}tab": lambda node: "\t",
+    f"{_W}br": lambda node: "\n",
+}
+
+
+class _Section(NamedTuple):
+    headings: List[str]  # 从文档标题到本章节的标题路径
+    lines: List[str]
+
+
+def _build_sections(blocks: List[Tuple[Optional[int], str]]) -> List[_Section]:
+    """
+    把 (标题级别, 文本) 序列组织成章节，级别为 None 的是正文行。
+
+    遇到标题时按级别回退标题栈，之后的正文都归入该标题下；只有标题没有正文的章节不单独成片段。
+    """
+    sections, stack, lines = [], [], []
+
+    def flush():
+        if any(line.strip() for line in lines):
+            sections.append(_Section([title for _, title in stack], list(lines)))
+        lines.clear()
+
+    for level, text in blocks:
+        if level is None:
+            lines.append(text)
+            continue
+        flush()
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, text.strip()))
+    flush()
+    return sections
+
+
+def _text_blocks(text: str) -> List[Tuple[Optional[int], str]]:
+    """纯文本：首个非空行视为文档标题，"第X章/第X条" 行视为各级标题"""
+    blocks, seen_title = [], False
+    for line in text.splitlines():
+        stripped = line.strip()
+        match = _TEXT_HEADING_RE.match(stripped)
+        if match:
+            blocks.append((_TEXT_HEADING_LEVELS[match.group(1)], stripped))
+        elif stripped and not seen_title and not _CLAUSE_START_RE.match(stripped):
+            blocks.append((0, stripped))
+        else:
+            blocks.append((None, line))
+        seen_title = seen_title or bool(stripped)
+    return blocks
+
+
+def _markdown_blocks(text: str) -> List[Tuple[Optional[int], str]]:
+    """Markdown：按 # 标题分级（代码块内的 # 不视为标题）"""
+    blocks, in_code = [], False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else _MD_HEADING_RE.match(line)
+        blocks.append((len(match.group(1)), match.group(2)) if match else (None, line))
+    return blocks
+
+
+def _docx_style_names(styles_xml: bytes, style_ids) -> Dict[str, str]:
+    """
+    从 styles.xml 中查出给定样式 id 的样式名（如 Heading1 → heading 1）。
+
+    模板自带的 styles.xml 往往有数百 KB，整体解析比正文还慢，这里只按字节查找用到的少数几个样式。
+    """
+    names = {}
+    for style_id in style_ids:
+        start = styles_xml.find(f'w:styleId="{style_id}"'.encode("utf-8"))
+        if start < 0:
+            continue
+        end = styles_xml.find(b"</w:style>", start)
+        match = re.search(rb'<w:name w:val="([^"]*)"', styles_xml[start:end if end > 0 else None])
+        if match:
+            names[style_id] = match.group(1).decode("utf-8")
+    return names
+
+
+def _docx_blocks(path: str) -> List[Tuple[Optional[int], str]]:
+    """
+    Word：直接解析 docx 中的 XML，按段落样式识别标题（Title 为 0 级，Heading N 为 N 级）。
+
+    只读取 word/document.xml 和 word/styles.xml，不依赖 python-docx。
+    """
+    paragraphs = []
+    with zipfile.ZipFile(path) as archive:
+        document = ElementTree.fromstring(archive.read("word/document.xml"))
+        for paragraph in document.iter(f"{_W}p"):
+            style = paragraph.find(f"{_W}pPr/{_W}pStyle")
+            text = "".join(_DOCX_TEXT_NODES[node.tag](node) for node in paragraph.iter()
+                           if node.tag in _DOCX_TEXT_NODES)
+            paragraphs.append((style.get(f"{_W}val", "") if style is not None else "", text))
+
+        style_ids = {style_id for style_id, _ in paragraphs if style_id}
+        try:
+            style_names = _docx_style_names(archive.read("word/styles.xml"), style_ids)
+        except KeyError:
+            style_names = {}
+
+    blocks = []
+    for style_id, text in paragraphs:
+        name = style_names.get(style_id, style_id).lower().replace(" ", "")
+        if name == "title":
+            blocks.append((0, text))
+        elif name.startswith("heading") and name[len("heading"):].isdigit():
+            blocks.append((int(name[len("heading"):]), text))
+        else:
+            blocks.append((None, text))
+    return blocks
+
+
+def _parse_sections(path: str) -> List[_Section]:
+    """按文件格式解析出章节结构"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".docx":
+        return _build_sections(_docx_blocks(path))
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return _build_sections(_markdown_blocks(text) if ext == ".md" else _text_blocks(text))
+
+
+def _split_section(section: _Section, breadcrumb: str) -> List[str]:
+    """
+    章节正文不超过 CHUNK_SIZE 时整体作为一个片段；
+    否则在条款/列表项的起始行处断开并尽量合并到 CHUNK_SIZE 以内，单个条款仍过长时按字符数切分。
+    """
+    limit = max(CHUNK_SIZE - len(breadcrumb) - 1, CHUNK_SIZE // 2)
+    body = "\n".join(section.lines).strip()
+    if len(body) <= limit:
+        return [body]
+
+    # 按条款切成单元，每个单元包含条款行及其后的续行
+    units: List[str] = []
+    for line in body.splitlines():
+        if not units or (_CLAUSE_START_RE.match(line) and line.strip()):
+            units.append(line)
+        else:
+            units[-1] += "\n" + line
+
+    fallback = RecursiveCharacterTextSplitter(chunk_size=limit, chunk_overlap=CHUNK_OVERLAP)
+    pieces, current = [], ""
+    for unit in (u.strip() for u in units):
+        if not unit:
+            continue
+        if len(unit) > limit:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.extend(fallback.split_text(unit))
+        elif current and len(current) + 1 + len(unit) > limit:
+            pieces.append(current)
+            current = unit
+        else:
+            current = f"{current}\n{unit}" if current else unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _structured_split(path: str) -> List[Document]:
+    """
+    按文档结构切分：每个章节/条款一个片段，片段开头带上标题路径（面包屑），
+    使片段脱离上下文也能被正确理解和检索；标题路径同时写入 metadata。
+    """
+    chunks = []
+    for section in _parse_sections(path):
+        breadcrumb = " > ".join(section.headings)
+        for piece in _split_section(section, breadcrumb):
+            content = f"{breadcrumb}\n{piece}" if breadcrumb else piece
+            chunks.append(Document(
+                page_content=content,
+                metadata={"source": path, "breadcrumb": breadcrumb,
+                          "section": section.headings[-1] if section.headings else ""},
+            ))
+    return chunks
+
+
+def _split_file(path: str, rel: str, sha: str) -> List[Document]:
+    """
+    加载并切分单个文件，为每个片段分配稳定的 id。
+
+    id 由相对路径、内容哈希和序号组成，增量更新时据此删除旧片段。
+    """
+    if RAG_CHUNKER == "structure":
+        splits = _structured_split(path)
+    else:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            add_start_index=True  # 记录片段在原文中的偏移，供上下文打包合并相邻片段
+        )
+        splits = text_splitter.split_documents(_load_file(path))
+    for i, chunk in enumerate(splits):
+        chunk.id = f"{rel}#{sha[:12]}#{i}"
+    return splits
+
+
+def _ingest_files(directory: str, rels: List[str], file_hashes: Dict[str, str], embeddings,
+                  vectorstore: Optional[FAISS] = None) -> Tuple[Optional[FAISS], Dict[str, dict]]:
+    """
+    以流水线方式解析、切分、向量化指定文件并写入索引（新建或在已有索引上追加），
+    返回索引和这些文件的 manifest 条目。
+    """
+    global _last_ingest_report
+    tasks = [FileTask(os.path.join(directory, rel), rel, file_hashes[rel]) for rel in rels]
+    workers = max(1, min(RAG_INGEST_WORKERS, len(tasks)))
+    vectorstore, files, report = ingest(tasks, _split_file, embeddings, vectorstore,
+                                        workers=workers, batch_size=RAG_INGEST_BATCH_SIZE)
+    _last_ingest_report = report.as_dict()
+    print(f"[RAG] 文档导入完成: {report.summary()}")
+    return vectorstore, files
+
+
+def _build_vectorstore(directory: str, settings: dict, file_hashes: Dict[str, str],
+                       embeddings) -> Tuple[Optional[FAISS], Optional[dict]]:
+    """加载、切分并向量化全部文档，构建新的 FAISS 索引及其 manifest"""
+    vectorstore, files = _ingest_files(directory, list(file_hashes), file_hashes, embeddings)
+    if vectorstore is None:
         print("[RAG] 警告: 未找到任何文档")
+        return None, None
+    return vectorstore, {"settings": settings, "files": files}
+
+
+def get_ingest_report() -> Optional[dict]:
+    """最近一次文档导入的分阶段吞吐量与失败文件（本进程尚未导入过文档时返回 None）"""
+    return _last_ingest_report
+
+
+def _build_bm25(vectorstore: FAISS) -> BM25Index:
+    """用向量索引 docstore 中的同一批片段构建倒排索引（纯本地计算，无需持久化）"""
+    items = []
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        doc = vectorstore.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            items.append((doc_id, doc.page_content))
+    return BM25Index(items)
+
+
+def _set_state(vectorstore: Optional[FAISS], manifest: Optional[dict]) -> None:
+    """整体替换当前知识库快照（进行中的查询仍持有旧快照的引用，不受影响）"""
+    global _cached_kb
+    bm25 = _build_bm25(vectorstore) if vectorstore is not None else None
+    # 索引即将变化，先作废基于旧索引的检索结果，再发布新快照
+    generation = _result_cache.invalidate()
+    kb = KnowledgeBase(vectorstore, bm25, manifest, generation) if vectorstore is not None else None
+    with _state_lock:
+        _cached_kb = kb
+
+
+def _start_build() -> Future:
+    """
+    启动（或加入）知识库构建。
+
+    构建在专用线程中执行，并发调用拿到的是同一个 Future；
+    上一次构建失败时重新发起，使后续请求可以重试。
+    """
+    global _build_future
+    with _build_future_lock:
+        future = _build_future
+        # 构建抛出异常、没有产出索引，或产出的索引之后被清空，都需要重新构建
+        stale = future is not None and future.done() and (future.exception() is not None or _cached_kb is None)
+        if future is None or stale:
+            future = _build_executor.submit(_load_or_build_knowledge_base)
+            _build_future = future
+        return future
+
+
+def _get_knowledge_base() -> Optional[KnowledgeBase]:
+    """获取或初始化知识库快照（单例模式），首次调用会等待构建完成"""
+    if _cached_kb is not None:
+        return _cached_kb
+    return _start_build().result()
+
+
+async def _aget_knowledge_base() -> Optional[KnowledgeBase]:
+    """_get_knowledge_base 的异步版本：等待构建期间不阻塞事件循环"""
+    if _cached_kb is not None:
+        return _cached_kb
+    # shield：等待方被取消时不能连带取消共享的构建任务
+    return await asyncio.shield(asyncio.wrap_future(_start_build()))
+
+
+def is_knowledge_base_ready() -> bool:
+    """知识库快照是否已就绪（可立即检索）"""
+    return _cached_kb is not None
+
+
+async def warmup_knowledge_base() -> bool:
+    """
+    预热知识库：在后台启动索引构建（或磁盘加载）并等待完成。
+
+    与首个 get_policy 请求共享同一次构建，不会重复构建。
+
+    Returns:
+        bool: 是否成功就绪
+    """
+    return await _aget_knowledge_base() is not None
+
+
+def _load_or_build_knowledge_base() -> Optional[KnowledgeBase]:
+    """从磁盘加载索引或重新构建，发布知识库快照"""
+    with _reindex_lock:
+        # 等锁期间可能已由其他线程完成初始化
+        if _cached_kb is not None:
+            return _cached_kb
+
+        # 1. 检查数据目录
+        if not os.path.exists(DATA_DIR):
+            print(f"[RAG] 警告: 数据目录不存在 {DATA_DIR}")
+            return None
+
+        # 2. 语料与配置未变化时直接加载磁盘索引，否则重建并保存
+        embeddings = _get_embeddings()
+        settings = _index_settings()
+        file_hashes = _scan_corpus(DATA_DIR)
+        vectorstore, manifest = _load_persisted_vectorstore(FAISS_INDEX_DIR, settings, file_hashes, embeddings)
+        if vectorstore is None:
+            vectorstore, manifest = _build_vectorstore(DATA_DIR, settings, file_hashes, embeddings)
+            if vectorstore is None:
+                return None
+            _save_vectorstore(vectorstore, manifest, FAISS_INDEX_DIR)
+            vectorstore = _serving_vectorstore(vectorstore, manifest, FAISS_INDEX_DIR, embeddings)
+
+        # 3. 构建倒排索引并发布快照
+        _set_state(vectorstore, manifest)
+        return _cached_kb
+
+
+def _rebuild_all(settings: dict, file_hashes: Dict[str, str], embeddings) -> None:
+    """全量重建、保存并发布新快照（调用方需持有 _reindex_lock）"""
+    vectorstore, manifest = _build_vectorstore(DATA_DIR, settings, file_hashes, embeddings)
+    if vectorstore is not None:
+        _save_vectorstore(vectorstore, manifest, FAISS_INDEX_DIR)
+        vectorstore = _serving_vectorstore(vectorstore, manifest, FAISS_INDEX_DIR, embeddings)
+    _set_state(vectorstore, manifest)
+
+
+def _editable_copy(kb: KnowledgeBase, embeddings) -> Optional[FAISS]:
+    """
+    得到一份可修改的 flat 索引副本。
+
+    在线使用 flat 索引时直接复制；量化索引是只读内存映射且有损，
+    改为从磁盘读入 flat 索引（磁盘内容与当前快照不一致时返回 None，由调用方全量重建）。
+    """
+    if faiss.try_extract_index_ivf(kb.vectorstore.index) is None:
+        return FAISS.deserialize_from_bytes(
+            kb.vectorstore.serialize_to_bytes(), embeddings, allow_dangerous_deserialization=True
+        )
+    if _read_manifest(FAISS_INDEX_DIR) != kb.manifest:
+        return None
+    try:
+        return FAISS.load_local(FAISS_INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
+    except Exception as e:
+        print(f"[RAG] 警告: 磁盘 flat 索引加载失败: {e}")
+        return None
+
+
+def reindex_knowledge_base() -> dict:
+    """
+    增量更新知识库索引：找出新增、修改和删除的文件，
+    删除其旧片段并只对新片段做向量化，完成后整体替换当前索引。
+
+    更新在索引副本上进行，期间 query_knowledge_base 继续使用旧索引。
+    可由管理接口调用，也可以定时轮询。
+
+    Returns:
+        dict: 本次更新的摘要（新增/修改/删除的文件及片段数量）
+    """
+    summary = {"added": [], "changed": [], "deleted": [], "failed": [],
+               "chunks_added": 0, "chunks_removed": 0, "full_rebuild": False}
+
+    if _cached_kb is None:
+        # 尚未初始化：直接走完整的加载/构建流程
+        summary["full_rebuild"] = True
+        _get_knowledge_base()
+        return summary
+
+    with _reindex_lock:
+        if not os.path.exists(DATA_DIR):
+            print(f"[RAG] 警告: 数据目录不存在 {DATA_DIR}")
+            return summary
+
+        embeddings = _get_embeddings()
+        settings = _index_settings()
+        file_hashes = _scan_corpus(DATA_DIR)
+        current = _cached_kb
+        old_manifest = current.manifest if current else {}
+        old_files = old_manifest.get("files", {})
+
+        # 配置变化或当前没有可用索引时，只能全量重建
+        if old_manifest.get("settings") != settings or current is None:
+            print("[RAG] 索引配置已变化，执行全量重建")
+            _rebuild_all(settings, file_hashes, embeddings)
+            summary["full_rebuild"] = True
+            summary["added"] = sorted(file_hashes)
+            return summary
+
+        summary["added"] = sorted(rel for rel in file_hashes if rel not in old_files)
+        summary["deleted"] = sorted(rel for rel in old_files if rel not in file_hashes)
+        summary["changed"] = sorted(
+            rel for rel, sha in file_hashes.items()
+            if rel in old_files and old_files[rel].get("sha256") != sha
+        )
+        if not (summary["added"] or summary["deleted"] or summary["changed"]):
+            return summary
+
+        # 在副本上修改，避免影响正在进行的检索
+        working = _editable_copy(current, embeddings)
+        if working is None:
+            print("[RAG] 无法获得可修改的索引副本，执行全量重建")
+            _rebuild_all(settings, file_hashes, embeddings)
+            summary["full_rebuild"] = True
+            return summary
+        files = {rel: entry for rel, entry in old_files.items() if rel in file_hashes}
+
+        # 1. 删除修改/删除文件的旧片段
+        existing_ids = set(working.index_to_docstore_id.values())
+        stale_ids = [
+            chunk_id
+            for rel in summary["changed"] + summary["deleted"]
+            for chunk_id in old_files[rel].get("chunk_ids", [])
+            if chunk_id in existing_ids
+        ]
+        if stale_ids:
+            working.delete(stale_ids)
+        summary["chunks_removed"] = len(stale_ids)
+
+        # 2. 只对新增/修改文件的片段做向量化
+        to_ingest = summary["added"] + summary["changed"]
+        if to_ingest:
+            working, new_files = _ingest_files(DATA_DIR, to_ingest, file_hashes, embeddings, working)
+            files.update(new_files)
+            summary["chunks_added"] = sum(len(entry["chunk_ids"]) for entry in new_files.values())
+            summary["failed"] = sorted(rel for rel, entry in new_files.items() if "error" in entry)
+
+        manifest = {"settings": settings, "files": files}
+        _save_vectorstore(working, manifest, FAISS_INDEX_DIR)
+        _set_state(_serving_vectorstore(working, manifest, FAISS_INDEX_DIR, embeddings), manifest)
+
+    print(f"[RAG] 增量更新完成: 新增 {len(summary['added'])}，修改 {len(summary['changed'])}，"
+          f"删除 {len(summary['deleted'])} 个文件；"
+          f"+{summary['chunks_added']} / -{summary['chunks_removed']} 个片段")
+    return summary
+
+
+def _vector_search(kb: KnowledgeBase, query_embedding: List[float], k: int) -> List[str]:
+    """在 FAISS 索引中按向量检索，返回片段 id（按相似度从高到低）"""
+    index = kb.vectorstore.index
+    if index.ntotal == 0:
+        return []
+    _, indices = index.search(np.array([query_embedding], dtype=np.float32), min(k, index.ntotal))
+    id_map = kb.vectorstore.index_to_docstore_id
+    return [id_map[i] for i in indices[0] if i != -1 and i in id_map]
+
+
+def _fuse_rankings(rankings: List[List[str]], k: int) -> List[str]:
+    """倒数排名融合（RRF）：对多个排序结果按 1 / (RRF_K + 名次) 累加得分"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def _lookup_documents(kb: KnowledgeBase, doc_ids: List[str]) -> List[Document]:
+    """根据片段 id 从 docstore 取回文档"""
+    docs = []
+    for doc_id in doc_ids:
+        doc = kb.vectorstore.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            docs.append(doc)
+    return docs
+
+
+def _lexical_fast_path(kb: KnowledgeBase, query: str, k: int) -> Optional[List[Document]]:
+    """
+    关键词快速路径：lexical 模式，或 hybrid 模式下查询词足够多、BM25 首条结果覆盖了几乎全部查询词
+    且明显领先第二条时，直接返回倒排索引的结果，不发起 Embedding 请求。不满足条件时返回 None。
+    """
+    if RAG_RETRIEVAL_MODE == "vector":
+        return None
+    lexical = kb.bm25.search(query, max(k, 2))
+    if RAG_RETRIEVAL_MODE == "lexical" or _confident_lexical_hit(query, lexical):
+        return _lookup_documents(kb, [hit.doc_id for hit in lexical[:k]])
+    return None
+
+
+def _confident_lexical_hit(query: str, lexical: list) -> bool:
+    """BM25 首条结果是否足以代替融合检索（见 RAG_LEXICAL_MIN_TERMS / COVERAGE / MARGIN）"""
+    if not lexical or len(set(tokenize(query))) < RAG_LEXICAL_MIN_TERMS:
+        return False
+    if lexical[0].coverage < RAG_LEXICAL_MIN_COVERAGE:
+        return False
+    return len(lexical) == 1 or lexical[0].score >= lexical[1].score * (1 + RAG_LEXICAL_MIN_MARGIN)
+
+
+def _retrieve(kb: KnowledgeBase, query: str, query_embedding: List[float], k: int = RAG_TOP_K) -> List[Document]:
+    """
+    用已计算好的查询向量检索最相关的 k 个片段。
+
+    hybrid 模式下与 BM25 结果做 RRF 融合，兼顾精确术语和语义相似；vector 模式只用向量检索。
+    """
+    if RAG_RETRIEVAL_MODE == "vector":
+        return _lookup_documents(kb, _vector_search(kb, query_embedding, k))
+
+    fetch_k = max(k * 3, 10)
+    lexical_ids = [hit.doc_id for hit in kb.bm25.search(query, fetch_k)]
+    vector_ids = _vector_search(kb, query_embedding, fetch_k)
+    return _lookup_documents(kb, _fuse_rankings([lexical_ids, vector_ids], k))
+
+
+def build_knowledge_base(directory: str, embeddings=None) -> Optional[KnowledgeBase]:
+    """
+    在内存中为任意目录构建知识库快照（不读写磁盘索引，也不替换在线快照），供评测脚本使用。
+
+    Args:
+        directory: 语料目录
+        embeddings: Embedding 实现，默认使用带缓存的远程 Embedding
+
+    Returns:
+        KnowledgeBase，目录中没有文档时返回 None
+    """
+    embeddings = embeddings or _get_embeddings()
+    vectorstore, manifest = _build_vectorstore(directory, _index_settings(), _scan_corpus(directory), embeddings)
+    if vectorstore is None:
         return None
+    return KnowledgeBase(vectorstore, _build_bm25(vectorstore), manifest, 0)
+
+
+def search_knowledge_base(kb: KnowledgeBase, query: str, k: int = RAG_TOP_K, embeddings=None) -> List[Document]:
+    """
+    在指定快照上检索（不经过结果缓存），检索路径与 query_knowledge_base 相同。
+
+    Args:
+        kb: build_knowledge_base 返回的快照
+        query: 查询语句
+        k: 返回的片段数量
+        embeddings: 计算查询向量所用的 Embedding，需与构建时一致
+    """
+    docs = _lexical_fast_path(kb, query, k)
+    if docs is None:
+        query_embedding = (embeddings or _get_embeddings()).embed_query(query)
+        docs = _retrieve(kb, query, query_embedding, k)
+    return docs
+
+
+def _format_result(query: str, docs: List[Document]) -> str:
+    """打包（合并、去重、按 token 预算截断）并拼接检索结果"""
+    if not docs:
+        return "未在知识库中找到相关信息。"
+
+    packed = pack_context(query, docs, RAG_CONTEXT_TOKEN_BUDGET, RAG_MMR_LAMBDA)
+    _packing_stats.record(packed)
+    print(f"[RAG] 上下文打包: {len(docs)} 个片段 / {packed.raw_tokens} tokens → "
+          f"{len(packed.passages)} 段 / {packed.packed_tokens} tokens（节省 {packed.saved_tokens}）")
+
+    result_text = "根据知识库检索到的信息：\n\n"
+    for i, passage in enumerate(packed.passages, 1):
+        result_text += f"--- 相关片段 {i} ---\n{passage}\n\n"
+
+    return result_text
+
+
+def get_policy_cache_stats() -> dict:
+    """检索结果缓存与 Embedding 缓存的命中统计，以及上下文打包节省的 token"""
+    stats = {"result_cache": _result_cache.stats(), "context_packing": _packing_stats.stats()}
+    if _embeddings is not None:
+        stats["embedding_cache"] = {"hits": _embeddings.hits, "misses": _embeddings.misses}
+    return stats
 
-    # 2. 切分文档
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,  # 每个切片500字符
-        chunk_overlap=50 # 重叠50字符，保持上下文连贯
-    )
-    splits = text_splitter.split_documents(docs)
-    print(f"[RAG] 文档切分完成，共 {len(splits)} 个片段")
-
-    # 3. 初始化 Embedding（使用文件开头定义的配置常量）
-    embeddings = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_base=EMBEDDING_BASE_URL,
-        openai_api_key=EMBEDDING_API_KEY,
-        check_embedding_ctx_length=False
-    )
-    
-    # 4. 创建向量库 (使用 FAISS)
-    vectorstore = FAISS.from_documents(splits, embeddings)
-    
-    # 5. 创建检索器
-    _cached_retriever = vectorstore.as_retriever(
-        search_type="similarity", # 相似度搜索
-        search_kwargs={"k": 3}    # 每次召回最相关的3个片段
-    )
-    
-    return _cached_retriever
 
 def query_knowledge_base(query: str) -> str:
     """
     直接查询知识库，返回检索到的文本内容拼接字符串
-    
+
+    结果会进入检索结果缓存：相同的查询直接返回，语义相近的查询（查询向量余弦相似度超过阈值）复用已有结果。
+
     Args:
         query (str): 查询语句
-        
+
     Returns:
         str: 检索到的相关文档内容
     """
-    retriever = _get_retriever()
-    if not retriever:
+    # 1. 精确命中缓存
+    cached = _result_cache.get(query)
+    if cached is not None:
+        return cached
+
+    kb = _get_knowledge_base()
+    if not kb:
         return "知识库暂时无法使用（初始化失败）。"
-        
-    # 执行检索
-    docs = retriever.invoke(query)
-    
-    if not docs:
-        return "未在知识库中找到相关信息。"
-        
-    # 拼接结果
-    result_text = "根据知识库检索到的信息：\n\n"
-    for i, doc in enumerate(docs, 1):
-        result_text += f"--- 相关片段 {i} ---\n{doc.page_content}\n\n"
-        
+
+    # 2. 关键词快速路径，无需查询向量
+    docs = _lexical_fast_path(kb, query, RAG_TOP_K)
+    query_embedding = None
+    if docs is None:
+        # 3. 近似命中缓存，查询向量同时用于后续的向量检索
+        query_embedding = _get_embeddings().embed_query(query)
+        cached = _result_cache.get_similar(query_embedding)
+        if cached is not None:
+            _result_cache.put(query, cached, query_embedding, kb.generation)
+            return cached
+        # 4. 执行检索
+        docs = _retrieve(kb, query, query_embedding)
+    else:
+        # 关键词快速路径同样记为一次缓存未命中
+        _result_cache.record_miss()
+
+    result_text = _format_result(query, docs)
+    _result_cache.put(query, result_text, query_embedding, kb.generation)
     return result_text
+
+
+async def aquery_knowledge_base(query: str) -> str:
+    """
+    query_knowledge_base 的异步版本。
+
+    精确命中缓存时直接返回；首次使用时等待共享的索引构建；
+    Embedding 请求和检索在线程池中执行，不阻塞事件循环上其他用户的请求。
+
+    Args:
+        query (str): 查询语句
+
+    Returns:
+        str: 检索到的相关文档内容
+    """
+    cached = _result_cache.get(query)
+    if cached is not None:
+        return cached
+
+    kb = await _aget_knowledge_base()
+    if not kb:
+        return "知识库暂时无法使用（初始化失败）。"
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_query_executor, query_knowledge_base, query)
@@ -0,0 +1,94 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# 连续的汉字串，或连续的字母/数字（允许 "1.1" 这类条款编号）
+_TOKEN_RE = re.compile(r"[\u4e00-\u9fff]+|[a-z0-9]+(?:\.[0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中文友好的分词：汉字串切成字符二元组（单字保留为一元组），字母数字按词切分。
+
+    不依赖分词词典，"七天无理由" 会切成 七天/天无/无理/理由，
+    能稳定命中包含该短语的条款。
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        segment = match.group()
+        if "\u4e00" <= segment[0] <= "\u9fff":
+            if len(segment) == 1:
+                tokens.append(segment)
+            else:
+                tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            tokens.append(segment)
+    return tokens
+
+
+class LexicalHit(NamedTuple):
+    """一条倒排索引检索结果"""
+    doc_id: str
+    score: float
+    coverage: float  # 查询词（去重后）在该片段中出现的比例
+
+
+class BM25Index:
+    """基于内存倒排表的 BM25 检索"""
+
+    def __init__(self, items: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            items: (片段 id, 片段文本) 序列
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_len: List[int] = []
+        # 词 -> [(片段序号, 词频)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for doc_id, text in items:
+            index = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            counts = Counter(tokenize(text))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((index, tf))
+
+        self.avgdl = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_ids)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int) -> List[LexicalHit]:
+        """返回 BM25 得分最高的 k 个片段"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_ids:
+            return []
+
+        scores: Dict[int, float] = {}
+        matched: Dict[int, int] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for index, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[index] / self.avgdl)
+                scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[index] = matched.get(index, 0) + 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            LexicalHit(self.doc_ids[index], score, matched[index] / len(terms))
+            for index, score in ranked
+        ]
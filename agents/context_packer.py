@@ -0,0 +1,227 @@
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set
+from langchain_core.documents import Document
+
+# 句子切分：中文句末标点、分号及换行之后断句，标点保留在句子末尾
+_SENTENCE_RE = re.compile(r"[^。！？!?；;\n]+[。！？!?；;]?\n?|\n")
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算 token 数：中文字符及全角标点按 1 个 token 计，其余字符按 4 个字符 1 个 token 计。
+
+    只用于预算控制和节省量统计，不依赖具体模型的分词器。
+    """
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _bigrams(text: str) -> Set[str]:
+    text = "".join(text.split())
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Passage(NamedTuple):
+    source: str
+    start: Optional[int]
+    text: str
+    rank: int  # 组成该段落的片段中最靠前的检索名次
+
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """left 的后缀与 right 的前缀重合的最大长度（没有 start_index 时用于判断重叠）"""
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_chunks(docs: List[Document], max_overlap: int = 200, min_overlap: int = 10,
+                 max_gap: int = 4) -> List[_Passage]:
+    """
+    合并同一来源中相邻或重叠的片段。
+
+    片段带有 start_index 元数据时按字符偏移判断是否重叠，或只隔着不超过 max_gap 个字符
+    （切分时丢弃的段落分隔符）；
+    否则当前一片段的结尾与后一片段的开头有至少 min_overlap 个字符重合时视为重叠。
+    """
+    by_source: Dict[str, List[tuple]] = {}
+    for rank, doc in enumerate(docs):
+        source = doc.metadata.get("source", "")
+        by_source.setdefault(source, []).append((rank, doc))
+
+    passages = []
+    for source, items in by_source.items():
+        with_offset = all(isinstance(doc.metadata.get("start_index"), int) for _, doc in items)
+        if with_offset:
+            items.sort(key=lambda item: item[1].metadata["start_index"])
+
+        current: Optional[_Passage] = None
+        for rank, doc in items:
+            text = doc.page_content
+            start = doc.metadata.get("start_index") if with_offset else None
+            if current is not None:
+                if with_offset:
+                    end = current.start + len(current.text)
+                    if start <= end:
+                        current = current._replace(text=current.text + text[end - start:],
+                                                   rank=min(current.rank, rank))
+                        continue
+                    if start - end <= max_gap:
+                        # 直接相邻：补回换行，合并后的段落偏移以字符数对齐
+                        current = current._replace(text=current.text + "\n" * (start - end) + text,
+                                                   rank=min(current.rank, rank))
+                        continue
+                else:
+                    size = _overlap_length(current.text, text, max_overlap)
+                    if size >= min_overlap:
+                        current = current._replace(text=current.text + text[size:], rank=min(current.rank, rank))
+                        continue
+                passages.append(current)
+            current = _Passage(source, start, text, rank)
+        if current is not None:
+            passages.append(current)
+
+    passages.sort(key=lambda passage: passage.rank)
+    return passages
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_RE.findall(text) if s.strip()]
+
+
+def _dedupe_sentences(passages: List[_Passage]) -> List[_Passage]:
+    """删除在排名更靠前的段落中已经出现过的句子（忽略空白差异）"""
+    seen = set()
+    result = []
+    for passage in passages:
+        kept = []
+        for sentence in _split_sentences(passage.text):
+            key = "".join(sentence.split())
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(sentence)
+        text = "".join(kept).strip()
+        if text:
+            result.append(passage._replace(text=text))
+    return result
+
+
+def _mmr_order(query: str, passages: List[_Passage], lambda_mult: float) -> List[_Passage]:
+    """
+    MMR 排序：兼顾与查询的相关度和与已选段落的差异度。
+
+    相关度由检索名次（名次越靠前越相关）和与查询的字符二元组重合度共同决定，
+    差异度用段落之间的二元组 Jaccard 相似度衡量。
+    """
+    query_grams = _bigrams(query)
+    grams = [_bigrams(p.text) for p in passages]
+    relevance = [
+        0.5 / (1 + p.rank) + 0.5 * (len(query_grams & g) / len(query_grams) if query_grams else 0.0)
+        for p, g in zip(passages, grams)
+    ]
+
+    selected: List[int] = []
+    remaining = list(range(len(passages)))
+    while remaining:
+        def score(i):
+            redundancy = max((_jaccard(grams[i], grams[j]) for j in selected), default=0.0)
+            return lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return [passages[i] for i in selected]
+
+
+def _truncate(text: str, budget: int) -> str:
+    """按句子截断到 token 预算以内；第一句就超出预算时按字符截断"""
+    kept, used = [], 0
+    for sentence in _split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return "".join(kept).strip()
+    result = ""
+    for char in text:
+        if estimate_tokens(result + char) > budget:
+            break
+        result += char
+    return result.strip()
+
+
+class PackedContext(NamedTuple):
+    """打包结果"""
+    passages: List[str]
+    raw_tokens: int     # 直接拼接全部原始片段的 token 数
+    packed_tokens: int  # 打包后的 token 数
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.packed_tokens
+
+
+def pack_context(query: str, docs: List[Document], token_budget: int = 0,
+                 lambda_mult: float = 0.7) -> PackedContext:
+    """
+    对检索结果做上下文打包：合并相邻/重叠片段 → 句子去重 → MMR 排序 → 按 token 预算截断。
+
+    Args:
+        query: 查询语句
+        docs: 按相关度排序的检索结果
+        token_budget: 段落正文的 token 上限，0 表示不限制
+        lambda_mult: MMR 中相关度的权重（0~1），越小越偏向多样性
+    """
+    raw_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+    passages = _mmr_order(query, _dedupe_sentences(merge_chunks(docs)), lambda_mult)
+
+    packed, used = [], 0
+    for passage in passages:
+        tokens = estimate_tokens(passage.text)
+        if token_budget > 0 and used + tokens > token_budget:
+            text = _truncate(passage.text, token_budget - used)
+            if text:
+                packed.append(text)
+                used += estimate_tokens(text)
+            break
+        packed.append(passage.text)
+        used += tokens
+    return PackedContext(packed, raw_tokens, used)
+
+
+class PackingStats:
+    """累计的打包统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.raw_tokens = 0
+        self.packed_tokens = 0
+
+    def record(self, packed: PackedContext) -> None:
+        with self._lock:
+            self.calls += 1
+            self.raw_tokens += packed.raw_tokens
+            self.packed_tokens += packed.packed_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = self.raw_tokens - self.packed_tokens
+            return {
+                "calls": self.calls,
+                "raw_tokens": self.raw_tokens,
+                "packed_tokens": self.packed_tokens,
+                "saved_tokens": saved,
+                "saved_ratio": round(saved / self.raw_tokens, 4) if self.raw_tokens else 0.0,
+            }
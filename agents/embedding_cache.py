@@ -0,0 +1,152 @@
+import os
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+# SQLite 单条语句可绑定的参数数量有限，批量查询时按此大小分组
+_LOOKUP_CHUNK = 500
+
+
+def _text_hash(text: str) -> str:
+    """片段文本的 SHA-256，作为缓存键的一部分"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    """向量以 float32 存储（FAISS 内部同样使用 float32，不损失检索精度）"""
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带磁盘缓存的 Embedding 包装器。
+
+    以 (模型名, 文本哈希) 为键把向量存入本地 SQLite，同一段文本永远只向远程 API 请求一次；
+    未命中的文本按批发送，批次之间以有限并发执行，失败时指数退避重试。
+    文档向量和查询向量共用同一个缓存，重复的查询主题无需再次请求远程 API。
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache_path: str,
+                 batch_size: int = 32, max_concurrency: int = 4,
+                 max_retries: int = 5, backoff_base: float = 1.0):
+        """
+        Args:
+            underlying: 实际发起请求的 Embedding 实现
+            model_name: 模型名，模型变化时缓存自然失效
+            cache_path: SQLite 缓存文件路径
+            batch_size: 每次请求包含的文本数量
+            max_concurrency: 同时进行的请求数量上限
+            max_retries: 单个批次的最大重试次数
+            backoff_base: 退避基数（秒），第 n 次重试等待约 backoff_base * 2^n 秒
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        # 连接在多个线程间共享，由锁保证串行访问
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """批量读取缓存，返回命中的 {文本哈希: 向量}"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = hashes[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    (self.model_name, *chunk),
+                ).fetchall()
+                found.update((text_hash, _unpack(blob)) for text_hash, blob in rows)
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """写入一批新向量"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(model, text_hash, vector) VALUES (?,?,?)",
+                [(self.model_name, text_hash, _pack(vector)) for text_hash, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """请求一个批次，失败时指数退避（带随机抖动）重试"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.underlying.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(30.0, self.backoff_base * (2 ** attempt)) * (0.5 + random.random())
+                print(f"[RAG] Embedding 请求失败（第 {attempt + 1} 次），{delay:.1f} 秒后重试: {e}")
+                time.sleep(delay)
+
+    def _store_batch(self, batch, vectors: Dict[str, List[float]]) -> None:
+        """请求一个批次并立即落盘，中途失败时已完成的批次不会白费"""
+        embedded = self._embed_batch([text for _, text in batch])
+        items = {text_hash: vector for (text_hash, _), vector in zip(batch, embedded)}
+        self._store(items)
+        vectors.update(items)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [_text_hash(text) for text in texts]
+        vectors = self._lookup(list(dict.fromkeys(hashes)))
+
+        # 未命中的文本去重后分批请求
+        pending = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors:
+                pending.setdefault(text_hash, text)
+        self.hits += len(texts) - sum(1 for h in hashes if h in pending)
+        self.misses += len(pending)
+
+        if pending:
+            items = list(pending.items())
+            batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+            if len(batches) == 1:
+                # 单个批次（例如查询向量）直接在当前线程请求
+                self._store_batch(batches[0], vectors)
+            else:
+                print(f"[RAG] Embedding 缓存未命中 {len(items)} 条，分 {len(batches)} 批请求"
+                      f"（并发 {self.max_concurrency}）")
+                with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                    futures = [executor.submit(self._store_batch, batch, vectors) for batch in batches]
+                    for future in as_completed(futures):
+                        future.result()
+
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,220 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from bm25_index import tokenize
+
+# 网关前置快速路由（从环境变量读取）：1 开启，0 关闭（所有消息都交给网关智能体）
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") == "1"
+# 分类器最高后验概率低于该值时视为不确定，交给网关智能体
+FAST_ROUTER_MIN_CONFIDENCE = float(os.getenv("FAST_ROUTER_MIN_CONFIDENCE", "0.8"))
+# 超过该长度（去掉订单号和标点后）的消息通常带有更多上下文，不走快速路由
+FAST_ROUTER_MAX_CHARS = int(os.getenv("FAST_ROUTER_MAX_CHARS", "16"))
+
+# 订单号：一个字母 + 4 位以上数字，例如 A1001；P 开头的是商品ID（P001），不当作订单号
+ORDER_NO_RE = re.compile(r"(?<![A-Za-z0-9])(?![Pp])[A-Za-z]\d{4,}(?![A-Za-z0-9])")
+# 商品ID：出现时交给网关智能体（不能把订单号以外的编号误当作订单）
+_PRODUCT_ID_RE = re.compile(r"(?<![A-Za-z0-9])[Pp]\d{3,}(?![A-Za-z0-9])")
+# 匹配前去掉的空白、标点和语气符号
+_PUNCT_RE = re.compile(r"[\s,，.。!！?？~～、;；:：…\"'“”‘’()（）\[\]【】]+")
+
+# 投诉、催单、否定、售后、退款进度等：即使带订单号、看起来像查询，也交给网关智能体
+_ESCALATE_RE = re.compile(r"投诉|举报|催|为什么|怎么还|不要|不用|别|不是|没收到|错|坏|少|漏|破|假|差|慢|到账|进度|地址|发票|换|退款")
+# 上一轮回复在要订单号（例如退款前确认是哪个订单）时，单独发来的订单号是对追问的回答，由网关智能体结合上下文处理
+_ASKS_FOR_ORDER_RE = re.compile(r"订单号|订单编号|哪个订单|哪笔订单|哪一单|哪个单")
+
+SMALL_TALK = ("greeting", "thanks", "goodbye")
+# 只有只读的意图走快速路径；退款（order_refund）会修改订单，分类器判定为退款时同样交给网关智能体
+ORDER_INTENTS = ("order_status", "order_cancel_check")
+
+# 纯问候语的固定回复（与网关智能体提示词中的即时回复一致）
+TEMPLATES = {
+    "greeting": "您好！请问有什么可以帮您？",
+    "thanks": "不客气！很高兴为您服务",
+    "goodbye": "再见，祝您生活愉快！",
+}
+
+# 规则：整句（去掉标点后）完全由这些词组成时才按问候回复（"好"、"没有"这类依赖上下文的短回复不在其中）
+_RULES = {
+    "greeting": re.compile(r"^(你好|您好|你好呀|您好呀|哈喽|嗨|hi|hello|在吗|在不在|有人吗|早上好|下午好|晚上好)+$"),
+    "thanks": re.compile(r"^(好的|好)?(谢谢|谢谢你|谢谢您|感谢|多谢|非常感谢|太感谢了|辛苦了|thanks|thankyou)+(啦|了|哈)?$"),
+    "goodbye": re.compile(r"^(好的|好)?(再见|拜拜|bye|下次见|没事了|没有了)+(啦|了)?$"),
+}
+
+# 分类器训练语料：意图 -> 示例短语（订单类示例不含订单号，分类前会先去掉订单号）
+TRAINING_PHRASES: Dict[str, List[str]] = {
+    "greeting": ["你好", "您好", "你好呀", "哈喽", "嗨", "在吗", "在不在", "有人吗", "早上好", "下午好", "晚上好",
+                 "您好在吗", "hello", "hi"],
+    "thanks": ["谢谢", "感谢", "多谢", "谢谢你", "辛苦了", "麻烦你了", "好的谢谢", "太感谢了", "非常感谢", "thanks"],
+    "goodbye": ["再见", "拜拜", "没事了", "没有了", "就这样吧", "下次见", "好的再见", "bye"],
+    "order_status": ["查订单", "查一下订单", "帮我查查", "查询订单", "订单详情", "订单状态", "订单信息", "详情",
+                     "走到哪了", "到哪了", "物流", "物流信息", "发货没", "发货了吗", "什么时候到", "付钱了吗",
+                     "付款了吗", "快递到哪了", "看看订单", "查", "查询", "状态"],
+    "order_cancel_check": ["能取消吗", "可以取消吗", "还能取消吗", "能不能取消", "能不能退", "可以退吗", "能退款吗",
+                           "可以退款吗", "能退吗", "帮我看看能不能退"],
+    "order_refund": ["我要取消订单", "取消订单", "退款", "申请退款", "帮我退款", "不要了", "帮我退了", "把订单退了",
+                     "退了", "我要退款", "退掉", "取消"],
+    "other": ["多少钱", "有货吗", "参数", "推荐", "价格", "库存", "怎么申请退款", "退款多久到账", "运费谁出",
+              "发票怎么开", "几天内可以无理由退货", "换货", "修改收货地址", "改地址", "投诉", "帮我写作业",
+              "现在的天气", "催一下", "为什么还没到", "开发票", "退货流程", "商品质量有问题", "合并付款",
+              "优惠券", "改成别的颜色"],
+}
+
+
+def normalize(message: str) -> str:
+    """小写并去掉空白和标点"""
+    return _PUNCT_RE.sub("", message.strip().lower())
+
+
+def _features(text: str) -> List[str]:
+    """分类特征：bm25_index 的分词结果（汉字二元组、字母数字词）加上单个汉字，短消息也有足够的特征"""
+    return tokenize(text) + [c for c in text if "\u4e00" <= c <= "\u9fff"]
+
+
+class IntentClassifier:
+    """多项式朴素贝叶斯（拉普拉斯平滑），用于区分问候、订单查询/可取消检查/退款与其他问题"""
+
+    def __init__(self, phrases: Dict[str, List[str]] = TRAINING_PHRASES, alpha: float = 0.5):
+        self.alpha = alpha
+        self.labels = list(phrases)
+        total = sum(len(items) for items in phrases.values())
+        self._log_prior = {label: math.log(len(items) / total) for label, items in phrases.items()}
+        self._counts: Dict[str, Counter] = {label: Counter() for label in self.labels}
+        for label, items in phrases.items():
+            for item in items:
+                self._counts[label].update(_features(normalize(item)))
+        self._vocab = set().union(*self._counts.values())
+        self._totals = {label: sum(counts.values()) for label, counts in self._counts.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """返回 (意图, 后验概率)；没有任何已知特征时概率为 0"""
+        features = [f for f in _features(text) if f in self._vocab]
+        if not features:
+            return "other", 0.0
+        scores = {}
+        vocab_size = len(self._vocab)
+        for label in self.labels:
+            counts, total = self._counts[label], self._totals[label]
+            scores[label] = self._log_prior[label] + sum(
+                math.log((counts[f] + self.alpha) / (total + self.alpha * vocab_size)) for f in features
+            )
+        best = max(scores, key=scores.get)
+        # log-sum-exp 归一化得到后验概率
+        top = scores[best]
+        probability = 1.0 / sum(math.exp(score - top) for score in scores.values())
+        return best, probability
+
+    def has_keyword(self, text: str, label: str) -> bool:
+        """text 中是否有该意图训练语料里出现过的词（汉字二元组或字母数字词），只靠"能""吗"这类单字不算"""
+        return any(self._counts[label][token] for token in tokenize(text))
+
+
+class Route(NamedTuple):
+    """一次快速路由决策"""
+    intent: str                     # greeting / thanks / goodbye / order_status / order_cancel_check
+    confidence: float
+    order_no: Optional[str] = None  # 订单类意图的订单号
+    reply: Optional[str] = None     # 问候类意图的固定回复
+
+
+class FastPathRouter:
+    """
+    网关前置的确定性路由：规则 + 本地朴素贝叶斯分类器，不调用大模型。
+
+    - 纯问候/致谢/告别（规则完全匹配）：直接返回固定回复
+    - 消息中恰好有一个订单号，且其余部分明确是查询/可取消检查：交给只读的订单工具
+    - 其他（退款、投诉、否定、多个订单号、意图不确定、消息较长、夹带商品/政策问题等）：返回 None，交给网关智能体
+
+    同时统计命中率，以及与走大模型的请求相比节省的延迟。
+    """
+
+    def __init__(self, classifier: Optional[IntentClassifier] = None,
+                 min_confidence: float = FAST_ROUTER_MIN_CONFIDENCE, max_chars: int = FAST_ROUTER_MAX_CHARS):
+        self.classifier = classifier or IntentClassifier()
+        self.min_confidence = min_confidence
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.fall_through = 0
+        self.errors = 0
+        self._fast_ms = 0.0
+        self._llm_ms = 0.0
+
+    def needs_context(self, message: str) -> bool:
+        """消息只有一个订单号时，需要结合上一轮回复判断（见 route 的 last_reply）"""
+        text = normalize(message or "")
+        return bool(text) and not ORDER_NO_RE.sub("", text) and len(ORDER_NO_RE.findall(text)) == 1
+
+    def route(self, message: str, last_reply: Optional[str] = None) -> Optional[Route]:
+        """
+        对一条用户消息做路由决策，无法确定时返回 None。
+
+        Args:
+            message: 用户消息
+            last_reply: 上一轮助手回复；消息只有一个订单号而上一轮在要订单号时交给网关智能体
+        """
+        text = normalize(message or "")
+        if not text:
+            return None
+        if _PRODUCT_ID_RE.search(text):
+            return None
+        order_nos = list(dict.fromkeys(m.upper() for m in ORDER_NO_RE.findall(text)))
+        rest = ORDER_NO_RE.sub("", text)
+        if len(order_nos) > 1 or len(rest) > self.max_chars:
+            return None
+
+        if not order_nos:
+            for intent, pattern in _RULES.items():
+                if pattern.match(rest):
+                    return Route(intent, 1.0, reply=TEMPLATES[intent])
+            return None
+
+        order_no = order_nos[0]
+        if not rest:
+            # 只发了一个订单号：上一轮没有要订单号时按查询订单处理
+            if last_reply and _ASKS_FOR_ORDER_RE.search(last_reply):
+                return None
+            return Route("order_status", 1.0, order_no=order_no)
+        if _ESCALATE_RE.search(rest):
+            return None
+        intent, confidence = self.classifier.predict(rest)
+        if intent in ORDER_INTENTS and confidence >= self.min_confidence and self.classifier.has_keyword(rest, intent):
+            return Route(intent, confidence, order_no=order_no)
+        return None
+
+    def record_hit(self, intent: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.hits[intent] += 1
+            self._fast_ms += elapsed_ms
+
+    def record_fall_through(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self.fall_through += 1
+            self._llm_ms += elapsed_ms
+
+    def record_error(self) -> None:
+        """快速路径执行失败（随后改走网关智能体）"""
+        with self._lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        """命中率与节省的延迟：按走网关智能体的请求平均耗时估算每次命中节省的时间"""
+        with self._lock:
+            hits = sum(self.hits.values())
+            requests = hits + self.fall_through
+            fast_mean = self._fast_ms / hits if hits else None
+            llm_mean = self._llm_ms / self.fall_through if self.fall_through else None
+            saved = (llm_mean - fast_mean) * hits if hits and llm_mean is not None else None
+            return {
+                "enabled": FAST_ROUTER_ENABLED,
+                "requests": requests,
+                "hits": dict(self.hits),
+                "fall_through": self.fall_through,
+                "errors": self.errors,
+                "hit_rate": round(hits / requests, 4) if requests else 0.0,
+                "fast_path_ms_mean": round(fast_mean, 2) if fast_mean is not None else None,
+                "llm_path_ms_mean": round(llm_mean, 2) if llm_mean is not None else None,
+                "estimated_saved_ms": round(saved, 1) if saved is not None else None,
+            }
@@ -1,4 +1,7 @@
 # Gateway Agent
+import json
+import time
+from typing import Optional
 from deepagents import create_deep_agent,CompiledSubAgent
 from langchain.agents import create_agent
 from deepagents.middleware.subagents import SubAgentMiddleware
@@ -6,6 +9,10 @@ from deepagents.middleware.filesystem import FilesystemMiddleware
 from langchain.agents.middleware.todo import TodoListMiddleware
 from model import get_model
 from manager_agent import get_manager_agent
+from order_agent import get_order_tools
+from fast_router import FAST_ROUTER_ENABLED, FastPathRouter, Route
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END
 from langchain.agents import AgentState
 # 导入异步的 Redis 客户端
 from redis.asyncio import Redis as AsyncRedis
@@ -123,6 +130,118 @@ gateway_agent_prompt_test = """
 禁止自己创作任何内容，例如产品、商品、订单信息。
 
 """
+# 网关前置快速路由（FAST_ROUTER_ENABLED=0 时关闭）
+_fast_router = FastPathRouter() if FAST_ROUTER_ENABLED else None
+# 快速路由查询订单时只取回复所需的字段
+_ORDER_REPLY_FIELDS = ["order_no", "status", "items", "amount", "logistics"]
+
+
+def _final_node(agent) -> str:
+    """模型不再调用工具时最后执行的节点（其后直接结束），快速路由以该节点的身份写入对话状态"""
+    sources = [edge.source for edge in agent.get_graph().edges if edge.target == END and edge.source != "tools"]
+    return sources[0] if sources else "model"
+
+
+def _tool_text(result) -> str:
+    """MCP 工具结果可能是字符串或内容块列表，取出其中的文本"""
+    if isinstance(result, str):
+        return result
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in result)
+
+
+def _format_order_reply(result: str) -> str:
+    """把 get_order 返回的 JSON 转成回复；未找到/无权限等文本说明原样返回"""
+    try:
+        order = json.loads(result)
+    except ValueError:
+        return result
+    return (
+        f"您的订单 {order['order_no']} 当前状态：{order['status']}。\n"
+        f"商品：{order.get('items', '')}\n"
+        f"支付金额：{order.get('amount')} 元\n"
+        f"物流信息：{order.get('logistics') or '暂无物流更新'}"
+    )
+
+
+class FastPathGateway:
+    """
+    网关智能体外层的快速路由。
+
+    单条用户消息先经过 FastPathRouter：纯问候直接按模板回复；带一个订单号的查询/可取消检查直接调用只读的订单工具；
+    其余消息（包括退款等会修改订单的请求）照常交给网关智能体。
+    快速路由的问答同样写入网关智能体的对话状态（Redis），对话历史保持完整。
+    其他属性和方法（aget_state、aupdate_state 等）直接转发给网关智能体。
+    """
+
+    def __init__(self, agent, router: FastPathRouter, order_tools):
+        self._agent = agent
+        self.router = router
+        self._order_tools = {tool.name: tool for tool in order_tools}
+        self._final_node = _final_node(agent)
+
+    def __getattr__(self, name):
+        return getattr(self._agent, name)
+
+    async def _last_reply(self, config) -> Optional[str]:
+        """对话状态中最后一条助手消息的文本"""
+        state = await self._agent.aget_state(config)
+        for message in reversed(state.values.get("messages", [])):
+            if isinstance(message, AIMessage):
+                return message.content if isinstance(message.content, str) else None
+        return None
+
+    async def _dispatch(self, route: Route, config) -> str:
+        if route.reply is not None:
+            return route.reply
+        if route.intent == "order_status":
+            result = await self._order_tools["get_order"].ainvoke(
+                {"order_no": route.order_no, "fields": _ORDER_REPLY_FIELDS}, config=config)
+            return _format_order_reply(_tool_text(result))
+        result = await self._order_tools["check_cancelable"].ainvoke({"order_no": route.order_no}, config=config)
+        return _tool_text(result)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        messages = input.get("messages") if isinstance(input, dict) else None
+        message = messages[0] if messages and len(messages) == 1 else None
+        if not isinstance(message, HumanMessage) or not isinstance(message.content, str):
+            return await self._agent.ainvoke(input, config=config, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            # 只发了订单号时先看上一轮是否在追问（例如退款前要订单号），是则交给网关智能体
+            last_reply = await self._last_reply(config) if self.router.needs_context(message.content) else None
+            route = self.router.route(message.content, last_reply)
+        except Exception as e:
+            self.router.record_error()
+            print(f"[ROUTER] 快速路由判断失败，改由网关智能体处理: {e}")
+            route = None
+        if route is not None:
+            try:
+                reply = await self._dispatch(route, config)
+                await self._agent.aupdate_state(
+                    config, {"messages": [message, AIMessage(content=reply)]}, as_node=self._final_node)
+                state = await self._agent.aget_state(config)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.router.record_hit(route.intent, elapsed_ms)
+                print(f"[ROUTER] 快速路由命中 {route.intent}（置信度 {route.confidence:.2f}），耗时 {elapsed_ms:.0f}ms")
+                return state.values
+            except Exception as e:
+                # 快速路径失败不影响正常处理，改走网关智能体
+                self.router.record_error()
+                print(f"[ROUTER] 快速路由执行失败，改由网关智能体处理: {e}")
+
+        result = await self._agent.ainvoke(input, config=config, **kwargs)
+        self.router.record_fall_through((time.perf_counter() - start) * 1000)
+        return result
+
+
+def get_fast_router_stats() -> dict:
+    """快速路由的命中率与节省的延迟"""
+    if _fast_router is None:
+        return {"enabled": False}
+    return _fast_router.stats()
+
+
 async def get_gateway_agent():
     """
     创建并返回AI客服系统网关智能体实例。
@@ -184,4 +303,6 @@ async def get_gateway_agent():
         ],
         checkpointer=checkpointer  # 添加 AsyncRedisSaver 作为检查点
     )
-    return gateway_agent
+    if _fast_router is None:
+        return gateway_agent
+    return FastPathGateway(gateway_agent, _fast_router, await get_order_tools())
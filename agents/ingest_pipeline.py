@@ -0,0 +1,188 @@
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+
+class FileTask(NamedTuple):
+    """一个待解析的文件"""
+    path: str
+    rel: str
+    sha: str
+
+
+class ParsedFile(NamedTuple):
+    """单个文件的解析结果，解析失败时 chunks 为空、error 为错误信息"""
+    task: FileTask
+    chunks: List[Document]
+    seconds: float
+    error: Optional[str]
+
+
+def _timed_parse(parse_fn: Callable[[str, str, str], List[Document]], task: FileTask) -> ParsedFile:
+    """在工作进程中解析单个文件；异常被捕获为结果的一部分，不会中断整个构建"""
+    start = time.perf_counter()
+    try:
+        chunks = parse_fn(task.path, task.rel, task.sha)
+        return ParsedFile(task, chunks, time.perf_counter() - start, None)
+    except Exception as e:
+        return ParsedFile(task, [], time.perf_counter() - start, f"{type(e).__name__}: {e}")
+
+
+class _InlineExecutor(Executor):
+    """单进程时直接在当前线程解析，省去进程池的启动开销"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def iter_parsed(tasks: Iterable[FileTask], parse_fn: Callable[[str, str, str], List[Document]],
+                workers: int, max_in_flight: int) -> Iterator[ParsedFile]:
+    """
+    解析阶段：按提交顺序逐个产出文件的解析结果。
+
+    同时在途的文件最多 max_in_flight 个，下游（向量化）处理慢时不会无限制地积压解析结果；
+    下游处理当前批次期间，进程池中的文件继续解析，两个阶段互相重叠。
+    工作进程以 spawn 方式启动：调用方可能是带有多个线程和已打开 SQLite/FAISS 句柄的服务进程，fork 这样的进程不安全。
+    """
+    if workers > 1:
+        executor: Executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = _InlineExecutor()
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append((task, executor.submit(_timed_parse, parse_fn, task)))
+            if len(pending) >= max_in_flight:
+                yield _result(*pending.popleft(), parse_fn)
+        while pending:
+            yield _result(*pending.popleft(), parse_fn)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _result(task: FileTask, future, parse_fn) -> ParsedFile:
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        # 工作进程异常退出（例如解析时内存耗尽）：在当前进程中重试该文件
+        return _timed_parse(parse_fn, task)
+
+
+class StageStats:
+    """单个阶段的处理数量与耗时"""
+
+    def __init__(self):
+        self.items = 0
+        self.seconds = 0.0
+
+    def as_dict(self, unit: str) -> dict:
+        return {
+            unit: self.items,
+            "seconds": round(self.seconds, 3),
+            f"{unit}_per_second": round(self.items / self.seconds, 1) if self.seconds > 0 else None,
+        }
+
+
+class IngestReport:
+    """整个流水线的统计：各阶段吞吐量、失败的文件"""
+
+    def __init__(self):
+        self.parse = StageStats()   # 工作进程中的解析耗时（多进程时为各进程耗时之和）
+        self.embed = StageStats()
+        self.index = StageStats()
+        self.failed: Dict[str, str] = {}
+        self.files = 0
+        self.chunks = 0
+        self.wall_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "failed": dict(self.failed),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "parse": self.parse.as_dict("files"),
+            "embed": self.embed.as_dict("chunks"),
+            "index": self.index.as_dict("chunks"),
+        }
+
+    def summary(self) -> str:
+        parse, embed, index = self.parse.as_dict("files"), self.embed.as_dict("chunks"), self.index.as_dict("chunks")
+        return (f"{self.files} 个文件 / {self.chunks} 个片段，耗时 {self.wall_seconds:.2f}s；"
+                f"解析 {parse['files_per_second']} 文件/s，向量化 {embed['chunks_per_second']} 片段/s，"
+                f"入库 {index['chunks_per_second']} 片段/s；失败 {len(self.failed)} 个文件")
+
+
+def ingest(tasks: Iterable[FileTask], parse_fn: Callable[[str, str, str], List[Document]],
+           embeddings: Embeddings, vectorstore: Optional[FAISS] = None,
+           workers: int = 1, batch_size: int = 256) -> Tuple[Optional[FAISS], Dict[str, dict], IngestReport]:
+    """
+    流式构建/扩充向量索引：发现 → 解析切分（进程池，逐文件）→ 分批向量化 → 写入 FAISS。
+
+    任一时刻内存中只有在途文件的片段和一个批次的向量，峰值内存与语料总量无关（索引本身除外）。
+    解析失败的文件被跳过并记录在 manifest 中（chunk_ids 为空），文件内容不变时不会反复重试。
+
+    Args:
+        tasks: 待处理的文件
+        parse_fn: 顶层函数 (路径, 相对路径, 内容哈希) -> 片段列表，需可被 pickle
+        embeddings: 向量化所用的 Embedding
+        vectorstore: 已有索引（增量更新时传入），为 None 时新建
+        workers: 解析进程数，1 表示在当前进程中解析
+        batch_size: 每批向量化的片段数量
+
+    Returns:
+        (vectorstore, manifest 的 files 部分, 统计)
+    """
+    report = IngestReport()
+    files: Dict[str, dict] = {}
+    start = time.perf_counter()
+
+    def flush(batch: List[Document]) -> None:
+        nonlocal vectorstore
+        t0 = time.perf_counter()
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in batch])
+        t1 = time.perf_counter()
+        text_embeddings = [(chunk.page_content, vector) for chunk, vector in zip(batch, vectors)]
+        metadatas = [chunk.metadata for chunk in batch]
+        ids = [chunk.id for chunk in batch]
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        report.chunks += len(batch)
+        report.embed.items += len(batch)
+        report.embed.seconds += t1 - t0
+        report.index.items += len(batch)
+        report.index.seconds += time.perf_counter() - t1
+
+    batch: List[Document] = []
+    for parsed in iter_parsed(tasks, parse_fn, workers, max_in_flight=max(2, workers * 2)):
+        report.files += 1
+        report.parse.items += 1
+        report.parse.seconds += parsed.seconds
+        entry = {"sha256": parsed.task.sha, "chunk_ids": [chunk.id for chunk in parsed.chunks]}
+        if parsed.error:
+            print(f"[RAG] 警告: 文件解析失败，已跳过 {parsed.task.rel}: {parsed.error}")
+            report.failed[parsed.task.rel] = parsed.error
+            entry["error"] = parsed.error
+        files[parsed.task.rel] = entry
+
+        batch.extend(parsed.chunks)
+        while len(batch) >= batch_size:
+            flush(batch[:batch_size])
+            batch = batch[batch_size:]
+    if batch:
+        flush(batch)
+
+    report.wall_seconds = time.perf_counter() - start
+    return vectorstore, files, report
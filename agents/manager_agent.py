@@ -4,11 +4,11 @@ from model import get_model
 from order_agent import get_order_agent
 from product_agent import get_product_agent
 from langchain.tools import tool
-# 引入 RAG 查询函数
-from RAG_tool import query_knowledge_base
+# 引入 RAG 查询函数（异步版本，不阻塞事件循环）
+from RAG_tool import aquery_knowledge_base
 
 @tool
-def get_policy(topic: str) -> str:
+async def get_policy(topic: str) -> str:
     """
     根据用户查询的主题返回对应的处理策略。
     搜索公司的售后服务协议、客服SOP手册和常见问题解答。遇到退款、退货、售后规则等问题时必须使用此工具。例如：“退款时效说明”、“退货政策”、“取消订单政策”等。
@@ -21,7 +21,7 @@ def get_policy(topic: str) -> str:
     """
     # 调用 RAG 查询
     print(f"[RAG] 正在查询主题: {topic}")
-    result = query_knowledge_base(topic)
+    result = await aquery_knowledge_base(topic)
     return result
 
 manager_agent_prompt = """
@@ -0,0 +1,74 @@
+import os
+import sys
+import importlib
+from typing import Dict, List
+from langchain_core.tools import StructuredTool
+
+# 智能体连接 MCP 工具的方式（从环境变量读取）：
+# - stdio：每个进程以子进程方式启动自己的 MCP 服务（默认，与原来一致）
+# - streamable_http：连接共享的长驻 MCP 服务（服务端以 MCP_SERVER_TRANSPORT=streamable-http 启动），
+#   多个 uvicorn worker / 评测进程共用同一组服务，不再各自拉起子进程
+# - inprocess：在当前进程内直接调用同一组 FastMCP 工具函数，省去进程间通信和 JSON-RPC 编解码
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+TRANSPORTS = ("stdio", "streamable_http", "inprocess")
+
+MCP_SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../Mcpserver"))
+# 各 MCP 服务的 HTTP 地址（默认端口与 Mcpserver/server_transport.py 一致）
+MCP_SERVER_URLS = {
+    "order_mcp": os.getenv("ORDER_MCP_URL", "http://127.0.0.1:8101/mcp"),
+    "product_mcp": os.getenv("PRODUCT_MCP_URL", "http://127.0.0.1:8102/mcp"),
+}
+
+
+def _connection(server: str, transport: str) -> Dict:
+    """MultiServerMCPClient 的连接配置"""
+    if transport == "streamable_http":
+        return {"transport": "streamable_http", "url": MCP_SERVER_URLS[server]}
+    server_path = os.path.join(MCP_SERVER_DIR, f"{server}.py")
+    if not os.path.exists(server_path):
+        raise FileNotFoundError(f"MCP 服务器文件不存在: {server_path}")
+    return {"transport": "stdio", "command": "python", "args": [server_path]}
+
+
+def _result_text(result) -> str:
+    """FastMCP.call_tool 的返回值转成文本：有输出 Schema 的工具返回 (内容块, 结构化结果)，否则只有内容块"""
+    content = result[0] if isinstance(result, tuple) else result
+    return "\n".join(block.text for block in content if block.type == "text")
+
+
+def _inprocess_tool(mcp, tool) -> StructuredTool:
+    """把 FastMCP 注册的工具包装成 StructuredTool：参数 Schema、说明与 MCP list_tools 返回的一致"""
+    async def call(**kwargs):
+        # 经 FastMCP.call_tool 调用，参数校验与类型转换和 MCP 服务端处理请求时相同
+        return _result_text(await mcp.call_tool(tool.name, kwargs))
+
+    return StructuredTool.from_function(
+        coroutine=call,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.inputSchema,
+    )
+
+
+async def inprocess_tools(server: str) -> List[StructuredTool]:
+    """导入 Mcpserver 下的服务模块，返回其全部工具（数据库连接池、商品目录等在导入时初始化）"""
+    if MCP_SERVER_DIR not in sys.path:
+        sys.path.append(MCP_SERVER_DIR)
+    module = importlib.import_module(server)
+    return [_inprocess_tool(module.mcp, tool) for tool in await module.mcp.list_tools()]
+
+
+async def load_mcp_tools(server: str, transport: str = None) -> List[StructuredTool]:
+    """按 MCP_TRANSPORT 获取指定 MCP 服务（order_mcp / product_mcp）的工具列表"""
+    transport = transport or MCP_TRANSPORT
+    if transport not in TRANSPORTS:
+        raise ValueError(f"不支持的 MCP_TRANSPORT: {transport}（可选 {' / '.join(TRANSPORTS)}）")
+    if transport == "inprocess":
+        print(f"[DEBUG] 进程内加载 MCP 工具: {server}")
+        return await inprocess_tools(server)
+
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+    connection = _connection(server, transport)
+    print(f"[DEBUG] 连接 MCP 服务器 ({transport}): {connection.get('url') or connection['args'][0]}")
+    client = MultiServerMCPClient({server: connection})
+    return await client.get_tools()
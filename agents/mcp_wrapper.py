@@ -1,16 +1,48 @@
+from typing import Any, Dict, List, Optional
 from langchain_core.tools import StructuredTool
 from langchain_core.runnables import RunnableConfig
-from pydantic import create_model, BaseModel
+from pydantic import create_model, BaseModel, Field
+
+# JSON Schema 基本类型 -> Python 类型
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "object": Dict[str, Any],
+}
+
+
+def _json_schema_type(prop: dict):
+    """把 MCP 工具参数的 JSON Schema 转成 Python 类型（支持数组和 anyOf [T, null] 形式的可选参数）"""
+    if "anyOf" in prop:
+        options = [p for p in prop["anyOf"] if p.get("type") != "null"]
+        inner = _json_schema_type(options[0]) if len(options) == 1 else Any
+        return Optional[inner] if len(options) < len(prop["anyOf"]) else inner
+    if prop.get("type") == "array":
+        return List[_json_schema_type(prop.get("items", {}))]
+    return _JSON_TYPES.get(prop.get("type"), Any)
+
 
 def wrap_mcp_tool_with_user_id(original_tool: StructuredTool):
     """
     包装 MCP 工具：
     1. 修改 Schema：对 LLM 隐藏 user_id 参数
-    2. 运行时注入：从 config 中自动提取 thread_id 作为 user_id
+    2. 运行时注入：从 config 中自动提取 thread_id 作为 user_id（仅当原工具有 user_id 参数时）
+    3. 未填写的可选参数（None）不传给 MCP 服务，由服务端使用默认值
     """
-    
+    old_schema = original_tool.args_schema
+    if isinstance(old_schema, dict):
+        needs_user_id = "user_id" in old_schema.get("properties", {})
+    else:
+        needs_user_id = "user_id" in getattr(old_schema, "model_fields", {})
+
     # 定义包装后的执行函数
     async def wrapped_func(config: RunnableConfig, **kwargs):
+        input_args = {k: v for k, v in kwargs.items() if v is not None}
+        if not needs_user_id:
+            return await original_tool.ainvoke(input_args, config=config)
+
         # 尝试从 config 的 configurable 中获取 thread_id
         # main.py 中传递的是: config={"configurable": {"thread_id": user_id}}
         user_id = config.get("configurable", {}).get("thread_id")
@@ -23,7 +55,6 @@ def wrap_mcp_tool_with_user_id(original_tool: StructuredTool):
         print(f"[WRAPPER] 拦截工具调用 {original_tool.name}，自动注入 user_id={user_id}")
         
         # 构造包含 user_id 的完整参数
-        input_args = kwargs.copy()
         input_args["user_id"] = user_id
         
         # 调用原始 MCP 工具
@@ -31,19 +62,16 @@ def wrap_mcp_tool_with_user_id(original_tool: StructuredTool):
         return await original_tool.ainvoke(input_args, config=config)
 
     # 动态创建新的参数 Schema（排除 user_id 字段）
-    old_schema = original_tool.args_schema
     new_fields = {}
 
     if isinstance(old_schema, dict):
-        # 如果是字典类型 (JSON Schema)
+        # 如果是字典类型 (JSON Schema)：按 type / items / anyOf 映射类型，非必填参数保留默认值
         properties = old_schema.get("properties", {})
+        required = set(old_schema.get("required", []))
         for name, prop in properties.items():
             if name != "user_id":
-                # 简单处理：这里我们假设都是 string，实际可能需要更复杂的类型映射
-                # 但对于 MCP 工具来说，大部分基本类型可以简化处理
-                # 如果能获取到 python 类型最好，但在 dict schema 下很难
-                # 这里使用 object 或 string 作为通用类型
-                new_fields[name] = (str, ...) # 默认为必填字符串，简化处理
+                default = ... if name in required else prop.get("default")
+                new_fields[name] = (_json_schema_type(prop), Field(default, description=prop.get("description")))
     elif issubclass(old_schema, BaseModel):
         # 如果是 Pydantic 模型
         for name, field in old_schema.model_fields.items():
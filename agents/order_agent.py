@@ -1,45 +1,32 @@
-import os
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from model import get_model
 from deepagents import create_deep_agent
 from mcp_wrapper import wrap_mcp_tools
+from mcp_transport import load_mcp_tools
 
-# MCP 客户端（全局变量）
-_mcp_client = None
+# MCP 工具（全局变量，进程内只加载一次）
 _mcp_tools = None
  
 model = get_model()
 
 async def _get_mcp_tools():
-    """异步获取 MCP 工具"""
-    global _mcp_client, _mcp_tools
+    """异步获取 MCP 工具（连接方式由 MCP_TRANSPORT 决定：stdio / streamable_http / inprocess）"""
+    global _mcp_tools
     
     if _mcp_tools is None:
-        # 初始化客户端
-        if _mcp_client is None:
-            mcp_server_path = os.path.abspath(
-                os.path.join(os.path.dirname(__file__), "../Mcpserver/order_mcp.py")
-            )
-            
-            if not os.path.exists(mcp_server_path):
-                raise FileNotFoundError(f"MCP 服务器文件不存在: {mcp_server_path}")
-            
-            print(f"[DEBUG] 连接 MCP 服务器: {mcp_server_path}")
-            
-            _mcp_client = MultiServerMCPClient({
-                "order_mcp": {
-                    "transport": "stdio",
-                    "command": "python",
-                    "args": [mcp_server_path]
-                }
-            })
-        
-          # 异步获取工具
-        _mcp_tools = await _mcp_client.get_tools()
+        _mcp_tools = await load_mcp_tools("order_mcp")
         print(f"[DEBUG] 成功获取 {len(_mcp_tools)} 个 MCP 工具")
     
     return _mcp_tools
 
+async def get_order_tools():
+    """
+    返回包装后（自动注入 user_id）的订单 MCP 工具，供网关前置的快速路由直接调用。
+    
+    Returns:
+        List[StructuredTool]: 订单工具列表
+    """
+    return wrap_mcp_tools(await _get_mcp_tools())
+
 async def get_order_agent():
     """
     创建并返回订单子智能体实例。
@@ -64,22 +51,31 @@ async def get_order_agent():
 1. 获取订单详细信息
 2. 检查订单是否可以取消
 3. 处理订单退款/取消等操作
+4. 列出用户最近的订单
+
+# 工具选择
+- 单个订单号 → get_order(order_no="A1001")
+- 同时询问多个订单号 → 一次调用 get_orders(order_nos=["A1001", "A1002", "A1003"])，不要逐个调用 get_order
+- 用户没有给出订单号，想查看"我的订单"/"最近的订单"/"待发货的订单" → list_user_orders(status=可选的订单状态)
+- 用户要求"查看更多"，且上一次 list_user_orders 结果末尾给出了 cursor → 再次调用 list_user_orders 并原样传入该 cursor
+- 只关心单个订单的部分信息（如物流、是否付款）→ get_order 传 fields 只取需要的字段，例如 get_order(order_no="A1002", fields=["status", "logistics"])
         
 # 强制工具调用规则（最高优先级，必须严格执行）
-- **查询订单前必须先调用 get_order 工具**：无论用户问什么订单相关问题，都必须先调用 get_order 工具获取真实数据
+- **查询订单前必须先调用订单查询工具**（get_order / get_orders / list_user_orders）：无论用户问什么订单相关问题，都必须先调用工具获取真实数据
 - **严禁跳过工具调用**：绝对不能在没有调用工具的情况下回复订单信息
-- **马上行动**：当你需要查询订单信息时，必须直接调用 get_order 工具，不要在调用工具前生成任何中间回复
+- **马上行动**：当你需要查询订单信息时，必须直接调用订单查询工具，不要在调用工具前生成任何中间回复
 - **等待工具返回**：只有在获取了工具返回的结果后，才能生成最终回复
 
 # 处理流程（严格执行）
-1. **收到订单查询请求** → 立即调用 get_order 工具（必须执行，不能跳过）
+1. **收到订单查询请求** → 立即按"工具选择"调用对应工具（必须执行，不能跳过）
 2. **等待工具返回结果** → 不能提前回复，不能编造数据
 3. **根据工具返回结果回复**：
    - 如果工具返回"未找到订单号 XXX 的记录" → 告诉用户"抱歉，未找到订单号 XXX 的记录，请确认订单号是否正确。"
    - 如果工具返回订单信息 → 严格按照工具返回的格式和内容回复，不能添加、修改或美化任何信息
+   - 如果工具返回 JSON → 用自然语言转述其中的字段内容，不要原样输出 JSON，不能添加字段以外的信息
 
 # 绝对禁止行为
-- ❌ 禁止在没有调用 get_order 工具的情况下回复订单信息
+- ❌ 禁止在没有调用订单查询工具的情况下回复订单信息
 - ❌ 禁止编造订单号、商品、金额、物流等信息
 - ❌ 禁止假设订单状态或物流信息
 - ❌ 禁止美化或补充工具返回的数据
@@ -92,6 +88,12 @@ async def get_order_agent():
 2. 等待工具返回结果
 3. 根据返回结果回复用户
 
+用户："帮我看下A1001、A1002、A1007这几个订单"
+正确流程：调用一次 get_orders(order_nos=["A1001", "A1002", "A1007"])，根据返回结果逐个回复
+
+用户："查一下我最近的订单"
+正确流程：调用 list_user_orders()，根据返回结果回复；结果中提示还有更多订单时告知用户可以继续查看
+
 错误行为：
 - 直接回复订单信息（未调用工具）❌
 - 编造订单详情 ❌
@@ -1,41 +1,19 @@
-import os
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from model import get_model
 from deepagents import create_deep_agent
 from mcp_wrapper import wrap_mcp_tools
+from mcp_transport import load_mcp_tools
 
-# MCP 客户端（全局变量）
-_mcp_client = None
+# MCP 工具（全局变量，进程内只加载一次）
 _mcp_tools = None
  
 model = get_model()
 
 async def _get_mcp_tools():
-    """异步获取 MCP 工具"""
-    global _mcp_client, _mcp_tools
+    """异步获取 MCP 工具（连接方式由 MCP_TRANSPORT 决定：stdio / streamable_http / inprocess）"""
+    global _mcp_tools
     
     if _mcp_tools is None:
-        # 初始化客户端
-        if _mcp_client is None:
-            mcp_server_path = os.path.abspath(
-                os.path.join(os.path.dirname(__file__), "../Mcpserver/product_mcp.py")
-            )
-            
-            if not os.path.exists(mcp_server_path):
-                raise FileNotFoundError(f"MCP 服务器文件不存在: {mcp_server_path}")
-            
-            print(f"[DEBUG] 连接 MCP 服务器: {mcp_server_path}")
-            
-            _mcp_client = MultiServerMCPClient({
-                "product_mcp": {
-                    "transport": "stdio",
-                    "command": "python",
-                    "args": [mcp_server_path]
-                }
-            })
-        
-        # 异步获取工具
-        _mcp_tools = await _mcp_client.get_tools()
+        _mcp_tools = await load_mcp_tools("product_mcp")
         print(f"[DEBUG] 成功获取 {len(_mcp_tools)} 个 MCP 工具")
     
     return _mcp_tools
@@ -92,6 +70,8 @@ async def get_product_agent():
 - 只有在获取了所有必要信息后，才能生成最终回复
 - 所有回复都必须基于工具返回的准确信息
 - 禁止反复调用工具，同样的工具调用一次已经足够
+- 只需要个别信息时，get_product_info / search_products 传 fields 只取需要的字段，例如只问价格时 fields=["product_name", "price"]、问参数时 fields=["product_name", "specifications"]
+- 工具返回 JSON 时，用自然语言转述其中的内容，不要原样输出 JSON
 
 # 个性化交互技巧
 ## 情感化表达
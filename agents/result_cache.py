@@ -0,0 +1,150 @@
+import re
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+
+class _Entry(NamedTuple):
+    result: str
+    embedding: Optional[np.ndarray]  # 已归一化的查询向量，无向量的条目只参与精确匹配
+    expires_at: float
+
+
+class SemanticResultCache:
+    """
+    检索结果缓存：LRU 容量上限 + TTL 过期。
+
+    精确匹配（归一化后的查询文本相同）直接返回；
+    否则用查询向量与已缓存条目做余弦相似度比较，超过阈值视为近似查询，复用其结果。
+    索引重建时调用 invalidate()，旧结果全部作废，且进行中的查询无法写回旧结果。
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 600, similarity_threshold: float = 0.95):
+        """
+        Args:
+            max_size: 最多缓存的查询数量，0 表示关闭缓存
+            ttl: 条目存活时间（秒）
+            similarity_threshold: 近似命中所需的最小余弦相似度
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次 invalidate() 递增，用于拒绝基于旧索引计算出的结果
+        self.generation = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """忽略大小写、多余空白和首尾标点"""
+        query = re.sub(r"\s+", " ", query.strip().lower())
+        return query.strip("?？。.!！,，;；:： ")
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+
+    def get(self, query: str) -> Optional[str]:
+        """精确匹配查询"""
+        if self.max_size <= 0:
+            return None
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.result
+
+    def get_similar(self, embedding: List[float]) -> Optional[str]:
+        """近似匹配：返回余弦相似度最高且超过阈值的条目结果，未命中时计入 misses"""
+        if self.max_size <= 0:
+            return None
+        query = _normalize_vector(embedding)
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            candidates = [(key, entry) for key, entry in self._entries.items() if entry.embedding is not None]
+            if candidates:
+                matrix = np.stack([entry.embedding for _, entry in candidates])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return entry.result
+            self.misses += 1
+            return None
+
+    def record_miss(self) -> None:
+        """记一次未命中（例如走了关键词快速路径、没有查询向量，不做近似匹配）"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query: str, result: str, embedding: Optional[List[float]] = None,
+            generation: Optional[int] = None) -> None:
+        """
+        写入结果。
+
+        Args:
+            generation: 计算该结果所用索引对应的 generation；与当前值不一致说明索引已更新，丢弃该结果
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            key = self.normalize(query)
+            vector = _normalize_vector(embedding) if embedding is not None else None
+            self._entries[key] = _Entry(result, vector, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> int:
+        """清空缓存（索引重建或增量更新时调用），返回新的 generation"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+            return self.generation
+
+    def stats(self) -> dict:
+        """命中/未命中等计数"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def _normalize_vector(embedding: List[float]) -> Optional[np.ndarray]:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
@@ -1,8 +1,65 @@
 import os
+import sys
 import sqlite3
 
-ORDERS_DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "orders.db"))
-PRODUCTS_DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "products.db"))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../Mcpserver")))
+from order_schema import ensure_order_indexes
+from product_schema import ensure_product_indexes
+from product_search import ensure_product_fts
+
+# 与 MCP 服务使用同一组环境变量，对已有数据库再次运行时补建缺少的索引和全文索引
+ORDERS_DB_PATH = os.getenv("ORDER_DB_PATH", os.path.abspath(os.path.join(os.path.dirname(__file__), "orders.db")))
+PRODUCTS_DB_PATH = os.getenv("PRODUCT_DB_PATH", os.path.abspath(os.path.join(os.path.dirname(__file__), "products.db")))
+
+ORDERS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS orders (
+        order_no TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        items TEXT NOT NULL,
+        amount REAL NOT NULL,
+        logistics TEXT DEFAULT '',
+        cancelable INTEGER DEFAULT 1,
+        updated_at TEXT DEFAULT (datetime('now'))
+    )
+"""
+
+PRODUCTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS products (
+        product_id TEXT PRIMARY KEY,
+        product_name TEXT NOT NULL,
+        description TEXT,
+        category TEXT NOT NULL,
+        price REAL NOT NULL,
+        stock INTEGER DEFAULT 0,
+        brand TEXT,
+        specifications TEXT,
+        image_url TEXT,
+        status TEXT DEFAULT '在售',
+        created_at TEXT DEFAULT (datetime('now')),
+        updated_at TEXT DEFAULT (datetime('now'))
+    )
+"""
+
+# 批量写入语句（generate_data.py 等批量导入使用，包含全部列）
+ORDER_INSERT_SQL = (
+    "INSERT INTO orders(order_no, user_id, status, items, amount, logistics, cancelable, updated_at) "
+    "VALUES (?,?,?,?,?,?,?,?)"
+)
+PRODUCT_INSERT_SQL = (
+    "INSERT INTO products(product_id, product_name, description, category, price, stock, brand, specifications, "
+    "image_url, status, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
+)
+
+
+def create_orders_table(conn: sqlite3.Connection) -> None:
+    """创建订单表（不含二级索引）"""
+    conn.execute(ORDERS_TABLE_SQL)
+
+
+def create_products_table(conn: sqlite3.Connection) -> None:
+    """创建商品表（不含二级索引和全文索引）"""
+    conn.execute(PRODUCTS_TABLE_SQL)
 
 
 def init_orders_db() -> None:
@@ -10,22 +67,8 @@ def init_orders_db() -> None:
     os.makedirs(os.path.dirname(ORDERS_DB_PATH), exist_ok=True)
     conn = sqlite3.connect(ORDERS_DB_PATH)
     try:
+        create_orders_table(conn)
         cur = conn.cursor()
-        # 建表
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS orders (
-                order_no TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                status TEXT NOT NULL,
-                items TEXT NOT NULL,
-                amount REAL NOT NULL,
-                logistics TEXT DEFAULT '',
-                cancelable INTEGER DEFAULT 1,
-                updated_at TEXT DEFAULT (datetime('now'))
-            )
-            """
-        )
         # 仅在表为空时插入示例数据
         cur.execute("SELECT COUNT(*) FROM orders")
         if cur.fetchone()[0] == 0:
@@ -59,6 +102,7 @@ def init_orders_db() -> None:
                 ],
             )
         conn.commit()
+        ensure_order_indexes(conn)
     finally:
         conn.close()
 
@@ -68,26 +112,8 @@ def init_products_db() -> None:
     os.makedirs(os.path.dirname(PRODUCTS_DB_PATH), exist_ok=True)
     conn = sqlite3.connect(PRODUCTS_DB_PATH)
     try:
+        create_products_table(conn)
         cur = conn.cursor()
-        # 建表
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS products (
-                product_id TEXT PRIMARY KEY,
-                product_name TEXT NOT NULL,
-                description TEXT,
-                category TEXT NOT NULL,
-                price REAL NOT NULL,
-                stock INTEGER DEFAULT 0,
-                brand TEXT,
-                specifications TEXT,
-                image_url TEXT,
-                status TEXT DEFAULT '在售',
-                created_at TEXT DEFAULT (datetime('now')),
-                updated_at TEXT DEFAULT (datetime('now'))
-            )
-            """
-        )
         # 仅在表为空时插入示例数据
         cur.execute("SELECT COUNT(*) FROM products")
         if cur.fetchone()[0] == 0:
@@ -121,6 +147,9 @@ def init_products_db() -> None:
                 ],
             )
         conn.commit()
+        ensure_product_indexes(conn)
+        # 商品全文索引及同步触发器（已有数据时全量构建一次）
+        ensure_product_fts(conn)
     finally:
         conn.close()
 
@@ -0,0 +1,298 @@
+"""
+合成数据生成器：按生产规模生成用户订单和商品数据，用于性能测试
+
+- 商品：按分类给出价格区间（对数正态分布）、品牌、特性和规格，约 92% 在售、5% 缺货
+- 订单：用户下单量呈长尾分布（少数用户订单很多），订单时间越近越可能处于待支付/待发货/配送中，
+  较早的订单大多已签收，少量退款中/已退款/已取消；订单商品取自生成的商品目录，金额与单价一致
+- 分块 executemany 写入，每块一个事务；写入前删除二级索引、全文索引和触发器，写入完成后一次性重建
+- 相同 --seed 生成完全相同的数据
+
+用法:
+    python data/generate_data.py --users 100000 --orders 1000000 --products 200000 --seed 42
+    python data/generate_data.py --orders 5000000 --products 0 --output-dir /tmp/bench_data --overwrite
+"""
+import os
+import sys
+import math
+import time
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../Mcpserver")))
+import create_db
+from order_schema import drop_order_indexes, ensure_order_indexes
+from product_schema import drop_product_indexes, ensure_product_indexes
+from product_search import drop_product_fts, ensure_product_fts
+
+DEFAULT_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "generated"))
+
+# 分类 -> (商品名, 价格中位数, 特性)
+CATEGORIES = {
+    "电脑外设": (["机械键盘", "无线鼠标", "键鼠套装", "显示器", "摄像头", "鼠标垫"], 199,
+             ["RGB背光", "人体工学设计", "USB 3.0接口", "4K分辨率", "IPS面板", "静音按键"]),
+    "家用电器": (["洗衣机", "电冰箱", "空调", "扫地机器人", "空气净化器", "电饭煲"], 1999,
+             ["一级能效", "智能变频", "大容量", "静音运行", "APP远程控制", "除菌"]),
+    "网络设备": (["路由器", "交换机", "网线", "无线网卡", "Mesh组网套装"], 199,
+             ["WiFi6", "千兆网口", "双频", "超五类", "穿墙增强"]),
+    "音频设备": (["蓝牙耳机", "头戴式耳机", "音响", "麦克风", "声卡"], 299,
+             ["主动降噪", "蓝牙5.3", "低延迟", "长续航", "Hi-Res音质"]),
+    "存储设备": (["移动硬盘", "U盘", "固态硬盘", "存储卡", "NAS"], 399,
+             ["USB 3.0接口", "大容量", "高速传输", "Type-C接口", "加密保护"]),
+    "办公设备": (["打印机", "扫描仪", "投影仪", "碎纸机", "标签机"], 899,
+             ["自动双面", "无线打印", "1080P高清", "低噪音", "A4幅面"]),
+    "智能设备": (["智能手表", "智能手环", "智能音箱", "智能门锁", "智能摄像机"], 599,
+             ["健康监测", "50米防水", "语音助手", "长续航", "指纹识别"]),
+    "配件": (["充电宝", "数据线", "手机支架", "充电器", "保护壳"], 49,
+           ["快充", "Type-C接口", "便携", "铝合金", "20000mAh"]),
+}
+CATEGORY_WEIGHTS = [18, 10, 10, 14, 12, 8, 10, 18]
+ADJECTIVES = ["轻薄", "静音", "高速", "便携", "旗舰", "入门", "专业", "家用", "商务", "电竞"]
+BRANDS = [f"品牌{chr(ord('A') + i)}{j}" for i in range(26) for j in range(10)]
+USAGES = ["家庭", "办公", "游戏", "出差", "学生"]
+
+# 订单状态按订单距今天数分布：(天数上限, [(状态, 权重), ...])
+STATUS_BY_AGE = [
+    (1, [("待支付", 15), ("待发货", 55), ("配送中", 30)]),
+    (5, [("待发货", 10), ("配送中", 55), ("已签收", 35)]),
+    (30, [("配送中", 3), ("已签收", 87), ("退款中", 4), ("已退款", 4), ("已取消", 2)]),
+    (math.inf, [("已签收", 93), ("已退款", 5), ("已取消", 2)]),
+]
+# 预先算好累积权重，逐行抽样时不再重复累加
+_STATUS_TABLE = [
+    (limit, [s for s, _ in weights], list(accumulate(w for _, w in weights)))
+    for limit, weights in STATUS_BY_AGE
+]
+_CATEGORY_CUM_WEIGHTS = list(accumulate(CATEGORY_WEIGHTS))
+_ITEM_COUNTS, _ITEM_COUNT_CUM_WEIGHTS = [1, 2, 3], list(accumulate([70, 22, 8]))
+_QUANTITIES, _QUANTITY_CUM_WEIGHTS = [1, 2, 3], list(accumulate([80, 15, 5]))
+CANCELABLE_STATUSES = {"待支付", "待发货", "配送中"}
+LOGISTICS = {
+    "待支付": "",
+    "待发货": "订单已确认，等待发货",
+    "配送中": "已发货，运输中",
+    "已签收": "已签收：本人签收",
+    "退款中": "订单已申请退款，处理中",
+    "已退款": "退款已完成",
+    "已取消": "订单已取消",
+}
+# 订单商品取自商品目录的前若干个商品（相同 seed 下与生成的商品一致）
+ORDER_ITEM_CATALOG_SIZE = 5000
+
+
+def product_rows(count: int, seed: int, start: int = 0, now: Optional[datetime] = None) -> Iterator[Tuple]:
+    """生成商品行，字段顺序同 create_db.PRODUCT_INSERT_SQL"""
+    rng = random.Random(f"products-{seed}-{start}")
+    now = now or datetime(2025, 6, 30)
+    categories = list(CATEGORIES)
+    for i in range(start, start + count):
+        category = rng.choices(categories, cum_weights=_CATEGORY_CUM_WEIGHTS)[0]
+        nouns, median_price, features = CATEGORIES[category]
+        noun = rng.choice(nouns)
+        model = f"{rng.choice('ABCDEFGHJKMNPQRSTUVWXYZ')}{rng.randint(1, 9)}-{rng.randint(1000, 9999)}"
+        price = round(max(5.0, rng.lognormvariate(math.log(median_price), 0.6)), 1)
+        roll = rng.random()
+        status = "在售" if roll < 0.92 else "下架"
+        stock = 0 if roll < 0.05 else int(rng.expovariate(1 / 80))
+        created = now - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86399))
+        updated = created + timedelta(days=rng.randint(0, max(0, (now - created).days)))
+        yield (
+            f"GP{i:08d}",
+            f"{rng.choice(ADJECTIVES)}{noun} {model}",
+            f"{'，'.join(rng.sample(features, 3))}，适合{rng.choice(USAGES)}使用",
+            category,
+            price,
+            stock,
+            rng.choice(BRANDS),
+            f"型号：{model}；保修：{rng.randint(1, 3)}年",
+            f"https://www.example.cn/product/GP{i:08d}",
+            status,
+            created.strftime("%Y-%m-%d %H:%M:%S"),
+            updated.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+
+def order_item_catalog(seed: int, size: int = ORDER_ITEM_CATALOG_SIZE) -> List[Tuple[str, float]]:
+    """订单商品可选的 (商品名, 单价)：取相同 seed 下生成的前 size 个在售商品"""
+    return [(row[1], row[4]) for row in product_rows(size, seed) if row[9] == "在售"]
+
+
+def _user_id(rng: random.Random, users: int) -> str:
+    # 长尾分布：用户编号越小下单越多（约 20% 的用户贡献一半以上的订单）
+    return str(1 + min(users - 1, int(users * rng.random() ** 2.5)))
+
+
+def order_rows(count: int, users: int, seed: int, start: int = 0, days: int = 365,
+               now: Optional[datetime] = None, catalog: Optional[List[Tuple[str, float]]] = None) -> Iterator[Tuple]:
+    """生成订单行，字段顺序同 create_db.ORDER_INSERT_SQL"""
+    rng = random.Random(f"orders-{seed}-{start}")
+    now = now or datetime(2025, 6, 30)
+    catalog = catalog or order_item_catalog(seed)
+    for i in range(start, start + count):
+        # 订单时间：越近的订单越多（指数分布，截断在 days 天内）
+        age_days = min(days, rng.expovariate(1 / (days / 4)))
+        for limit, statuses, cum_weights in _STATUS_TABLE:
+            if age_days < limit:
+                status = rng.choices(statuses, cum_weights=cum_weights)[0]
+                break
+        items, amount = [], 0.0
+        for _ in range(rng.choices(_ITEM_COUNTS, cum_weights=_ITEM_COUNT_CUM_WEIGHTS)[0]):
+            name, price = catalog[int(rng.random() * len(catalog))]
+            quantity = rng.choices(_QUANTITIES, cum_weights=_QUANTITY_CUM_WEIGHTS)[0]
+            items.append(f"{name} x{quantity}")
+            amount += price * quantity
+        updated = now - timedelta(days=age_days)
+        yield (
+            f"G{i:09d}",
+            _user_id(rng, users),
+            status,
+            "; ".join(items),
+            round(amount, 2),
+            LOGISTICS[status],
+            int(status in CANCELABLE_STATUSES),
+            updated.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+
+def bulk_load(conn: sqlite3.Connection, sql: str, rows: Iterable[Tuple], total: int,
+              chunk_size: int = 50000, label: str = "") -> Tuple[int, float]:
+    """分块 executemany，每块一个事务；返回 (写入行数, 耗时秒)"""
+    start = time.perf_counter()
+    loaded = 0
+    rows = iter(rows)
+    while True:
+        chunk = [row for _, row in zip(range(chunk_size), rows)]
+        if not chunk:
+            break
+        with conn:
+            conn.executemany(sql, chunk)
+        loaded += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"[DATA] {label}: {loaded}/{total} 行，{loaded / elapsed:,.0f} 行/秒", end="\r", flush=True)
+    elapsed = time.perf_counter() - start
+    if loaded:
+        print()
+    return loaded, elapsed
+
+
+def _open_for_load(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    # 生成的是可重建的测试数据：导入期间关闭同步与回滚日志落盘，换取写入速度
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")
+    return conn
+
+
+def _next_sequence(conn: sqlite3.Connection, table: str, key: str, prefix: str) -> int:
+    """
+    追加模式下从已有的生成数据之后继续编号。
+
+    只看前缀之后全是数字的编号（其他以该前缀开头的订单号/商品ID不是生成的数据，忽略），按数值取最大值。
+    """
+    suffix = f"substr({key}, {len(prefix) + 1})"
+    row = conn.execute(
+        f"SELECT MAX(CAST({suffix} AS INTEGER)) FROM {table} "
+        f"WHERE {key} GLOB ? AND {suffix} NOT GLOB '*[^0-9]*'",
+        (f"{prefix}[0-9]*",),
+    ).fetchone()
+    return row[0] + 1 if row[0] is not None else 0
+
+
+def _finish(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def generate_products(path: str, count: int, seed: int, chunk_size: int = 50000) -> dict:
+    """生成商品库：建表 → 删除索引/全文索引 → 分块写入 → 重建索引和全文索引"""
+    conn = _open_for_load(path)
+    create_db.create_products_table(conn)
+    drop_product_fts(conn)
+    drop_product_indexes(conn)
+    start = _next_sequence(conn, "products", "product_id", "GP")
+    loaded, load_seconds = bulk_load(conn, create_db.PRODUCT_INSERT_SQL, product_rows(count, seed, start),
+                                     count, chunk_size, label="商品")
+    t0 = time.perf_counter()
+    ensure_product_indexes(conn)
+    ensure_product_fts(conn)
+    index_seconds = time.perf_counter() - t0
+    _finish(conn)
+    return _stats(path, loaded, load_seconds, index_seconds)
+
+
+def generate_orders(path: str, count: int, users: int, seed: int, chunk_size: int = 50000) -> dict:
+    """生成订单库：建表 → 删除索引 → 分块写入 → 重建索引"""
+    conn = _open_for_load(path)
+    create_db.create_orders_table(conn)
+    drop_order_indexes(conn)
+    start = _next_sequence(conn, "orders", "order_no", "G")
+    loaded, load_seconds = bulk_load(conn, create_db.ORDER_INSERT_SQL, order_rows(count, users, seed, start),
+                                     count, chunk_size, label="订单")
+    t0 = time.perf_counter()
+    ensure_order_indexes(conn)
+    index_seconds = time.perf_counter() - t0
+    _finish(conn)
+    return _stats(path, loaded, load_seconds, index_seconds)
+
+
+def _stats(path: str, loaded: int, load_seconds: float, index_seconds: float) -> dict:
+    return {
+        "path": path,
+        "rows": loaded,
+        "load_seconds": round(load_seconds, 2),
+        "rows_per_second": round(loaded / load_seconds) if load_seconds > 0 else None,
+        "index_seconds": round(index_seconds, 2),
+        "db_bytes": os.path.getsize(path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成大规模订单/商品测试数据")
+    parser.add_argument("--users", type=int, default=100_000, help="用户数")
+    parser.add_argument("--orders", type=int, default=1_000_000, help="订单数，0 表示不生成订单库")
+    parser.add_argument("--products", type=int, default=200_000, help="商品数，0 表示不生成商品库")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，相同种子生成相同数据")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="每个事务写入的行数")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="输出目录（orders.db / products.db）")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--overwrite", action="store_true", help="删除已存在的数据库后重新生成")
+    mode.add_argument("--append", action="store_true",
+                      help="追加到 --output-dir 下已存在的数据库（追加到 data/ 下的示例库需指定 --output-dir data）")
+    args = parser.parse_args()
+
+    targets = []
+    if args.orders:
+        targets.append(os.path.join(args.output_dir, "orders.db"))
+    if args.products:
+        targets.append(os.path.join(args.output_dir, "products.db"))
+    for path in targets:
+        if os.path.exists(path) and not (args.overwrite or args.append):
+            parser.error(f"{path} 已存在，请指定 --overwrite 或 --append")
+        if args.overwrite:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    if args.products:
+        stats = generate_products(os.path.join(args.output_dir, "products.db"), args.products, args.seed,
+                                  args.chunk_size)
+        print(f"[DATA] 商品库 {stats['path']}：{stats['rows']} 行，写入 {stats['load_seconds']}s "
+              f"({stats['rows_per_second']:,} 行/秒)，建索引 {stats['index_seconds']}s，"
+              f"{stats['db_bytes'] / 1024 / 1024:.1f}MB")
+    if args.orders:
+        stats = generate_orders(os.path.join(args.output_dir, "orders.db"), args.orders, args.users, args.seed,
+                                args.chunk_size)
+        print(f"[DATA] 订单库 {stats['path']}：{stats['rows']} 行，写入 {stats['load_seconds']}s "
+              f"({stats['rows_per_second']:,} 行/秒)，建索引 {stats['index_seconds']}s，"
+              f"{stats['db_bytes'] / 1024 / 1024:.1f}MB")
+    print("[DATA] 使用生成的数据：设置 ORDER_DB_PATH / PRODUCT_DB_PATH 指向上述文件")
+
+
+if __name__ == "__main__":
+    main()
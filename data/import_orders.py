@@ -0,0 +1,342 @@
+"""
+订单表格导入：把导出的订单 xlsx 流式导入订单数据库
+
+- 只读模式逐行读取工作簿（openpyxl read_only + values_only），任何时刻内存中只有一个批次的行
+- 表头支持中英文别名（订单号/order_no、用户ID/user_id、订单状态/status ...），在前若干行中自动定位
+- 每行校验并规范化为 orders 表字段：金额去掉货币符号和千分位、时间统一为 YYYY-MM-DD HH:MM:SS、
+  是否可取消支持 是/否/1/0，缺省时按订单状态推断；校验失败的行跳过并记录行号和原因
+- 按批次 upsert（INSERT ... ON CONFLICT(order_no) DO UPDATE），每批一个事务；
+  已有订单只在导入行的更新时间不早于库中记录时才覆盖，重复导入同一文件结果不变；
+  更新时间为空的行：新订单取导入时刻（同表默认值），已有订单保留库中的更新时间
+- 每批提交后写断点文件，中断后重新执行同一命令从断点继续；源文件变化时拒绝续传
+
+用法:
+    python data/import_orders.py exports/orders_2025.xlsx
+    python data/import_orders.py exports/orders_2025.xlsx --db /tmp/orders.db --sheet 订单 --batch-size 5000
+    python data/import_orders.py exports/orders_2025.xlsx --restart --rejects rejects.csv
+"""
+import os
+import re
+import csv
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils.datetime import from_excel
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../Mcpserver")))
+import create_db
+from order_schema import ensure_order_indexes
+
+DEFAULT_DB_PATH = os.getenv("ORDER_DB_PATH", create_db.ORDERS_DB_PATH)
+DEFAULT_BATCH_SIZE = 5000
+# 表头最多出现在前多少行（导出文件常在表头上方带标题、导出时间等说明行）
+HEADER_SCAN_ROWS = 20
+# 控制台最多打印多少条被拒绝的行（全部被拒绝的行可用 --rejects 写入 CSV）
+MAX_PRINTED_ERRORS = 20
+
+ORDER_COLUMNS = ["order_no", "user_id", "status", "items", "amount", "logistics", "cancelable", "updated_at"]
+REQUIRED_COLUMNS = ["order_no", "user_id", "status", "items", "amount"]
+# 字段 -> 表头别名（匹配前统一小写、去掉空白和括号注释）
+HEADER_ALIASES = {
+    "order_no": ["order_no", "orderno", "order_id", "订单号", "订单编号", "订单id"],
+    "user_id": ["user_id", "userid", "用户id", "用户编号", "会员id", "客户id"],
+    "status": ["status", "order_status", "状态", "订单状态"],
+    "items": ["items", "商品", "商品明细", "包含商品", "商品信息", "购买商品"],
+    "amount": ["amount", "total", "金额", "订单金额", "订单总金额", "实付金额"],
+    "logistics": ["logistics", "物流", "物流信息", "物流状态"],
+    "cancelable": ["cancelable", "可取消", "是否可取消"],
+    "updated_at": ["updated_at", "update_time", "更新时间", "最后更新时间", "下单时间", "订单时间"],
+}
+ORDER_STATUSES = {"待支付", "待发货", "配送中", "已签收", "退款中", "已退款", "已取消"}
+CANCELABLE_STATUSES = {"待支付", "待发货", "配送中"}
+_BOOL_VALUES = {
+    "1": 1, "是": 1, "true": 1, "yes": 1, "y": 1, "可取消": 1,
+    "0": 0, "否": 0, "false": 0, "no": 0, "n": 0, "不可取消": 0,
+}
+_DATETIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M",
+                     "%Y/%m/%d", "%Y-%m-%dT%H:%M:%S", "%Y%m%d"]
+_HEADER_NOISE = re.compile(r"\s+|[(（].*?[)）]")
+_AMOUNT_NOISE = re.compile(r"[¥￥,，元\s]")
+_ITEM_SEPARATOR = re.compile(r"\s*[;；\n]\s*")
+
+# 更新时间不早于库中记录时才覆盖，避免旧导出覆盖服务中已发生的退款等状态变更。
+# 更新时间为空（参数为 NULL）时：新订单取表默认值 datetime('now')，已有订单沿用库中的更新时间，
+# 不能在导入时用当前时间填充，否则每次重新导入都会刷新更新时间
+_UPDATED_AT = f"?{len(ORDER_COLUMNS)}"
+UPSERT_SQL = (
+    f"INSERT INTO orders({', '.join(ORDER_COLUMNS)}) "
+    f"VALUES ({', '.join(f'?{i}' for i in range(1, len(ORDER_COLUMNS)))}, COALESCE({_UPDATED_AT}, datetime('now'))) "
+    "ON CONFLICT(order_no) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in ORDER_COLUMNS[1:-1])
+    + f", updated_at = COALESCE({_UPDATED_AT}, orders.updated_at)"
+    + f" WHERE COALESCE({_UPDATED_AT}, orders.updated_at) >= orders.updated_at"
+)
+
+
+class RowError(ValueError):
+    """单行数据校验失败"""
+
+
+def _header_key(value) -> str:
+    return _HEADER_NOISE.sub("", str(value or "")).lower()
+
+
+_ALIAS_LOOKUP = {_header_key(alias): column for column, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+
+def map_header(row: Tuple) -> Optional[Dict[str, int]]:
+    """表头行 -> {字段: 列下标}；缺少必填字段时返回 None"""
+    mapping = {}
+    for index, cell in enumerate(row):
+        column = _ALIAS_LOOKUP.get(_header_key(cell))
+        if column and column not in mapping:
+            mapping[column] = index
+    return mapping if all(column in mapping for column in REQUIRED_COLUMNS) else None
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # 纯数字的订单号/用户ID 在表格里常被存成浮点数
+        return str(int(value))
+    return str(value).strip()
+
+
+def _amount(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        amount = float(value)
+    else:
+        try:
+            amount = float(_AMOUNT_NOISE.sub("", _text(value)))
+        except ValueError:
+            raise RowError(f"金额无法解析: {value!r}")
+    if not math.isfinite(amount) or amount < 0:
+        raise RowError(f"金额无效: {value!r}")
+    return round(amount, 2)
+
+
+def _cancelable(value, status: str) -> int:
+    if value is None or value == "":
+        return int(status in CANCELABLE_STATUSES)
+    if isinstance(value, bool):
+        return int(value)
+    flag = _BOOL_VALUES.get(_text(value).lower())
+    if flag is None:
+        raise RowError(f"是否可取消无法解析: {value!r}")
+    return flag
+
+
+def _timestamp(value) -> Optional[str]:
+    if value is None or value == "":
+        # 由 UPSERT_SQL 处理：新订单取表默认值，已有订单保留原更新时间
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # 未设置日期格式的单元格读出来是 Excel 序列号
+        try:
+            return from_excel(value).strftime("%Y-%m-%d %H:%M:%S")
+        except (ValueError, OverflowError, TypeError):
+            raise RowError(f"时间无法解析: {value!r}")
+    text = _text(value)
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    raise RowError(f"时间无法解析: {value!r}")
+
+
+def normalize_row(row: Tuple, header: Dict[str, int]) -> Tuple:
+    """表格行 -> orders 表一行（字段顺序同 ORDER_COLUMNS），校验失败抛出 RowError"""
+    def cell(column):
+        index = header.get(column)
+        return row[index] if index is not None and index < len(row) else None
+
+    order_no, user_id, status = _text(cell("order_no")), _text(cell("user_id")), _text(cell("status"))
+    if not order_no:
+        raise RowError("订单号为空")
+    if not user_id:
+        raise RowError("用户ID为空")
+    if status not in ORDER_STATUSES:
+        raise RowError(f"未知订单状态: {status!r}")
+    items = "; ".join(part for part in _ITEM_SEPARATOR.split(_text(cell("items"))) if part)
+    if not items:
+        raise RowError("商品为空")
+    return (
+        order_no,
+        user_id,
+        status,
+        items,
+        _amount(cell("amount")),
+        _text(cell("logistics")),
+        _cancelable(cell("cancelable"), status),
+        _timestamp(cell("updated_at")),
+    )
+
+
+def _fingerprint(path: str, sheet: str) -> dict:
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "sheet": sheet, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_checkpoint(path: str, fingerprint: dict) -> Optional[dict]:
+    """读取断点；源文件与断点记录的不一致时抛出 ValueError"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("fingerprint") != fingerprint:
+        raise ValueError(f"断点 {path} 对应的源文件已变化，请使用 --restart 重新导入")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    # 先写临时文件再替换，中断时不会留下半个断点文件
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    # 导入可能与线上 MCP 服务同时进行：WAL 下读不阻塞，每批事务提交即落盘
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    create_db.create_orders_table(conn)
+    ensure_order_indexes(conn)
+    return conn
+
+
+def _batches(rows: Iterable[Tuple], first_row: int, batch_size: int):
+    """按行号分批：产出 (下一批起始行号, 本批 [(行号, 行), ...])，空行不计入批次但推进行号"""
+    batch, row_number = [], first_row
+    for row_number, row in enumerate(rows, start=first_row):
+        if all(value is None or value == "" for value in row):
+            continue
+        batch.append((row_number, row))
+        if len(batch) >= batch_size:
+            yield row_number + 1, batch
+            batch = []
+    if batch:
+        yield row_number + 1, batch
+
+
+def import_orders(xlsx_path: str, db_path: str = DEFAULT_DB_PATH, sheet: Optional[str] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE, checkpoint_path: Optional[str] = None,
+                  restart: bool = False, rejects_path: Optional[str] = None) -> dict:
+    """流式导入订单表格，返回统计信息；断点文件在导入完成后删除"""
+    checkpoint_path = checkpoint_path or f"{xlsx_path}.checkpoint.json"
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        fingerprint = _fingerprint(xlsx_path, worksheet.title)
+        if restart and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        checkpoint = load_checkpoint(checkpoint_path, fingerprint)
+
+        header, header_row = None, 0
+        for header_row, row in enumerate(worksheet.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True), start=1):
+            header = map_header(row)
+            if header:
+                break
+        if not header:
+            raise ValueError(f"工作表「{worksheet.title}」前 {HEADER_SCAN_ROWS} 行中未找到订单表头，"
+                             f"至少需要列: {', '.join(REQUIRED_COLUMNS)}")
+        print(f"[DATA] 工作表「{worksheet.title}」第 {header_row} 行为表头，字段: "
+              f"{', '.join(column for column in ORDER_COLUMNS if column in header)}")
+
+        stats = {"read": 0, "written": 0, "rejected": 0}
+        first_row = header_row + 1
+        if checkpoint:
+            stats.update(checkpoint["stats"])
+            first_row = checkpoint["next_row"]
+            print(f"[DATA] 从断点继续：第 {first_row} 行（已读取 {stats['read']} 行）")
+        total = worksheet.max_row  # 来自工作表的 dimension 记录，缺失时为 None
+
+        conn = _open_db(db_path)
+        rejects_file = open(rejects_path, "a", encoding="utf-8-sig", newline="") if rejects_path else None
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        start = time.perf_counter()
+        resumed_read = stats["read"]
+        try:
+            rows = worksheet.iter_rows(min_row=first_row, values_only=True)
+            for next_row, batch in _batches(rows, first_row, batch_size):
+                records: List[Tuple] = []
+                for row_number, row in batch:
+                    try:
+                        records.append(normalize_row(row, header))
+                    except RowError as e:
+                        stats["rejected"] += 1
+                        if stats["rejected"] <= MAX_PRINTED_ERRORS:
+                            print(f"\n[DATA] ⚠️ 第 {row_number} 行已跳过: {e}")
+                        if rejects:
+                            rejects.writerow([row_number, str(e), *("" if v is None else v for v in row)])
+                changes = conn.total_changes
+                with conn:
+                    conn.executemany(UPSERT_SQL, records)
+                stats["read"] += len(batch)
+                stats["written"] += conn.total_changes - changes
+                # 批次已提交后再推进断点；断点写入前中断只会重放这一批，upsert 结果不变
+                if rejects_file:
+                    rejects_file.flush()
+                save_checkpoint(checkpoint_path, {"fingerprint": fingerprint, "next_row": next_row, "stats": stats})
+                elapsed = time.perf_counter() - start
+                progress = f"{next_row - 1}/{total}" if total else f"{next_row - 1}"
+                print(f"[DATA] 导入订单: 第 {progress} 行，{(stats['read'] - resumed_read) / elapsed:,.0f} 行/秒",
+                      end="\r", flush=True)
+        finally:
+            conn.close()
+            if rejects_file:
+                rejects_file.close()
+    finally:
+        workbook.close()
+
+    elapsed = time.perf_counter() - start
+    if stats["read"] > resumed_read:
+        print()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    stats.update({
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round((stats["read"] - resumed_read) / elapsed) if elapsed > 0 else None,
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式导入订单 xlsx 到订单数据库")
+    parser.add_argument("xlsx", help="订单表格路径（.xlsx）")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="订单数据库路径，默认同 ORDER_DB_PATH")
+    parser.add_argument("--sheet", default=None, help="工作表名，默认第一个工作表")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每个事务写入的行数")
+    parser.add_argument("--checkpoint", default=None, help="断点文件路径，默认 <xlsx>.checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="忽略已有断点，从头导入")
+    parser.add_argument("--rejects", default=None, help="把校验失败的行（行号、原因、原始值）追加写入该 CSV")
+    args = parser.parse_args()
+
+    try:
+        stats = import_orders(args.xlsx, args.db, args.sheet, args.batch_size, args.checkpoint,
+                              args.restart, args.rejects)
+    except (ValueError, KeyError) as e:
+        parser.exit(1, f"[DATA] ❌ {e}\n")
+    except KeyboardInterrupt:
+        parser.exit(130, "\n[DATA] 已中断，重新执行同一命令即可从断点继续\n")
+    print(f"[DATA] 导入完成：读取 {stats['read']} 行，写入 {stats['written']} 行，跳过 {stats['rejected']} 行，"
+          f"耗时 {stats['seconds']}s（{stats['rows_per_second']:,} 行/秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+订单/商品库索引基准测试
+
+在临时目录中用 data/generate_data.py 生成大表（默认 100 万订单、20 万商品，追加在示例数据之后），
+对 check_query_plans.py 中的每个工具调用
+分别测量有索引和删除索引后的单次调用延迟（商品目录内存快照关闭，直接测 SQL 查询）。
+
+用法:
+    python evaluation/benchmark_db_indexes.py --orders 1000000 --products 200000 --iterations 20
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+sys.path.append(os.path.dirname(__file__))
+
+from check_query_plans import ORDER_SCENARIOS, PRODUCT_SCENARIOS, import_servers, init_databases
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def measure(module, tool: str, kwargs: dict, iterations: int) -> dict:
+    fn = getattr(module, tool)
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(iterations):
+            start = time.perf_counter()
+            asyncio.run(fn(**kwargs))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+    }
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单/商品库索引基准测试")
+    parser.add_argument("--orders", type=int, default=1_000_000, help="额外生成的订单行数")
+    parser.add_argument("--users", type=int, default=100_000, help="订单分布的用户数")
+    parser.add_argument("--products", type=int, default=200_000, help="额外生成的商品行数")
+    parser.add_argument("--iterations", type=int, default=20, help="每个工具调用的重复次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    import generate_data
+    from order_schema import drop_order_indexes
+    from product_schema import drop_product_indexes
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "scenarios": []}
+
+    with tempfile.TemporaryDirectory(prefix="db_index_bench_") as tmp_dir:
+        orders_db, products_db = init_databases(tmp_dir)
+        print(f"[BENCH] 生成 {args.orders} 个订单、{args.products} 个商品...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            report["data"] = {
+                "orders": generate_data.generate_orders(orders_db, args.orders, args.users, args.seed),
+                "products": generate_data.generate_products(products_db, args.products, args.seed),
+            }
+        print(f"[BENCH] 订单写入 {report['data']['orders']['rows_per_second']} 行/秒，"
+              f"商品写入 {report['data']['products']['rows_per_second']} 行/秒")
+        order_mcp, product_mcp = import_servers(orders_db, products_db)
+
+        results = {}
+        for phase in ("indexed", "no_index"):
+            if phase == "no_index":
+                drop_order_indexes(order_mcp._pool.connection())
+                drop_product_indexes(product_mcp._pool.connection())
+            for module, scenarios in ((order_mcp, ORDER_SCENARIOS), (product_mcp, PRODUCT_SCENARIOS)):
+                for n, (tool, kwargs) in enumerate(scenarios):
+                    results.setdefault((tool, n), {"tool": tool, "args": kwargs})[phase] = \
+                        measure(module, tool, kwargs, args.iterations)
+
+        for item in results.values():
+            indexed, no_index = item["indexed"], item["no_index"]
+            item["mean_speedup"] = round(no_index["mean_ms"] / indexed["mean_ms"], 1) if indexed["mean_ms"] else None
+            print(f"[BENCH] {item['tool']:22s} {json.dumps(item['args'], ensure_ascii=False)[:60]:60s} "
+                  f"无索引 p50={no_index['p50_ms']}ms | 有索引 p50={indexed['p50_ms']}ms | 提速 {item['mean_speedup']}x")
+            report["scenarios"].append(item)
+        order_mcp._pool.close_all()
+        product_mcp._pool.close_all()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"db_index_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
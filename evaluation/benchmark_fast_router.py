@@ -0,0 +1,145 @@
+"""
+网关快速路由离线评测
+
+对评测集（test_dataset.json）中的每个问题调用 agents/fast_router.py 的路由决策（不调用大模型），统计：
+- 命中率：走快速路径的问题占比（按类别）
+- 正确率：命中的问题中，快速路径调用的工具与 expected_tool 一致的占比（问候类应无工具调用）
+- 路由决策本身的耗时分位数
+被判定为快速路径但工具不符的问题逐条列出（误路由会直接给出错误回复，应为 0）。
+
+路由规则和训练语料是对照评测集编写的，评测集上的正确率不能说明泛化效果，因此另用一组不参与调参的对抗样本
+（fast_router_adversarial.json：投诉、退款进度、退款请求、否定、"好""嗯"这类短回复、追问后单独发来的订单号等）
+检验：这些问题都应交给网关智能体，走了快速路径即为误判。误判率超过 --max-false-positive-rate 时以非 0 状态退出。
+
+用法:
+    python evaluation/benchmark_fast_router.py --iterations 1000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import Counter
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "agents"))
+
+from fast_router import FastPathRouter, SMALL_TALK
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "test_dataset.json")
+ADVERSARIAL_PATH = os.path.join(os.path.dirname(__file__), "fast_router_adversarial.json")
+# 快速路径意图 -> 实际执行的工具
+INTENT_TOOLS = {
+    "order_status": "get_order",
+    "order_cancel_check": "check_cancelable",
+    **{intent: "" for intent in SMALL_TALK},
+}
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def run_adversarial(router: FastPathRouter, path: str) -> dict:
+    """对抗样本都应交给网关智能体，返回误判率（按类别）与误判的问题"""
+    with open(path, encoding="utf-8") as f:
+        cases = json.load(f)
+    totals, false_positives = Counter(), []
+    for case in cases:
+        totals[case["category"]] += 1
+        route = router.route(case["question"], case.get("last_reply"))
+        if route is not None:
+            false_positives.append({**case, "intent": route.intent, "confidence": round(route.confidence, 3)})
+    by_category = Counter(case["category"] for case in false_positives)
+    return {
+        "questions": len(cases),
+        "false_positives": len(false_positives),
+        "false_positive_rate": round(len(false_positives) / len(cases), 3) if cases else 0.0,
+        "by_category": {c: {"questions": totals[c], "false_positives": by_category[c]} for c in totals},
+        "cases": false_positives,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网关快速路由离线评测")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="评测集 JSON 路径")
+    parser.add_argument("--adversarial", default=ADVERSARIAL_PATH, help="对抗样本 JSON 路径（都应交给网关智能体）")
+    parser.add_argument("--max-false-positive-rate", type=float, default=0.0, help="对抗样本允许的最大误判率")
+    parser.add_argument("--iterations", type=int, default=1000, help="每个问题重复路由的次数（测耗时）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    with open(args.dataset, encoding="utf-8") as f:
+        dataset = json.load(f)
+    router = FastPathRouter()
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": {**vars(args), "min_confidence": router.min_confidence, "max_chars": router.max_chars},
+              "cases": []}
+
+    totals, hits, latencies, misroutes = Counter(), Counter(), [], []
+    for item in dataset:
+        question, category = item["question"], item["category"]
+        route = router.route(question)
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            router.route(question)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        totals[category] += 1
+        case = {"question": question, "category": category, "expected_tool": item.get("expected_tool", "")}
+        if route is not None:
+            hits[category] += 1
+            case.update(intent=route.intent, confidence=round(route.confidence, 3), order_no=route.order_no,
+                        correct=INTENT_TOOLS[route.intent] == case["expected_tool"])
+            if not case["correct"]:
+                misroutes.append(case)
+        report["cases"].append(case)
+
+    total_hits = sum(hits.values())
+    report["summary"] = {
+        "questions": len(dataset),
+        "hits": total_hits,
+        "hit_rate": round(total_hits / len(dataset), 3) if dataset else 0.0,
+        "accuracy": round(1 - len(misroutes) / total_hits, 3) if total_hits else None,
+        "by_category": {c: {"questions": totals[c], "hits": hits[c]} for c in totals},
+        "route_p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "route_p99_ms": round(float(np.percentile(latencies, 99)), 4),
+    }
+    report["misroutes"] = misroutes
+    report["adversarial"] = adversarial = run_adversarial(router, args.adversarial)
+
+    for category in totals:
+        print(f"[BENCH] {category:15s} 命中 {hits[category]}/{totals[category]}")
+    summary = report["summary"]
+    print(f"\n[BENCH] 快速路径命中 {total_hits}/{len(dataset)}（{summary['hit_rate']:.0%}），"
+          f"正确率 {summary['accuracy']}，误路由 {len(misroutes)} 个")
+    for case in misroutes:
+        print(f"[BENCH] 误路由：{case['question']} -> {case['intent']}（期望工具 {case['expected_tool'] or '无'}）")
+    print(f"[BENCH] 路由决策耗时 p50={summary['route_p50_ms']}ms p99={summary['route_p99_ms']}ms")
+    print(f"[BENCH] 对抗样本误判 {adversarial['false_positives']}/{adversarial['questions']}"
+          f"（{adversarial['false_positive_rate']:.1%}，上限 {args.max_false_positive_rate:.1%}）")
+    for case in adversarial["cases"]:
+        print(f"[BENCH] 误判：[{case['category']}] {case['question']} -> {case['intent']}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"fast_router_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+    if adversarial["false_positive_rate"] > args.max_false_positive_rate:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
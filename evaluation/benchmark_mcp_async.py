@@ -0,0 +1,170 @@
+"""
+MCP 工具函数异步数据库访问基准测试
+
+在同一个事件循环中并发调用订单服务的工具函数（与 MCP 服务端处理并发请求的方式相同），
+对不同读线程数（--read-threads，0 表示旧的做法：查询直接在事件循环中执行）分别测量：
+- throughput：多个协程并发调用 get_order / list_user_orders，固定时长内的调用吞吐与延迟分位数
+- head_of_line：后台周期性持有订单库写锁，一个协程持续调用 refund_order（等待写锁），
+  统计同时进行的读调用延迟
+两项测试同时记录事件循环延迟（每 10ms 唤醒一次的探测协程实际多等待的时间），反映事件循环是否被阻塞。
+测试在临时目录中的数据库副本上进行，可用 --orders 追加生成的订单。
+
+用法:
+    python evaluation/benchmark_mcp_async.py --read-threads 0,1,2,4,8 --concurrency 32 --duration 5
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+sys.path.append(os.path.dirname(__file__))
+
+from check_query_plans import import_servers, init_databases
+from benchmark_mcp_pool import hold_write_lock
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+READ_CALLS = [
+    ("get_order", {"order_no": "A1001", "user_id": "1"}),
+    ("list_user_orders", {"user_id": "1"}),
+]
+# 已签收订单不可退款：UPDATE 不会命中任何行，但仍需要等待写锁
+WRITE_CALL = ("refund_order", {"order_no": "A1003", "user_id": "2"})
+PROBE_INTERVAL = 0.01
+
+
+def _summary(latencies: list) -> dict:
+    if not latencies:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "max_ms": round(float(np.max(latencies)), 3),
+    }
+
+
+async def _call_loop(module, calls: list, offset: int, deadline: float, latencies: list) -> None:
+    i = offset
+    while time.perf_counter() < deadline:
+        tool, kwargs = calls[i % len(calls)]
+        start = time.perf_counter()
+        # 先让出事件循环再调用，相当于请求到达后排队等待事件循环处理；延迟包含排队时间
+        await asyncio.sleep(0)
+        await getattr(module, tool)(**kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+
+
+async def _probe_loop(deadline: float, lags: list) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def run_calls(module, concurrency: int, duration: float, writers: int = 0) -> dict:
+    deadline = time.perf_counter() + duration
+    reads, writes, lags = [], [], []
+    start = time.perf_counter()
+    await asyncio.gather(
+        _probe_loop(deadline, lags),
+        *(_call_loop(module, READ_CALLS, n, deadline, reads) for n in range(concurrency)),
+        *(_call_loop(module, [WRITE_CALL], 0, deadline, writes) for _ in range(writers)),
+    )
+    elapsed = time.perf_counter() - start
+    read = _summary(reads)
+    lag = _summary(lags)
+    return {
+        "read_calls": len(reads),
+        "read_calls_per_second": round(len(reads) / elapsed, 1),
+        "read_p50_ms": read["p50_ms"],
+        "read_p99_ms": read["p99_ms"],
+        "read_max_ms": read["max_ms"],
+        "write_calls": len(writes),
+        "loop_lag_p99_ms": lag["p99_ms"],
+        "loop_lag_max_ms": lag["max_ms"],
+    }
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 工具函数异步数据库访问基准测试")
+    parser.add_argument("--read-threads", default="0,1,2,4,8", help="逗号分隔的读线程数，0 表示在事件循环中直接查询")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发调用读工具的协程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每项测试时长（秒）")
+    parser.add_argument("--orders", type=int, default=0, help="额外生成的订单行数")
+    parser.add_argument("--users", type=int, default=1000, help="生成订单分布的用户数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--lock-hold", type=float, default=0.2, help="后台每次持有写锁的时长（秒）")
+    parser.add_argument("--lock-gap", type=float, default=0.3, help="后台两次持有写锁之间的间隔（秒）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "cpu_count": os.cpu_count(), "runs": []}
+
+    with tempfile.TemporaryDirectory(prefix="mcp_async_bench_") as tmp_dir:
+        orders_db, products_db = init_databases(tmp_dir)
+        if args.orders:
+            import generate_data
+            print(f"[BENCH] 生成 {args.orders} 个订单...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                report["data"] = generate_data.generate_orders(orders_db, args.orders, args.users, args.seed)
+        order_mcp, product_mcp = import_servers(orders_db, products_db)
+
+        for read_threads in [int(n) for n in args.read_threads.split(",") if n.strip()]:
+            order_mcp._pool.close_all()
+            order_mcp._pool.read_threads = read_threads
+            with contextlib.redirect_stdout(io.StringIO()):
+                throughput = asyncio.run(run_calls(order_mcp, args.concurrency, args.duration))
+
+            stop = threading.Event()
+            locker = threading.Thread(target=hold_write_lock,
+                                      args=(orders_db, stop, args.lock_hold, args.lock_gap), daemon=True)
+            locker.start()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    head_of_line = asyncio.run(run_calls(order_mcp, args.concurrency, args.duration, writers=1))
+            finally:
+                stop.set()
+                locker.join()
+
+            report["runs"].append({"read_threads": read_threads, "throughput": throughput, "head_of_line": head_of_line})
+            print(f"[BENCH] 读线程 {read_threads}: 吞吐 {throughput['read_calls_per_second']} 次/秒 "
+                  f"p50={throughput['read_p50_ms']}ms p99={throughput['read_p99_ms']}ms "
+                  f"事件循环延迟 p99={throughput['loop_lag_p99_ms']}ms | "
+                  f"慢写入并发时 p99={head_of_line['read_p99_ms']}ms max={head_of_line['read_max_ms']}ms "
+                  f"事件循环延迟 max={head_of_line['loop_lag_max_ms']}ms")
+        order_mcp._pool.close_all()
+        product_mcp._pool.close_all()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"mcp_async_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+MCP 服务数据库访问基准测试
+
+对比两种数据库访问方式的单次调用延迟：
+- connect-per-call：每次调用 sqlite3.connect() / close()（连接池引入前的实现）
+- pool：Mcpserver/db_pool.py 的线程级长连接（WAL + busy_timeout + 预编译语句缓存）
+
+测试在临时目录中的数据库副本上进行，不会修改 data/ 下的数据库。
+
+用法:
+    python evaluation/benchmark_mcp_db.py --iterations 2000 --threads 1,4
+"""
+import io
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+ORDER_SQL = """
+    SELECT order_no, user_id, status, items, amount, logistics, cancelable, updated_at
+    FROM orders WHERE order_no=?
+"""
+SEARCH_SQL = (
+    "SELECT product_id, product_name, description, category, price, stock, brand, specifications, image_url, status "
+    "FROM products WHERE status = '在售' AND (product_name LIKE ? OR description LIKE ?) ORDER BY price ASC LIMIT 10"
+)
+REFUND_SQL = """
+    UPDATE orders SET status = ?, logistics = ?, cancelable = 0, updated_at = datetime('now')
+    WHERE order_no = ?
+"""
+
+
+def prepare_databases(directory: str, extra_orders: int) -> None:
+    """在临时目录中初始化示例数据库，并按需追加订单数据"""
+    import create_db
+    create_db.ORDERS_DB_PATH = os.path.join(directory, "orders.db")
+    create_db.PRODUCTS_DB_PATH = os.path.join(directory, "products.db")
+    create_db.init_orders_db()
+    create_db.init_products_db()
+    if extra_orders:
+        conn = sqlite3.connect(create_db.ORDERS_DB_PATH)
+        with conn:
+            conn.executemany(
+                "INSERT INTO orders(order_no, user_id, status, items, amount, logistics, cancelable) "
+                "VALUES (?,?,?,?,?,?,?)",
+                ((f"B{i:07d}", str(i % 1000), "待发货", "键盘 x1", 189.0, "订单已确认，等待发货", 1)
+                 for i in range(extra_orders)),
+            )
+        conn.close()
+
+
+# ---------- connect-per-call（旧实现） ----------
+
+def legacy_get_order(db_path: str, order_no: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(ORDER_SQL, (order_no,)).fetchone()
+    finally:
+        conn.close()
+
+
+def legacy_refund(db_path: str, order_no: str):
+    # 旧实现先查询一次订单，再为 UPDATE 重新建立一次连接
+    legacy_get_order(db_path, order_no)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(REFUND_SQL, ("退款中", "订单已申请退款，处理中", order_no))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def legacy_search(db_path: str, keyword: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(SEARCH_SQL, (f"%{keyword}%", f"%{keyword}%")).fetchall()
+    finally:
+        conn.close()
+
+
+# ---------- 连接池 ----------
+
+def pooled_get_order(pool, order_no: str):
+    return pool.connection().execute(ORDER_SQL, (order_no,)).fetchone()
+
+
+def pooled_refund(pool, order_no: str):
+    pooled_get_order(pool, order_no)
+    with pool.transaction() as conn:
+        conn.execute(REFUND_SQL, ("退款中", "订单已申请退款，处理中", order_no))
+
+
+def pooled_search(pool, keyword: str):
+    return pool.connection().execute(SEARCH_SQL, (f"%{keyword}%", f"%{keyword}%")).fetchall()
+
+
+def measure(fn, args_list, threads: int) -> dict:
+    """执行全部调用，统计单次调用延迟（微秒）和总吞吐量"""
+    def timed(args):
+        start = time.perf_counter()
+        fn(*args)
+        return (time.perf_counter() - start) * 1e6
+
+    start = time.perf_counter()
+    if threads <= 1:
+        latencies = [timed(args) for args in args_list]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            latencies = list(executor.map(timed, args_list))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_us": round(float(np.percentile(latencies, 50)), 1),
+        "p99_us": round(float(np.percentile(latencies, 99)), 1),
+        "mean_us": round(float(np.mean(latencies)), 1),
+        "calls_per_second": round(len(latencies) / elapsed, 1),
+    }
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 服务数据库连接方式基准测试")
+    parser.add_argument("--iterations", type=int, default=2000, help="每个场景的调用次数")
+    parser.add_argument("--threads", default="1,4", help="并发线程数，逗号分隔")
+    parser.add_argument("--extra-orders", type=int, default=10000, help="额外写入的订单行数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    from db_pool import SQLitePool
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "scenarios": []}
+
+    with tempfile.TemporaryDirectory(prefix="mcp_db_bench_") as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            prepare_databases(tmp_dir, args.extra_orders)
+        orders_db = os.path.join(tmp_dir, "orders.db")
+        products_db = os.path.join(tmp_dir, "products.db")
+        order_pool, product_pool = SQLitePool(orders_db), SQLitePool(products_db)
+
+        n = args.iterations
+        order_ids = [f"A10{(i % 10) + 1:02d}" for i in range(n)]
+        refund_ids = [f"B{i % max(1, args.extra_orders):07d}" for i in range(n)]
+        keywords = [["键盘", "耳机", "路由器", "显示器", "硬盘"][i % 5] for i in range(n)]
+
+        scenarios = [
+            ("get_order", legacy_get_order, pooled_get_order, orders_db, order_pool, order_ids),
+            ("refund_order", legacy_refund, pooled_refund, orders_db, order_pool, refund_ids),
+            ("search_products", legacy_search, pooled_search, products_db, product_pool, keywords),
+        ]
+        for threads in [int(t) for t in args.threads.split(",") if t.strip()]:
+            for name, legacy_fn, pooled_fn, db_path, pool, values in scenarios:
+                legacy = measure(legacy_fn, [(db_path, v) for v in values], threads)
+                pooled = measure(pooled_fn, [(pool, v) for v in values], threads)
+                speedup = round(legacy["mean_us"] / pooled["mean_us"], 2) if pooled["mean_us"] else None
+                print(f"[BENCH] {name:16s} threads={threads} "
+                      f"connect-per-call p50={legacy['p50_us']}us p99={legacy['p99_us']}us | "
+                      f"pool p50={pooled['p50_us']}us p99={pooled['p99_us']}us | 平均提速 {speedup}x")
+                report["scenarios"].append({"name": name, "threads": threads, "connect_per_call": legacy,
+                                            "pool": pooled, "mean_speedup": speedup})
+
+        report["pool_connections_opened"] = order_pool.opened + product_pool.opened
+        order_pool.close_all()
+        product_pool.close_all()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"mcp_db_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
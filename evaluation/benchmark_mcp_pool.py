@@ -0,0 +1,174 @@
+"""
+MCP 服务进程池基准测试
+
+对不同副本数（--replicas 1,2,4）分别启动 Mcpserver/mcp_pool.py（仅订单服务），通过 streamable-http 客户端测量：
+- throughput：多个客户端并发调用 get_order，固定时长内的调用吞吐
+- head_of_line：后台周期性持有订单库写锁，一个客户端持续调用 refund_order（等待写锁期间阻塞所在副本），
+  其他客户端并发调用 get_order，统计 get_order 的延迟分位数
+每轮结束时记录进程池 /metrics 返回的各副本指标。测试在临时目录中的数据库副本上进行。
+
+用法:
+    python evaluation/benchmark_mcp_pool.py --replicas 1,2,4 --concurrency 8 --duration 5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+sys.path.append(os.path.dirname(__file__))
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from check_query_plans import init_databases
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+POOL_SCRIPT = os.path.join(ROOT_DIR, "Mcpserver", "mcp_pool.py")
+READ_CALL = ("get_order", {"order_no": "A1001", "user_id": "1"})
+# 已签收订单不可退款：UPDATE 不会命中任何行，但仍需要等待写锁
+WRITE_CALL = ("refund_order", {"order_no": "A1003", "user_id": "2"})
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _metrics(port: int) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        return json.load(response)
+
+
+def _wait_healthy(port: int, replicas: int, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if _metrics(port)["order_mcp"]["healthy"] == replicas:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"进程池未在 {timeout}s 内就绪")
+
+
+async def _client_loop(url: str, call, deadline: float, latencies: list) -> None:
+    tool, args = call
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await session.call_tool(tool, args)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_clients(url: str, concurrency: int, duration: float, writers: int = 0) -> dict:
+    deadline = time.perf_counter() + duration
+    reads, writes = [], []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_client_loop(url, READ_CALL, deadline, reads) for _ in range(concurrency)),
+        *(_client_loop(url, WRITE_CALL, deadline, writes) for _ in range(writers)),
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "read_calls": len(reads),
+        "read_calls_per_second": round(len(reads) / elapsed, 1),
+        "read_p50_ms": round(float(np.percentile(reads, 50)), 3),
+        "read_p99_ms": round(float(np.percentile(reads, 99)), 3),
+        "write_calls": len(writes),
+    }
+
+
+def hold_write_lock(db_path: str, stop: threading.Event, hold: float, gap: float) -> None:
+    """周期性持有写锁，模拟慢写入（例如批量导入）"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.execute("COMMIT")
+        stop.wait(gap)
+    conn.close()
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 服务进程池基准测试")
+    parser.add_argument("--replicas", default="1,2,4", help="逗号分隔的副本数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发调用 get_order 的客户端数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每项测试时长（秒）")
+    parser.add_argument("--lock-hold", type=float, default=0.2, help="后台每次持有写锁的时长（秒）")
+    parser.add_argument("--lock-gap", type=float, default=0.3, help="后台两次持有写锁之间的间隔（秒）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "cpu_count": os.cpu_count(), "runs": []}
+
+    with tempfile.TemporaryDirectory(prefix="mcp_pool_bench_") as tmp_dir:
+        orders_db, products_db = init_databases(tmp_dir)
+        env = {**os.environ, "ORDER_DB_PATH": orders_db, "PRODUCT_DB_PATH": products_db}
+        for replicas in [int(n) for n in args.replicas.split(",") if n.strip()]:
+            port = _free_port()
+            pool = subprocess.Popen(
+                [sys.executable, POOL_SCRIPT, "--replicas", str(replicas), "--port", str(port), "--servers", "order_mcp"],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_healthy(port, replicas)
+                url = f"http://127.0.0.1:{port}/order_mcp/mcp"
+                throughput = asyncio.run(run_clients(url, args.concurrency, args.duration))
+
+                stop = threading.Event()
+                locker = threading.Thread(target=hold_write_lock,
+                                          args=(orders_db, stop, args.lock_hold, args.lock_gap), daemon=True)
+                locker.start()
+                try:
+                    head_of_line = asyncio.run(run_clients(url, args.concurrency, args.duration, writers=1))
+                finally:
+                    stop.set()
+                    locker.join()
+                metrics = _metrics(port)["order_mcp"]
+            finally:
+                pool.terminate()
+                pool.wait(timeout=30)
+
+            report["runs"].append({"replicas": replicas, "throughput": throughput,
+                                   "head_of_line": head_of_line, "metrics": metrics})
+            print(f"[BENCH] 副本 {replicas}: 吞吐 {throughput['read_calls_per_second']} 次/秒 "
+                  f"p50={throughput['read_p50_ms']}ms p99={throughput['read_p99_ms']}ms | "
+                  f"慢写入并发时 get_order p50={head_of_line['read_p50_ms']}ms p99={head_of_line['read_p99_ms']}ms | "
+                  f"各副本请求数 {[r['requests'] for r in metrics['replicas']]}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"mcp_pool_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
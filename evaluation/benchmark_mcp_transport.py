@@ -0,0 +1,225 @@
+"""
+MCP 工具调用传输方式基准测试
+
+对同一组工具调用分别测量单次调用延迟（顺序调用）和最大吞吐（并发调用，固定时长）：
+- stdio：每次调用新建 stdio 会话，即新启动一个 MCP 服务子进程
+  （langchain_mcp_adapters 的 MultiServerMCPClient.get_tools() 返回的工具未绑定会话时就是这样调用的）
+- stdio_session：一个长期保持的 stdio 会话，所有调用共用一条管道
+- streamable_http：每次调用新建 HTTP 会话，连接共享的长驻 MCP 服务（MCP_SERVER_TRANSPORT=streamable-http）
+- streamable_http_session：一个长期保持的 HTTP 会话
+- inprocess：agents/mcp_transport.py 的进程内调用，直接执行同一组 FastMCP 工具函数
+
+stdio / streamable_http 两种方式直接使用 mcp 客户端（MultiServerMCPClient 内部使用的同一套客户端）；
+测试在临时目录中的数据库副本上进行。
+
+用法:
+    python evaluation/benchmark_mcp_transport.py --iterations 200 --concurrency 8 --duration 5
+"""
+import io
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "agents"))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+sys.path.append(os.path.dirname(__file__))
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from check_query_plans import init_databases
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+MODES = ["stdio", "stdio_session", "streamable_http", "streamable_http_session", "inprocess"]
+# (服务, 工具, 参数)：订单按主键查询、商品关键词搜索
+SCENARIOS = [
+    ("order_mcp", "get_order", {"order_no": "A1001", "user_id": "1"}),
+    ("product_mcp", "search_products", {"keyword": "键盘"}),
+]
+# 每次调用都要启动子进程的 stdio 方式只测少量次数
+SPAWN_ITERATIONS = 5
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return
+        time.sleep(0.1)
+    raise TimeoutError(f"MCP 服务未在 {timeout}s 内监听端口 {port}")
+
+
+def _server_script(server: str) -> str:
+    return os.path.join(ROOT_DIR, "Mcpserver", f"{server}.py")
+
+
+def _stdio_params(server: str, env: dict) -> StdioServerParameters:
+    return StdioServerParameters(command=sys.executable, args=[_server_script(server)], env=env)
+
+
+@contextlib.asynccontextmanager
+async def _session(server: str, transport: str, env: dict, urls: dict):
+    """打开一个已初始化的 MCP 客户端会话"""
+    if transport == "stdio":
+        client = stdio_client(_stdio_params(server, env), errlog=subprocess.DEVNULL)
+    else:
+        client = streamablehttp_client(urls[server])
+    async with client as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            yield session
+
+
+async def make_caller(mode: str, stack: contextlib.AsyncExitStack, env: dict, urls: dict):
+    """返回 call(server, tool, args) 协程函数"""
+    if mode == "inprocess":
+        import mcp_transport
+        tools = {server: {t.name: t for t in await mcp_transport.inprocess_tools(server)}
+                 for server in {s for s, _, _ in SCENARIOS}}
+
+        async def call(server, tool, args):
+            return await tools[server][tool].ainvoke(args)
+        return call
+
+    transport = "stdio" if mode.startswith("stdio") else "streamable_http"
+    if mode.endswith("_session"):
+        sessions = {server: await stack.enter_async_context(_session(server, transport, env, urls))
+                    for server in {s for s, _, _ in SCENARIOS}}
+
+        async def call(server, tool, args):
+            return await sessions[server].call_tool(tool, args)
+        return call
+
+    async def call(server, tool, args):
+        async with _session(server, transport, env, urls) as session:
+            return await session.call_tool(tool, args)
+    return call
+
+
+async def measure_latency(call, iterations: int) -> dict:
+    latencies = []
+    for i in range(iterations):
+        server, tool, args = SCENARIOS[i % len(SCENARIOS)]
+        start = time.perf_counter()
+        await call(server, tool, args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "calls": iterations,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+    }
+
+
+async def measure_throughput(call, concurrency: int, duration: float) -> dict:
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        nonlocal completed
+        i = n
+        while time.perf_counter() < deadline:
+            server, tool, args = SCENARIOS[i % len(SCENARIOS)]
+            await call(server, tool, args)
+            completed += 1
+            i += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"concurrency": concurrency, "calls": completed, "seconds": round(elapsed, 2),
+            "calls_per_second": round(completed / elapsed, 1)}
+
+
+async def run_mode(mode: str, args, env: dict, urls: dict) -> dict:
+    async with contextlib.AsyncExitStack() as stack:
+        call = await make_caller(mode, stack, env, urls)
+        # 预热：建立连接、加载商品目录快照等
+        for server, tool, tool_args in SCENARIOS:
+            await call(server, tool, tool_args)
+        iterations = SPAWN_ITERATIONS if mode == "stdio" else args.iterations
+        return {
+            "latency": await measure_latency(call, iterations),
+            "throughput": await measure_throughput(call, args.concurrency, args.duration),
+        }
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 工具调用传输方式基准测试")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"逗号分隔，可选 {','.join(MODES)}")
+    parser.add_argument("--iterations", type=int, default=200, help="延迟测试的顺序调用次数")
+    parser.add_argument("--concurrency", type=int, default=8, help="吞吐测试的并发调用数")
+    parser.add_argument("--duration", type=float, default=5.0, help="吞吐测试时长（秒）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "modes": {}}
+
+    with tempfile.TemporaryDirectory(prefix="mcp_transport_bench_") as tmp_dir:
+        orders_db, products_db = init_databases(tmp_dir)
+        os.environ.update({"ORDER_DB_PATH": orders_db, "PRODUCT_DB_PATH": products_db})
+        env = dict(os.environ)
+
+        servers, urls = [], {}
+        if any(m.startswith("streamable_http") for m in modes):
+            for server in {s for s, _, _ in SCENARIOS}:
+                port = _free_port()
+                servers.append(subprocess.Popen(
+                    [sys.executable, _server_script(server)],
+                    env={**env, "MCP_SERVER_TRANSPORT": "streamable-http", "MCP_SERVER_PORT": str(port)},
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                ))
+                urls[server] = f"http://127.0.0.1:{port}/mcp"
+                _wait_port(port)
+        try:
+            for mode in modes:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = asyncio.run(run_mode(mode, args, env, urls))
+                report["modes"][mode] = result
+                latency, throughput = result["latency"], result["throughput"]
+                print(f"[BENCH] {mode:24s} p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms | "
+                      f"并发 {throughput['concurrency']} 吞吐 {throughput['calls_per_second']} 次/秒")
+        finally:
+            for process in servers:
+                process.terminate()
+                process.wait(timeout=10)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"mcp_transport_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+商品搜索基准测试：LIKE 全表扫描 vs FTS5 全文索引
+
+在临时目录中用 data/generate_data.py 生成合成商品库（默认 100 万行），对同一组关键词分别执行
+- like：原实现，product_name / description 上的 LIKE '%kw%'
+- fts：Mcpserver/product_mcp.py 当前实现（FTS5 trigram + bm25 排序）
+统计单次查询延迟，并记录全文索引的构建耗时与数据库体积。
+
+用法:
+    python evaluation/benchmark_product_search.py --rows 1000000 --iterations 50
+"""
+import io
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import importlib
+import subprocess
+import contextlib
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# 查询关键词：命中多（常见名词）、命中少（品牌）、单条（型号，运行时取第一行的型号）、无命中
+QUERIES = ["机械键盘", "路由器 WiFi6", "主动降噪", "洗衣机 一级能效", "品牌Q7", "不存在的商品"]
+SEARCH_LIKE_SQL = (
+    "SELECT product_id, product_name, description, category, price, stock, brand, specifications, image_url, status "
+    "FROM products WHERE status = '在售' AND (product_name LIKE ? OR description LIKE ?) ORDER BY price ASC LIMIT 10"
+)
+
+
+def prepare_database(path: str, rows: int, seed: int) -> dict:
+    """生成合成商品库：分块写入后一次性构建索引和全文索引（与 create_db 相同的索引定义）"""
+    import generate_data
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = generate_data.generate_products(path, rows, seed)
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    stats["db_bytes"] = os.path.getsize(path)
+    return stats
+
+
+def measure(fn, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "hits": len(result),
+    }
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="商品搜索 LIKE vs FTS5 基准测试")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="合成商品行数")
+    parser.add_argument("--iterations", type=int, default=50, help="每个关键词的查询次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "queries": []}
+
+    with tempfile.TemporaryDirectory(prefix="product_search_bench_") as tmp_dir:
+        db_path = os.path.join(tmp_dir, "products.db")
+        print(f"[BENCH] 生成 {args.rows} 行合成商品数据...")
+        report["build"] = prepare_database(db_path, args.rows, args.seed)
+        print(f"[BENCH] 写入 {report['build']['load_seconds']}s，索引与全文索引构建 {report['build']['index_seconds']}s，"
+              f"数据库 {report['build']['db_bytes'] / 1024 / 1024:.1f}MB")
+
+        os.environ["PRODUCT_DB_PATH"] = db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            product_mcp = importlib.import_module("product_mcp")
+        conn = product_mcp._pool.connection()
+
+        import generate_data
+        first_model = next(generate_data.product_rows(1, args.seed))[7].split("；")[0].split("：")[1]
+        for keyword in QUERIES + [first_model]:
+            like = measure(lambda: conn.execute(SEARCH_LIKE_SQL, (f"%{keyword}%", f"%{keyword}%")).fetchall(),
+                           args.iterations)
+            fts = measure(lambda: product_mcp._search_products(keyword=keyword), args.iterations)
+            speedup = round(like["mean_ms"] / fts["mean_ms"], 1) if fts["mean_ms"] else None
+            print(f"[BENCH] {keyword:12s} like p50={like['p50_ms']}ms p99={like['p99_ms']}ms | "
+                  f"fts p50={fts['p50_ms']}ms p99={fts['p99_ms']}ms | 命中 {fts['hits']} | 平均提速 {speedup}x")
+            report["queries"].append({"keyword": keyword, "like": like, "fts": fts, "mean_speedup": speedup})
+        product_mcp._pool.close_all()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"product_search_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
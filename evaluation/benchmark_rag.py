@@ -0,0 +1,341 @@
+"""
+RAG 检索基准测试（完全离线）
+
+以 RAG_data/create_data.py 中的三份示例文档为模板，生成 10× / 100× / 1000× 规模的合成政策语料，
+使用确定性的本地哈希 Embedding 代替远程 API，统计：
+- 索引构建耗时与内存占用
+- 各检索模式（vector / lexical / hybrid）的 p50 / p99 查询延迟
+- 基于标注查询集的 recall@k
+- 短查询（"退款时效"这类一两个词的问题）上 hybrid 模式的 recall@k：开启关键词快速路径与始终走融合检索对比，
+  快速路径导致召回下降超过 --max-short-recall-drop 时以非 0 状态退出
+
+结果写入 evaluation/results/ 下的 JSON 文件，文件中记录当前 git 提交，便于跨提交对比。
+
+用法:
+    python evaluation/benchmark_rag.py --scales 10,100 --queries 200
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+from typing import List
+
+# 添加路径以便导入 agents 和数据生成脚本
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "agents"))
+sys.path.append(os.path.join(ROOT_DIR, "RAG_data"))
+
+import faiss
+from langchain_core.embeddings import Embeddings
+import RAG_tool
+from context_packer import pack_context
+from create_data import TXT_CONTENT, MD_CONTENT, write_text_file, build_sop_docx
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+CITIES = ["北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "西安", "南京", "重庆"]
+CATEGORIES = ["家电", "数码", "服饰", "美妆", "生鲜", "图书", "母婴", "家具", "运动", "宠物"]
+SYLLABLES = "安百晨达恩飞高海佳凯蓝明诺鹏清瑞盛拓威欣逸悦泽智卓"
+
+# 每份模板文档都包含的原始条款：(查询, 判定命中的关键片段)
+BASE_QUERIES = [
+    ("什么是七天无理由退货", "七天无理由退货"),
+    ("耗材类商品包括哪些", "耗材类商品"),
+    ("跨境海外购商品能无理由退货吗", "跨境海外购"),
+    ("信用卡退款多久到账", "3-7个银行工作日"),
+    ("生鲜商品坏了怎么处理", "生鲜"),
+    ("大促期间未收到货的仅退款要等多久", "大促"),
+    ("恶意退货的风控规则", "恶意退货"),
+    ("数码产品开机后还能退货吗", "折旧"),
+]
+
+# 短查询：查询词少，BM25 首条结果很容易完全覆盖，但不一定是答案所在片段
+SHORT_QUERIES = [
+    ("七天无理由", "七天无理由退货"),
+    ("耗材类商品", "耗材类商品"),
+    ("海外购退货", "跨境海外购"),
+    ("信用卡退款", "3-7个银行工作日"),
+    ("退款时效", "银行工作日"),
+    ("生鲜", "生鲜"),
+    ("大促仅退款", "大促"),
+    ("恶意退货", "恶意退货"),
+    ("开机折旧", "折旧"),
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    确定性的本地哈希 Embedding（特征哈希）。
+
+    文本去空白后取字符二元组和三元组，用 crc32 映射到固定维度并带符号累加，最后做 L2 归一化。
+    与进程、随机种子无关，同一文本在任何机器上得到相同的向量。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = "".join(text.split())
+        for n in (2, 3):
+            for i in range(len(text) - n + 1):
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _merchant_name(rng: random.Random) -> str:
+    return "".join(rng.sample(SYLLABLES, 2)) + "优选"
+
+
+def generate_corpus(directory: str, scale: int, formats: List[str], seed: int) -> List[dict]:
+    """
+    生成 scale 倍规模的合成语料，返回标注查询集。
+
+    每个副本在模板文档的基础上追加一段该副本独有的条款（商家编号、城市、品类、天数、电话），
+    对应的查询只有包含该商家编号的片段才算命中。
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    queries = []
+    for i in range(scale):
+        merchant = f"商家{i:05d}"
+        name = _merchant_name(rng)
+        city, category = rng.choice(CITIES), rng.choice(CATEGORIES)
+        days = rng.choice([7, 10, 15, 30])
+        phone = f"400-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+        amount = rng.choice([99, 199, 299, 499])
+
+        if "txt" in formats:
+            clause = (f"\n第九条 {merchant}专属条款\n"
+                      f"9.1 {merchant}（{city}{name}旗舰店）销售的{category}类商品支持{days}天无理由退货。\n"
+                      f"9.2 {merchant}的售后专线为 {phone}，工作日 9:00-18:00 受理。\n")
+            write_text_file(os.path.join(directory, f"{i:05d}_售后服务协议.txt"),
+                            TXT_CONTENT.replace("（2025修订版）", f"（{merchant}版）") + clause)
+            queries.append({"query": f"{merchant}的{category}商品几天内可以无理由退货", "expected": merchant})
+            queries.append({"query": f"{city}{name}的售后电话是多少", "expected": phone})
+
+        if "md" in formats:
+            section = (f"\n## 🏷️ {name}会员福利（{merchant}）\n"
+                       f"*   {name}会员单笔订单满 {amount} 元，可享受{city}同城免费上门取件。\n")
+            write_text_file(os.path.join(directory, f"{i:05d}_用户帮助中心.md"), MD_CONTENT + section)
+            queries.append({"query": f"{name}会员满多少元可以免费上门取件", "expected": f"{name}会员"})
+
+        if "docx" in formats:
+            build_sop_docx(
+                os.path.join(directory, f"{i:05d}_客服执行手册.docx"),
+                extra_sections=[(f"第四章：{merchant}特殊授权", [
+                    f"{merchant}的{category}类投诉，一线客服可直接发放 {amount // 10} 元补偿券，无需主管审批。",
+                ])],
+            )
+            queries.append({"query": f"{merchant}的{category}投诉可以直接发多少补偿券", "expected": f"{merchant}的{category}类投诉"})
+
+    queries.extend({"query": query, "expected": expected} for query, expected in BASE_QUERIES)
+    return queries
+
+
+def _directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def _max_rss_mb() -> float:
+    # Linux 上 ru_maxrss 以 KB 为单位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_build(directory: str, embeddings: Embeddings):
+    """构建知识库并记录耗时与内存"""
+    rss_before = _max_rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kb = RAG_tool.build_knowledge_base(directory, embeddings)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    index = kb.vectorstore.index
+    return kb, {
+        "build_seconds": round(elapsed, 3),
+        "chunks": index.ntotal,
+        "python_heap_peak_mb": round(peak / 2 ** 20, 2),
+        "max_rss_mb": round(_max_rss_mb(), 2),
+        "max_rss_growth_mb": round(_max_rss_mb() - rss_before, 2),
+        "faiss_index_mb": round(faiss.serialize_index(index).nbytes / 2 ** 20, 3),
+        "ingest": RAG_tool.get_ingest_report(),
+    }
+
+
+def benchmark_queries(kb, queries: List[dict], embeddings: Embeddings, k: int) -> dict:
+    """按检索模式统计查询延迟与 recall@k"""
+    results = {}
+    original_mode = RAG_tool.RAG_RETRIEVAL_MODE
+    try:
+        for mode in RETRIEVAL_MODES:
+            RAG_tool.RAG_RETRIEVAL_MODE = mode
+            latencies, hits, packed_hits, raw_tokens, packed_tokens = [], 0, 0, 0, 0
+            for item in queries:
+                start = time.perf_counter()
+                docs = RAG_tool.search_knowledge_base(kb, item["query"], k, embeddings)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(item["expected"] in doc.page_content for doc in docs)
+                # 打包后的上下文是否仍包含答案，以及节省的 token
+                packed = pack_context(item["query"], docs, RAG_tool.RAG_CONTEXT_TOKEN_BUDGET, RAG_tool.RAG_MMR_LAMBDA)
+                packed_hits += any(item["expected"] in passage for passage in packed.passages)
+                raw_tokens += packed.raw_tokens
+                packed_tokens += packed.packed_tokens
+            results[mode] = {
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                "mean_ms": round(float(np.mean(latencies)), 3),
+                f"recall@{k}": round(hits / len(queries), 4),
+                f"packed_recall@{k}": round(packed_hits / len(queries), 4),
+                "context_tokens_raw": round(raw_tokens / len(queries), 1),
+                "context_tokens_packed": round(packed_tokens / len(queries), 1),
+            }
+    finally:
+        RAG_tool.RAG_RETRIEVAL_MODE = original_mode
+    return results
+
+
+def benchmark_short_queries(kb, embeddings: Embeddings, k: int) -> dict:
+    """hybrid 模式下短查询的 recall@k：按当前门槛启用关键词快速路径 vs 始终走融合检索"""
+    results = {}
+    original_mode, original_min_terms = RAG_tool.RAG_RETRIEVAL_MODE, RAG_tool.RAG_LEXICAL_MIN_TERMS
+    RAG_tool.RAG_RETRIEVAL_MODE = "hybrid"
+    try:
+        for variant, min_terms in (("fast_path", original_min_terms), ("fusion", float("inf"))):
+            RAG_tool.RAG_LEXICAL_MIN_TERMS = min_terms
+            hits, fast_path = 0, 0
+            for query, expected in SHORT_QUERIES:
+                fast_path += RAG_tool._lexical_fast_path(kb, query, k) is not None
+                docs = RAG_tool.search_knowledge_base(kb, query, k, embeddings)
+                hits += any(expected in doc.page_content for doc in docs)
+            results[variant] = {
+                f"recall@{k}": round(hits / len(SHORT_QUERIES), 4),
+                "fast_path_rate": round(fast_path / len(SHORT_QUERIES), 4),
+            }
+    finally:
+        RAG_tool.RAG_RETRIEVAL_MODE, RAG_tool.RAG_LEXICAL_MIN_TERMS = original_mode, original_min_terms
+    results["recall_drop"] = round(results["fusion"][f"recall@{k}"] - results["fast_path"][f"recall@{k}"], 4)
+    return results
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 检索离线基准测试")
+    parser.add_argument("--scales", default="10,100,1000", help="语料规模（相对 RAG_data 的倍数），逗号分隔")
+    # RAG_CHUNKER=recursive 时 .md 由 UnstructuredMarkdownLoader 解析，首次使用需联网下载分词模型
+    parser.add_argument("--formats", default="txt,md,docx", help="参与生成的文档格式（txt/md/docx），逗号分隔")
+    parser.add_argument("--queries", type=int, default=200, help="每个规模抽样的标注查询数量")
+    parser.add_argument("--k", type=int, default=RAG_tool.RAG_TOP_K, help="recall@k 中的 k")
+    parser.add_argument("--dim", type=int, default=256, help="哈希 Embedding 的维度")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ingest-workers", type=int, default=RAG_tool.RAG_INGEST_WORKERS,
+                        help="文档解析切分的进程数（>1 时以 spawn 方式启动进程池），默认同 RAG_INGEST_WORKERS")
+    parser.add_argument("--max-short-recall-drop", type=float, default=0.0,
+                        help="短查询上关键词快速路径相对融合检索允许的最大 recall 下降")
+    parser.add_argument("--workdir", default=None, help="合成语料存放目录，默认使用临时目录")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    RAG_tool.RAG_INGEST_WORKERS = args.ingest_workers
+    embeddings = HashingEmbeddings(args.dim)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_revision(),
+        "config": {
+            "formats": formats, "queries": args.queries, "k": args.k, "dim": args.dim, "seed": args.seed,
+            "chunker": RAG_tool.RAG_CHUNKER, "chunk_size": RAG_tool.CHUNK_SIZE, "chunk_overlap": RAG_tool.CHUNK_OVERLAP,
+            "lexical_min_terms": RAG_tool.RAG_LEXICAL_MIN_TERMS,
+            "lexical_min_coverage": RAG_tool.RAG_LEXICAL_MIN_COVERAGE,
+            "lexical_min_margin": RAG_tool.RAG_LEXICAL_MIN_MARGIN,
+            "context_token_budget": RAG_tool.RAG_CONTEXT_TOKEN_BUDGET,
+            "ingest_workers": args.ingest_workers,
+        },
+        "scales": [],
+    }
+    short_recall_regressed = False
+
+    with tempfile.TemporaryDirectory(prefix="rag_bench_") as tmp_dir:
+        workdir = args.workdir or tmp_dir
+        for scale in [int(s) for s in args.scales.split(",") if s.strip()]:
+            corpus_dir = os.path.join(workdir, f"corpus_{scale}x")
+            print(f"\n[BENCH] 生成 {scale}× 语料: {corpus_dir}")
+            start = time.perf_counter()
+            queries = generate_corpus(corpus_dir, scale, formats, args.seed)
+            generate_seconds = time.perf_counter() - start
+
+            rng = random.Random(args.seed)
+            sample = rng.sample(queries, min(args.queries, len(queries)))
+
+            print(f"[BENCH] 构建索引 ...")
+            kb, build = benchmark_build(corpus_dir, embeddings)
+            print(f"[BENCH] {build['chunks']} 个片段，构建 {build['build_seconds']}s，"
+                  f"索引 {build['faiss_index_mb']} MB")
+
+            retrieval = benchmark_queries(kb, sample, embeddings, args.k)
+            for mode, stats in retrieval.items():
+                print(f"[BENCH] {mode:8s} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms "
+                      f"recall@{args.k}={stats[f'recall@{args.k}']} "
+                      f"tokens {stats['context_tokens_raw']}→{stats['context_tokens_packed']}")
+            short = benchmark_short_queries(kb, embeddings, args.k)
+            print(f"[BENCH] 短查询 hybrid recall@{args.k}: 快速路径 {short['fast_path'][f'recall@{args.k}']}"
+                  f"（走快速路径 {short['fast_path']['fast_path_rate']:.0%}），"
+                  f"融合检索 {short['fusion'][f'recall@{args.k}']}")
+            short_recall_regressed |= short["recall_drop"] > args.max_short_recall_drop
+
+            report["scales"].append({
+                "scale": scale,
+                "files": len(RAG_tool._discover_files(corpus_dir)),
+                "corpus_mb": round(_directory_size(corpus_dir) / 2 ** 20, 3),
+                "generate_seconds": round(generate_seconds, 3),
+                "labeled_queries": len(sample),
+                "build": build,
+                "retrieval": retrieval,
+                "short_queries": short,
+            })
+            del kb
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"rag_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+    if short_recall_regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
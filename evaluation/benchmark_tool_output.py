@@ -0,0 +1,197 @@
+"""
+MCP 工具返回格式基准测试
+
+对评测集（test_dataset.json）中调用 get_order / get_product_info / search_products 的问题，
+按下表给出的工具参数在临时数据库上调用工具，对比三种返回格式回传给模型的 token 数与工具调用延迟：
+- text：带中文标签的多行文本（原格式）
+- json：紧凑 JSON，默认字段，长文本截断
+- json_fields：紧凑 JSON，只取回答该问题所需的字段（模型通过 fields 参数指定）
+token 数用 agents/context_packer.py 的 estimate_tokens 估算（离线运行，不依赖具体模型的分词器）。
+同时统计新增的 fields 参数使每轮请求中的工具 Schema 增加的 token 数。
+
+用法:
+    python evaluation/benchmark_tool_output.py --iterations 50
+    # 追加生成的商品，搜索结果更长（最多 10 个商品）
+    python evaluation/benchmark_tool_output.py --products 200000
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "agents"))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+sys.path.append(os.path.dirname(__file__))
+
+import tool_output
+from context_packer import estimate_tokens
+from check_query_plans import import_servers, init_databases
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "test_dataset.json")
+TOOLS = ("get_order", "get_product_info", "search_products")
+FORMATS = ("text", "json", "json_fields")
+_ORDER_NO = re.compile(r"[A-Z]\d{4}")
+
+# 问题 -> (工具参数, 回答该问题所需的字段)；订单类问题的订单号从问题中提取，字段为 None 表示需要完整信息
+QUESTION_ARGS = {
+    "A1002走到哪了": ({}, ["status", "logistics"]),
+    "A1004付钱了吗": ({}, ["status", "amount"]),
+    "A1009发货没": ({}, ["status", "logistics"]),
+    "夏科键盘参数": ({"product_description": "夏科键盘"}, ["product_name", "specifications"]),
+    "介绍一下M20洗衣机": ({"product_description": "M20洗衣机"}, None),
+    "查一下P9999": ({"product_description": "P9999"}, None),
+    "路由器支持WiFi6吗": ({"product_description": "路由器"}, ["product_name", "description", "specifications"]),
+    "鼠标参数": ({"product_description": "鼠标"}, ["product_name", "specifications"]),
+    "显示器具体参数": ({"product_description": "显示器"}, ["product_name", "specifications"]),
+    "网线详情": ({"product_description": "网线"}, None),
+    "我想买个路由器": ({"keyword": "路由器"}, None),
+    "有没有便宜点的鼠标，50块以内的": ({"keyword": "鼠标", "max_price": 50.0}, ["product_name", "price"]),
+    "帮我找找电脑外设": ({"category": "电脑外设"}, None),
+    "推荐个200块左右的键盘": ({"keyword": "键盘", "max_price": 250.0}, ["product_name", "price", "brand"]),
+    "搜索家电类产品": ({"category": "家用电器"}, None),
+    "有没有1000块以上的显示器": ({"keyword": "显示器"}, ["product_name", "price"]),
+    "找找品牌A的产品": ({"keyword": "品牌A"}, None),
+}
+
+
+def load_cases(path: str) -> list:
+    """评测集中调用上述工具的问题，返回 [(问题, 工具, 参数, 所需字段)]"""
+    with open(path, encoding="utf-8") as f:
+        dataset = json.load(f)
+    cases = []
+    for item in dataset:
+        tool, question = item.get("expected_tool"), item["question"]
+        if tool not in TOOLS:
+            continue
+        args, fields = QUESTION_ARGS.get(question, ({}, None))
+        if tool == "get_order":
+            match = _ORDER_NO.search(question)
+            if match is None:
+                continue
+            args = {"order_no": match.group(), "user_id": item.get("user_id", "1")}
+        elif not args:
+            print(f"[BENCH] 跳过未配置参数的问题：{question}")
+            continue
+        cases.append((question, tool, args, fields))
+    return cases
+
+
+async def measure_case(module, tool: str, args: dict, fields, iterations: int) -> dict:
+    fn = getattr(module, tool)
+    result = {}
+    for fmt in FORMATS:
+        # text / json 对应 TOOL_OUTPUT_FORMAT 的两种取值；json_fields 为模型传入 fields 的调用
+        tool_output.TOOL_OUTPUT_FORMAT = "text" if fmt == "text" else "json"
+        kwargs = {**args, "fields": fields} if fmt == "json_fields" and fields else args
+        output = await fn(**kwargs)
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await fn(**kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+        result[fmt] = {"chars": len(output), "tokens": estimate_tokens(output),
+                       "p50_ms": round(float(np.percentile(latencies, 50)), 3), "output": output}
+    return result
+
+
+def schema_tokens(module, tools) -> dict:
+    """每个工具的名称、说明与参数 Schema 的 token 数，以及其中 fields 参数所占的部分"""
+    result = {}
+    for tool in asyncio.run(module.mcp.list_tools()):
+        if tool.name not in tools:
+            continue
+        schema = json.loads(json.dumps(tool.inputSchema))
+        full = estimate_tokens(tool.name + tool.description + json.dumps(schema, ensure_ascii=False))
+        schema["properties"].pop("fields", None)
+        # 参数说明在 description 的 Args 段中，去掉 fields 的说明（含续行）
+        description = re.sub(r"\n\s*fields:.*(\n\s{12,}.*)*", "", tool.description)
+        base = estimate_tokens(tool.name + description + json.dumps(schema, ensure_ascii=False))
+        result[tool.name] = {"tokens": full, "added_by_fields_param": full - base}
+    return result
+
+
+def _git_revision() -> dict:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "HEAD"), "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 工具返回格式基准测试")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="评测集 JSON 路径")
+    parser.add_argument("--iterations", type=int, default=50, help="每种格式的重复调用次数（测延迟）")
+    parser.add_argument("--products", type=int, default=0, help="额外生成的商品行数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 evaluation/results/")
+    args = parser.parse_args()
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_revision(),
+              "config": vars(args), "cases": []}
+
+    cases = load_cases(args.dataset)
+    with tempfile.TemporaryDirectory(prefix="tool_output_bench_") as tmp_dir:
+        orders_db, products_db = init_databases(tmp_dir)
+        if args.products:
+            import generate_data
+            print(f"[BENCH] 生成 {args.products} 个商品...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                report["data"] = generate_data.generate_products(products_db, args.products, args.seed)
+        order_mcp, product_mcp = import_servers(orders_db, products_db)
+        modules = {"get_order": order_mcp, "get_product_info": product_mcp, "search_products": product_mcp}
+
+        for question, tool, tool_args, fields in cases:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(measure_case(modules[tool], tool, tool_args, fields, args.iterations))
+            report["cases"].append({"question": question, "tool": tool, "args": tool_args, "fields": fields, **result})
+            print(f"[BENCH] {tool:17s} {question:22s} token: 文本 {result['text']['tokens']:4d} | "
+                  f"JSON {result['json']['tokens']:4d} | 按需字段 {result['json_fields']['tokens']:4d}")
+
+        report["schema"] = {**schema_tokens(order_mcp, TOOLS), **schema_tokens(product_mcp, TOOLS)}
+        order_mcp._pool.close_all()
+        product_mcp._pool.close_all()
+
+    summary = {}
+    for fmt in FORMATS:
+        summary[fmt] = {
+            "tokens": sum(c[fmt]["tokens"] for c in report["cases"]),
+            "chars": sum(c[fmt]["chars"] for c in report["cases"]),
+            "mean_p50_ms": round(float(np.mean([c[fmt]["p50_ms"] for c in report["cases"]])), 3),
+        }
+    for fmt in FORMATS[1:]:
+        summary[fmt]["token_reduction"] = round(1 - summary[fmt]["tokens"] / summary["text"]["tokens"], 3)
+    summary["schema_tokens_added_per_turn"] = sum(s["added_by_fields_param"] for s in report["schema"].values())
+    report["summary"] = summary
+
+    print(f"\n[BENCH] {len(report['cases'])} 个工具调用的返回 token 合计：文本 {summary['text']['tokens']} | "
+          f"JSON {summary['json']['tokens']}（-{summary['json']['token_reduction']:.0%}） | "
+          f"按需字段 {summary['json_fields']['tokens']}（-{summary['json_fields']['token_reduction']:.0%}）")
+    print(f"[BENCH] 工具调用延迟 p50 均值：文本 {summary['text']['mean_p50_ms']}ms | "
+          f"JSON {summary['json']['mean_p50_ms']}ms | 按需字段 {summary['json_fields']['mean_p50_ms']}ms")
+    print(f"[BENCH] fields 参数使三个工具的 Schema 增加 {summary['schema_tokens_added_per_turn']} token")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"tool_output_benchmark_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[BENCH] 结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
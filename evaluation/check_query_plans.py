@@ -0,0 +1,149 @@
+"""
+MCP 工具查询计划回归检查
+
+在临时数据库上逐个调用订单/商品 MCP 工具（覆盖各个查询分支），记录工具实际执行的 SQL，
+对每条语句执行 EXPLAIN QUERY PLAN；出现对普通表的全表扫描（SCAN）时以非 0 状态退出。
+FTS5 虚拟表的 SCAN 是全文索引查询本身，不计为全表扫描。
+
+商品目录内存快照在检查时关闭，确保走到 SQL 查询路径。
+
+用法:
+    python evaluation/check_query_plans.py [--verbose]
+"""
+import io
+import os
+import re
+import sys
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+
+# 只检查数据读写语句（跳过 PRAGMA、事务控制、建表建索引）
+_CHECKED_STATEMENT = re.compile(r"^\s*(SELECT|UPDATE|INSERT|DELETE|WITH)\b", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (\S+)(.*)$")
+# FTS5 模块内部读写影子表（products_fts_config/_data/_idx/_docsize）的语句，不是工具查询
+_FTS_INTERNAL = re.compile(r"'main'\.'\w+_(config|data|idx|docsize|content)'")
+
+# (工具名, 参数)：每个查询分支至少一个调用
+ORDER_SCENARIOS = [
+    ("get_order", {"order_no": "A1001", "user_id": "1"}),
+    ("get_orders", {"order_nos": ["A1001", "A1002", "A9999"], "user_id": "1"}),
+    ("check_cancelable", {"order_no": "A1002", "user_id": "1"}),
+    ("list_user_orders", {"user_id": "1"}),
+    ("list_user_orders", {"user_id": "1", "status": "待发货"}),
+    ("list_user_orders", {"user_id": "1", "cursor": "2099-01-01 00:00:00|A9999", "limit": 2}),
+    ("list_user_orders", {"user_id": "1", "status": "配送中", "cursor": "2099-01-01 00:00:00|A9999"}),
+    ("refund_order", {"order_no": "A1007", "user_id": "1"}),
+    ("refund_order", {"order_no": "A1003", "user_id": "1"}),
+]
+PRODUCT_SCENARIOS = [
+    ("get_product_info", {"product_description": "夏科有线键鼠套装"}),
+    ("get_product_info", {"product_description": "键盘"}),
+    ("get_product_info", {"product_description": "不存在的商品名称"}),
+    ("get_product_basic_info", {"product_name": "鼠标"}),
+    ("search_products", {}),
+    ("search_products", {"category": "电脑外设"}),
+    ("search_products", {"max_price": 100.0}),
+    ("search_products", {"category": "配件", "max_price": 100.0}),
+    ("search_products", {"keyword": "键盘"}),
+    ("search_products", {"keyword": "U盘", "category": "存储设备"}),
+    ("search_products", {"keyword": "USB 3.0"}),
+    ("search_products", {"keyword": "USB 容量", "max_price": 500.0}),
+    ("search_products", {"keyword": "蓝牙5.0", "category": "音频设备"}),
+]
+
+
+def init_databases(directory: str):
+    """在临时目录中初始化示例数据库，返回 (订单库路径, 商品库路径)"""
+    import create_db
+    create_db.ORDERS_DB_PATH = os.path.join(directory, "orders.db")
+    create_db.PRODUCTS_DB_PATH = os.path.join(directory, "products.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_db.init_orders_db()
+        create_db.init_products_db()
+    return create_db.ORDERS_DB_PATH, create_db.PRODUCTS_DB_PATH
+
+
+def import_servers(orders_db: str, products_db: str):
+    """以指定数据库导入两个 MCP 服务模块（关闭商品目录快照）"""
+    os.environ["ORDER_DB_PATH"] = orders_db
+    os.environ["PRODUCT_DB_PATH"] = products_db
+    os.environ["PRODUCT_CATALOG_CACHE"] = "0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import order_mcp
+        import product_mcp
+    return order_mcp, product_mcp
+
+
+def load_servers(directory: str):
+    """在临时目录中初始化示例数据库，并以该数据库导入两个 MCP 服务模块"""
+    return import_servers(*init_databases(directory))
+
+
+def capture_statements(module, tool: str, kwargs: dict) -> list:
+    """调用一次工具，返回其执行的 SQL（参数已代入）"""
+    statements = []
+    # 工具函数在读写线程池中执行查询，跟踪回调需要设置到所有线程的连接上
+    module._pool.set_trace_callback(statements.append)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(getattr(module, tool)(**kwargs))
+    finally:
+        module._pool.set_trace_callback(None)
+    return [s for s in statements if _CHECKED_STATEMENT.match(s) and not _FTS_INTERNAL.search(s)]
+
+
+def full_scans(conn: sqlite3.Connection, statement: str):
+    """返回 (查询计划各行, 其中的全表扫描行)"""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    scans = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if match is None:
+            continue
+        name, rest = match.groups()
+        # 子查询/常量行/FTS 虚拟表的 SCAN 不是对普通表的扫描
+        if name.startswith("(") or name == "CONSTANT" or "VIRTUAL TABLE" in rest:
+            continue
+        scans.append(detail)
+    return plan, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 工具查询计划回归检查")
+    parser.add_argument("--verbose", action="store_true", help="打印每条语句的查询计划")
+    args = parser.parse_args()
+
+    failures = 0
+    checked = 0
+    with tempfile.TemporaryDirectory(prefix="query_plans_") as tmp_dir:
+        order_mcp, product_mcp = load_servers(tmp_dir)
+        for module, scenarios in ((order_mcp, ORDER_SCENARIOS), (product_mcp, PRODUCT_SCENARIOS)):
+            conn = module._pool.connection()
+            for tool, kwargs in scenarios:
+                for statement in dict.fromkeys(capture_statements(module, tool, kwargs)):
+                    plan, scans = full_scans(conn, statement)
+                    checked += 1
+                    sql = " ".join(statement.split())
+                    if scans:
+                        failures += 1
+                        print(f"[PLAN] ❌ {tool}({kwargs}) 全表扫描: {'; '.join(scans)}\n       {sql}")
+                    elif args.verbose:
+                        print(f"[PLAN] ✅ {tool}({kwargs}): {'; '.join(plan)}\n       {sql}")
+        order_mcp._pool.close_all()
+        product_mcp._pool.close_all()
+
+    if failures:
+        print(f"[PLAN] ❌ {checked} 条语句中 {failures} 条出现全表扫描")
+        sys.exit(1)
+    print(f"[PLAN] ✅ {checked} 条语句均未出现全表扫描")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+refund_order 并发压力测试
+
+对同一订单同时发起数百个退款请求，断言恰好一次成功、其余全部返回"已提交过退款"，
+并统计不同订单并行退款时的吞吐量。测试在临时数据库上进行，不会修改 data/orders.db。
+
+同一进程内的退款都经过连接池的单个写线程，天然串行；--processes 大于 1 时另外启动多个进程
+（各自导入 order_mcp、拥有独立的连接池），同时对同一订单退款，检验 SQL 层面（条件 UPDATE ... RETURNING）
+在真实的跨进程写锁竞争下仍然只成功一次，对应多个 MCP 服务副本共用一个数据库的部署方式。
+
+加 --compare-legacy 时同时运行旧实现（先查询、在 Python 中判断、再单独 UPDATE），展示其竞态窗口。
+
+用法:
+    python evaluation/stress_refund.py --concurrency 200 --rounds 5 --processes 4
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_DIR, "Mcpserver"))
+sys.path.append(os.path.join(ROOT_DIR, "data"))
+
+SUCCESS_MARK = "状态更新为：退款中"
+ALREADY_MARK = "无需重复提交"
+
+
+def prepare_database(path: str, orders: int) -> None:
+    import create_db
+    create_db.ORDERS_DB_PATH = path
+    create_db.init_orders_db()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO orders(order_no, user_id, status, items, amount, logistics, cancelable) VALUES (?,?,?,?,?,?,?)",
+            ((f"S{i:06d}", "9", "待发货", "键盘 x1", 189.0, "订单已确认，等待发货", 1) for i in range(orders)),
+        )
+    conn.close()
+
+
+def legacy_refund(db_path: str, order_no: str, user_id: str) -> str:
+    """旧实现：读取 → Python 中校验 → 新连接 UPDATE，两步之间存在竞态窗口"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        row = conn.execute("SELECT user_id, status, cancelable FROM orders WHERE order_no=?", (order_no,)).fetchone()
+    finally:
+        conn.close()
+    if row is None or row[0] != user_id or not row[2]:
+        return "不可取消"
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("UPDATE orders SET status='退款中', cancelable=0 WHERE order_no=?", (order_no,))
+        conn.commit()
+    finally:
+        conn.close()
+    return SUCCESS_MARK
+
+
+def fire_concurrently(fn, order_no: str, concurrency: int):
+    """所有线程在屏障处等齐后同时提交退款"""
+    barrier = threading.Barrier(concurrency)
+
+    def worker(_):
+        barrier.wait()
+        return fn(order_no)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(worker, range(concurrency)))
+
+
+def _process_worker(db_path: str, order_nos: list, concurrency: int, barrier, queue) -> None:
+    """子进程：以独立的 order_mcp 连接池，每轮在跨进程屏障处等齐后对同一订单并发提交 concurrency 个退款"""
+    os.environ["ORDER_DB_PATH"] = db_path
+    with contextlib.redirect_stdout(io.StringIO()):
+        import order_mcp
+
+        async def fire(order_no: str) -> list:
+            return await asyncio.gather(*(order_mcp.refund_order(order_no, "9") for _ in range(concurrency)))
+
+        results = {}
+        for order_no in order_nos:
+            barrier.wait()
+            results[order_no] = asyncio.run(fire(order_no))
+        order_mcp._pool.close_all()
+    queue.put(results)
+
+
+def fire_from_processes(db_path: str, order_nos: list, processes: int, concurrency: int) -> dict:
+    """多个进程同时对同一订单退款（每个订单一轮），返回 {订单号: 所有进程的返回结果}"""
+    ctx = multiprocessing.get_context("spawn")
+    barrier, queue = ctx.Barrier(processes), ctx.Queue()
+    per_process = max(1, concurrency // processes)
+    workers = [ctx.Process(target=_process_worker, args=(db_path, order_nos, per_process, barrier, queue))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    results = {order_no: [] for order_no in order_nos}
+    for _ in workers:
+        for order_no, replies in queue.get().items():
+            results[order_no].extend(replies)
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="refund_order 并发压力测试")
+    parser.add_argument("--concurrency", type=int, default=200, help="同一订单的并发退款请求数")
+    parser.add_argument("--rounds", type=int, default=5, help="测试轮数（每轮使用一个新订单）")
+    parser.add_argument("--throughput-orders", type=int, default=2000, help="吞吐量测试中的订单数")
+    parser.add_argument("--threads", type=int, default=16, help="吞吐量测试的并发线程数")
+    parser.add_argument("--processes", type=int, default=4,
+                        help="跨进程测试的进程数（各自独立的连接池同时写同一数据库），1 表示不运行")
+    parser.add_argument("--compare-legacy", action="store_true", help="同时运行旧的先查后改实现")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="refund_stress_") as tmp_dir:
+        db_path = os.path.join(tmp_dir, "orders.db")
+        total_orders = args.rounds * (2 if args.compare_legacy else 1) + args.throughput_orders
+        total_orders += args.rounds if args.processes > 1 else 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            prepare_database(db_path, total_orders)
+        os.environ["ORDER_DB_PATH"] = db_path
+        import order_mcp
+
+        failures = 0
+        next_order = 0
+        for round_no in range(args.rounds):
+            order_no = f"S{next_order:06d}"
+            next_order += 1
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = fire_concurrently(lambda o: asyncio.run(order_mcp.refund_order(o, "9")), order_no, args.concurrency)
+            elapsed = time.perf_counter() - start
+            success = sum(SUCCESS_MARK in r for r in results)
+            already = sum(ALREADY_MARK in r for r in results)
+            ok = success == 1 and already == args.concurrency - 1
+            failures += not ok
+            print(f"[STRESS] 第 {round_no + 1} 轮 {order_no}: {args.concurrency} 个并发请求，成功 {success}，"
+                  f"已退款 {already}，其他 {args.concurrency - success - already}，耗时 {elapsed * 1000:.0f}ms "
+                  f"{'✅' if ok else '❌'}")
+
+        if args.processes > 1:
+            order_nos = [f"S{i:06d}" for i in range(next_order, next_order + args.rounds)]
+            next_order += args.rounds
+            start = time.perf_counter()
+            results = fire_from_processes(db_path, order_nos, args.processes, args.concurrency)
+            elapsed = time.perf_counter() - start
+            for round_no, order_no in enumerate(order_nos):
+                replies = results[order_no]
+                success = sum(SUCCESS_MARK in r for r in replies)
+                already = sum(ALREADY_MARK in r for r in replies)
+                ok = success == 1 and already == len(replies) - 1
+                failures += not ok
+                print(f"[STRESS] 跨进程第 {round_no + 1} 轮 {order_no}: {args.processes} 个进程共 {len(replies)} 个并发请求，"
+                      f"成功 {success}，已退款 {already}，其他 {len(replies) - success - already} "
+                      f"{'✅' if ok else '❌'}")
+            print(f"[STRESS] 跨进程测试共耗时 {elapsed:.1f}s（含进程启动）")
+
+        if args.compare_legacy:
+            for round_no in range(args.rounds):
+                order_no = f"S{next_order:06d}"
+                next_order += 1
+                results = fire_concurrently(lambda o: legacy_refund(db_path, o, "9"), order_no, args.concurrency)
+                print(f"[STRESS] 旧实现第 {round_no + 1} 轮 {order_no}: 报告成功 {sum(SUCCESS_MARK in r for r in results)} 次")
+
+        # 吞吐量：不同订单并行退款
+        orders = [f"S{i:06d}" for i in range(next_order, next_order + args.throughput_orders)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                results = list(executor.map(lambda o: asyncio.run(order_mcp.refund_order(o, "9")), orders))
+        elapsed = time.perf_counter() - start
+        success = sum(SUCCESS_MARK in r for r in results)
+        failures += success != len(orders)
+        print(f"[STRESS] 吞吐量: {len(orders)} 个订单 / {args.threads} 线程，成功 {success}，"
+              f"{len(orders) / elapsed:.0f} 次/秒")
+
+        conn = sqlite3.connect(db_path)
+        refunded = conn.execute("SELECT COUNT(*) FROM orders WHERE order_no LIKE 'S%' AND status='退款中'").fetchone()[0]
+        conn.close()
+        print(f"[STRESS] 数据库中处于退款中的测试订单: {refunded}")
+
+    if failures:
+        print(f"[STRESS] ❌ {failures} 项检查未通过")
+        sys.exit(1)
+    print("[STRESS] ✅ 每个订单恰好退款一次")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
+import asyncio
+import hmac
 import logging
-from fastapi import FastAPI, HTTPException, Request
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from langchain_mcp_adapters.client import MultiServerMCPClient 
@@ -12,10 +15,20 @@ import os
 
 # 添加agents目录到路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../agents')))
-from gateway_agent import get_gateway_agent
+from gateway_agent import get_gateway_agent, get_fast_router_stats
+from RAG_tool import (
+    reindex_knowledge_base, get_policy_cache_stats, warmup_knowledge_base, is_knowledge_base_ready
+)
 
 # 全局 gateway_agent 实例（异步初始化）
 gateway_agent = None
+# 知识库预热的最近一次错误（用于就绪检查）
+rag_warmup_error = None
+
+# 知识库增量更新轮询间隔（秒），0 表示关闭轮询，仅通过管理接口触发
+RAG_REINDEX_INTERVAL = int(os.getenv("RAG_REINDEX_INTERVAL", "0"))
+# 管理接口（/api/admin/*）的访问令牌，请求头 X-Admin-Token 需与之一致；未设置时管理接口不可用
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
 
 """ 
 # Redis连接配置
@@ -33,10 +46,45 @@ app = FastAPI(title="AI智能客服系统", description="在线AI智能客服API
 html_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '../html'))
 app.mount("/html", StaticFiles(directory=html_directory), name="html")
 
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """管理接口鉴权：校验请求头 X-Admin-Token"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="管理接口未启用（未设置 ADMIN_API_TOKEN）")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="管理接口令牌无效")
+
+async def _reindex_poller():
+    """按固定间隔检查 RAG_data 变化并增量更新索引"""
+    while True:
+        await asyncio.sleep(RAG_REINDEX_INTERVAL)
+        try:
+            # 增量更新包含文件读取和 Embedding 调用，放到线程中执行，避免阻塞事件循环
+            await asyncio.to_thread(reindex_knowledge_base)
+        except Exception as e:
+            logging.error(f"[RAG] 定时增量更新失败: {e}", exc_info=True)
+
+async def _warmup_rag():
+    """后台预热知识库索引（构建或从磁盘加载），与 agent 初始化并行进行"""
+    global rag_warmup_error
+    try:
+        logging.info("[STARTUP] 开始预热知识库索引...")
+        if await warmup_knowledge_base():
+            rag_warmup_error = None
+            logging.info("[STARTUP] 知识库索引已就绪")
+        else:
+            rag_warmup_error = "知识库初始化失败（无数据目录或无文档）"
+            logging.warning(f"[STARTUP] {rag_warmup_error}")
+    except Exception as e:
+        # 预热失败不影响服务启动，首个政策查询会重新尝试构建
+        rag_warmup_error = str(e)
+        logging.error(f"[STARTUP] 知识库预热失败: {e}", exc_info=True)
+
 @app.on_event("startup")
 async def startup_event():
-    """应用启动时异步初始化 gateway_agent"""
+    """应用启动时异步初始化 gateway_agent，同时在后台预热知识库"""
     global gateway_agent
+    # 保存后台任务的引用（避免任务运行中被垃圾回收），关闭时统一取消
+    app.state.background_tasks = [asyncio.create_task(_warmup_rag())]
     try:
         logging.info("[STARTUP] 开始初始化 gateway_agent...")
         gateway_agent = await get_gateway_agent()
@@ -45,6 +93,19 @@ async def startup_event():
         logging.error(f"[STARTUP] gateway_agent 初始化失败: {e}", exc_info=True)
         raise
 
+    if RAG_REINDEX_INTERVAL > 0:
+        app.state.background_tasks.append(asyncio.create_task(_reindex_poller()))
+        logging.info(f"[STARTUP] 已启动知识库增量更新轮询，间隔 {RAG_REINDEX_INTERVAL} 秒")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时取消并等待后台任务（知识库预热、增量更新轮询）"""
+    tasks = getattr(app.state, "background_tasks", [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    logging.info("[SHUTDOWN] 后台任务已停止")
+
 @app.get("/")
 async def root():
     """根路径，重定向到前端页面"""
@@ -54,6 +115,43 @@ async def health_check():
     """健康检查接口"""
     return JSONResponse(content={"status": "healthy"})
 
+@app.get("/api/ready")
+async def readiness_check():
+    """就绪检查接口：分别报告 agent 和知识库检索是否可用，全部就绪时返回 200"""
+    agent_ready = gateway_agent is not None
+    policy_search_ready = is_knowledge_base_ready()
+    ready = agent_ready and policy_search_ready
+    # 未就绪时：知识库预热失败为 unavailable，仍在初始化为 starting
+    warmup_failed = not policy_search_ready and bool(rag_warmup_error)
+    content = {
+        "status": "healthy" if ready else ("unavailable" if warmup_failed else "starting"),
+        "agent_ready": agent_ready,
+        "policy_search_ready": policy_search_ready,
+    }
+    if warmup_failed:
+        content["policy_search_error"] = rag_warmup_error
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+@app.post("/api/admin/reindex", dependencies=[Depends(require_admin_token)])
+async def reindex_rag():
+    """增量更新知识库索引（只处理新增、修改和删除的文档）"""
+    try:
+        summary = await asyncio.to_thread(reindex_knowledge_base)
+        return JSONResponse(content={"status": "ok", "summary": summary})
+    except Exception as e:
+        logging.error(f"[API] 知识库增量更新失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"知识库增量更新失败: {str(e)}")
+
+@app.get("/api/admin/rag_cache_stats", dependencies=[Depends(require_admin_token)])
+async def rag_cache_stats():
+    """知识库检索缓存的命中/未命中统计及上下文打包节省的 token"""
+    return JSONResponse(content=get_policy_cache_stats())
+
+@app.get("/api/admin/router_stats", dependencies=[Depends(require_admin_token)])
+async def router_stats():
+    """网关前置快速路由的命中率（按意图）及估算节省的延迟"""
+    return JSONResponse(content=get_fast_router_stats())
+
 @app.get("/api/chat_history/{user_id}")
 async def get_chat_history(user_id: str):
     """获取用户的对话历史（从 AsyncRedisSaver 读取）"""
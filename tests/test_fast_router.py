@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "agents"))
+
+from fast_router import FastPathRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return FastPathRouter()
+
+
+@pytest.mark.parametrize("message", [
+    # 投诉 / 催单
+    "我要投诉A1001", "A1001发错货了", "A1002怎么还没到",
+    # 退款进度
+    "订单A1001退款了没", "A1003退款到账了吗",
+    # 退款请求：会修改订单，必须交给网关智能体
+    "A1001 不要了", "把A1004退了", "我要取消订单A1001", "A1001申请退款",
+    # 否定
+    "不要取消A1001", "A1001先别退", "A1001不是我的订单",
+    # 依赖上下文的短回复
+    "好", "好的", "嗯", "可以", "没有",
+    # 多个订单号 / 商品ID
+    "A1001和A1002", "查一下P9999",
+])
+def test_route_falls_through(router, message):
+    assert router.route(message) is None
+
+
+@pytest.mark.parametrize("last_reply", ["好的，请提供您要退款的订单号。", "请问您要取消哪个订单？"])
+def test_bare_order_no_after_question_falls_through(router, last_reply):
+    assert router.needs_context("A1001")
+    assert router.route("A1001", last_reply) is None
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("A1001", "order_status"),
+    ("查订单A1001", "order_status"),
+    ("A1002走到哪了", "order_status"),
+    ("A1001能取消吗", "order_cancel_check"),
+    ("你好", "greeting"),
+    ("谢谢", "thanks"),
+])
+def test_route_hits(router, message, intent):
+    route = router.route(message, "您好！请问有什么可以帮您？")
+    assert route is not None and route.intent == intent
+
+
+def test_refund_never_on_fast_path(router):
+    for message in ("退款A1003", "A1006不要了", "帮我退款A1001"):
+        route = router.route(message)
+        assert route is None or route.intent != "order_refund"